@@ -1,8 +1,9 @@
 import json
 from collections import defaultdict
 
+from src.summarization.summary_repair import is_fallback_text
+
 INPUT_FILE = "results-merged-20.json"
-ERROR_TEXT = "All 10 generation attempts failed"
 
 error_counts = defaultdict(int)
 
@@ -15,10 +16,10 @@ for entry in data:
     for claim in entry.get("summary", []):
         for perspective in claim.get("perspectives", []):
             text = perspective.get("text", "")
-            if ERROR_TEXT in text:
+            if is_fallback_text(text):
                 error_counts[qid] += 1
 
 print("Total IDs with errors:", len(error_counts))
-print("IDs with JSON parse errors:\n")
+print("IDs with failed (fallback) summaries:\n")
 for qid, count in sorted(error_counts.items()):
     print(f"{qid}")
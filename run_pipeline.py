@@ -2,18 +2,30 @@ import argparse
 import json
 from datetime import datetime
 from pathlib import Path
-from src.utils.io import load_theperspective_dataset
-from src.utils.io import load_theperspective_evidence
-from src.retrieval.tfidf_retrieval import retrieve_local_docs
+from src.utils.io import load_theperspective_corpus
+from src.utils.io import load_perspectrumx_dataset, load_perspectrumx_evidence
+from src.retrieval.retrievers import RETRIEVERS, get_retriever
 # from src.retrieval.web_retrieval import search_web
 # from src.validation.entailment import check_entailment
 # from src.summarization.merge import merge_documents
 from src.summarization.merge import merge_docs_lists
-from src.summarization.llm_summary import summarize_query
-from src.summarization.llm_summary_merged import summarize_query as summarize_query_merged
+from src.summarization.compress import compress_corpora
+from src.summarization.summary_server import get_batch_summarizer
 # from src.evaluation.web_metrics import evaluate_all
 
 
+def print_generation_totals(generation_stats: list):
+    """Print attempts and tokens spent on summarization across all queries."""
+    if not generation_stats:
+        return
+    totals = {}
+    for stats in generation_stats:
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                totals[key] = totals.get(key, 0) + value
+    print(f"Summarization totals over {len(generation_stats)} queries: {totals}")
+
+
 def main():
     # Two entry points:
     # 1) Standard pipeline (offline/web retrieval + summarization):
@@ -23,6 +35,8 @@ def main():
     #    python run_pipeline.py --merged-file results/merged-5.json --limit 5
     #    -> uses llm_summary_merged.py which accepts mixed int/str IDs (e.g., URLs)
     # GPU + HF_TOKEN are still required for either mode; merged mode simply bypasses retrieval.
+    # With --summary-server (or LLM_SUMMARY_SERVER), summarization is forwarded to a running
+    # `python -m src.summarization.summary_server`, so the model is not reloaded per run.
     parser = argparse.ArgumentParser(
         description="Web-Augmented Multi-Perspective Summarization Pipeline"
     )
@@ -36,7 +50,7 @@ def main():
         "--offline-k",
         type=int,
         default=0,
-        help="Number of top offline (TF-IDF) documents to retrieve."
+        help="Number of top offline documents to retrieve (engine chosen by --method)."
     )
     parser.add_argument(
         "--online-k",
@@ -47,8 +61,21 @@ def main():
     parser.add_argument(
         "--method",
         type=str,
+        choices=sorted(RETRIEVERS),
         default="tfidf",
-        help="Retrieval method label to include in filename (e.g., tfidf)."
+        help="Offline retrieval engine (also included in the output filename)."
+    )
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=8,
+        help="Inverted lists scanned per query with --method ann (higher = better recall, slower)."
+    )
+    parser.add_argument(
+        "--fusion",
+        choices=["rrf", "weighted"],
+        default="rrf",
+        help="Rank fusion used by --method hybrid (reciprocal-rank or weighted score)."
     )
     parser.add_argument(
         "--limit",
@@ -62,6 +89,36 @@ def main():
         default=None,
         help="Optional path to a pre-merged corpus JSON (e.g., results/merged-5.json)."
     )
+    parser.add_argument(
+        "--summary-server",
+        type=str,
+        default=None,
+        help="URL of a running summarization server (e.g., http://127.0.0.1:8765); default loads the model in-process."
+    )
+    parser.add_argument(
+        "--summary-batch-size",
+        type=int,
+        default=None,
+        help="Queries summarized together in one padded, schema-constrained generation batch. "
+             "Default: 1 while the prompt prefix KV cache is enabled (LLM_SUMMARY_PREFIX_CACHE, on by "
+             "default), so every generation reuses it; 4 when it is disabled. Any value above 1 turns "
+             "the prefix cache off for the batched first generations (only retries still use it)."
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=None,
+        help="Opt-in prompt-token budget the merged corpus is fitted into before summarization, "
+             "e.g. 4096; lowest-ranked docs are truncated or dropped (default: LLM_SUMMARY_CONTEXT_BUDGET, "
+             "else 0 = no limit)."
+    )
+    parser.add_argument(
+        "--compress-sentences",
+        type=int,
+        default=0,
+        help="Keep only the N sentences per document most similar to the query (TF-IDF) before "
+             "summarization; 0 = no compression."
+    )
     args = parser.parse_args()
 
     dataset_name = args.dataset
@@ -70,6 +127,9 @@ def main():
     method = args.method
     limit = args.limit
     merged_file = args.merged_file
+    summary_batch_size = args.summary_batch_size
+    summarize_batch = get_batch_summarizer("standard", args.summary_server)
+    summarize_batch_merged = get_batch_summarizer("merged", args.summary_server)
 
     # Create results directory if it doesn't exist
     results_dir = Path("results")
@@ -95,26 +155,35 @@ def main():
         print(f"\nLoaded {len(merged_data)} queries from merged corpus: {merged_path}")
         print(f"Saving results to: {output_file}")
 
+        # Summarize all queries in padded generation batches
+        queries = [entry.get("query", "") for entry in merged_data]
+        corpora = [entry.get("merged") or entry.get("docs") or [] for entry in merged_data]
+        corpora = compress_corpora(queries, corpora, args.compress_sentences)
+        generation_stats = []
+        summaries = summarize_batch_merged(queries, corpora, batch_size=summary_batch_size,
+                                           stats=generation_stats, context_budget=args.context_budget)
+
         results = []
         for i, entry in enumerate(merged_data):
-            query_text = entry.get("query", "")
-            merged_corpus = entry.get("merged") or entry.get("docs") or []
+            query_text = queries[i]
 
             print("\n")
             print(f"[{i+1}/{len(merged_data)}] Query: {query_text}")
             print("\n")
 
-            summary = summarize_query_merged(query_text, merged_corpus)
+            summary = summaries[i]
             print(f"summary:\n{summary}")
 
             result_entry = {
                 "id": entry.get("id", f"query_{i}"),
                 "query": query_text,
                 "summary": summary,
-                "metrics": None
+                "metrics": None,
+                "generation": generation_stats[i] if i < len(generation_stats) else None
             }
             results.append(result_entry)
 
+        print_generation_totals(generation_stats)
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(results, f, indent=2, ensure_ascii=False)
 
@@ -128,9 +197,10 @@ def main():
 
     # Load dataset
     if dataset_name == "theperspective":
-        dataset = load_theperspective_dataset("data/theperspective")
+        corpus = load_theperspective_corpus("data/theperspective")
+        dataset = corpus.dataset
     else:
-        raise NotImplementedError("Perspectrumx not yet added.")
+        dataset = load_perspectrumx_dataset("data/perspectrumx")
 
     total_queries = len(dataset)
     print(f"\nLoaded {total_queries} queries from {dataset_name} dataset.")
@@ -141,9 +211,9 @@ def main():
 
     # Load evidence depending on dataset
     if dataset_name == "theperspective":
-        evidence = load_theperspective_evidence("data/theperspective")
+        evidence = corpus.evidence()
     else:
-        raise NotImplementedError("Perspectrumx not yet added.")
+        evidence = load_perspectrumx_evidence("data/perspectrumx")
 
     # Load valid-web data for testing (only if online_k > 0)
     if online_k > 0:
@@ -159,17 +229,27 @@ def main():
         dataset = dataset[:limit]
         print(f"Processing first {len(dataset)} queries due to --limit={limit}.")
 
+    # Offline document retrieval for all queries in one batched pass
+    if offline_k > 0:
+        retriever_options = {}
+        if method == "ann":
+            retriever_options["nprobe"] = args.nprobe
+        elif method == "hybrid":
+            retriever_options["fusion"] = args.fusion
+        retriever = get_retriever(method, evidence, **retriever_options)
+        local_docs_by_query = retriever.search_batch([entry["query"] for entry in dataset], k=offline_k)
+        for stage, seconds in getattr(retriever, "timings", {}).items():
+            print(f"  {method} retrieval stage '{stage}': {seconds:.3f}s")
+    else:
+        local_docs_by_query = [[] for _ in dataset]
+
     # Go over each query, should be from title section for theperspective
-    results = []
+    merged_corpora = []
     for i, entry in enumerate(dataset):
         query_text = entry["query"]
-        print("\n")
-        # could remove query: text
-        print(f"[{i+1}/{len(dataset)}] Query: {query_text}")
-        print("\n")
 
-        # TF-IDF document retrieval
-        local_docs = retrieve_local_docs(query_text, evidence, k=offline_k)
+        # Offline document retrieval (precomputed above)
+        local_docs = local_docs_by_query[i]
         # print(len(local_docs))
         # print(local_docs)
 
@@ -184,10 +264,27 @@ def main():
 
         # Merge local documents + web documents
         merged_corpus = merge_docs_lists(local_docs, web_docs)
+        merged_corpora.append(merged_corpus)
 
-        # Summarization: model generates claims; pass only query and docs
-        summary = summarize_query(query_text, merged_corpus)
+    # Extractive compression: keep the query-relevant sentences of each document
+    merged_corpora = compress_corpora([entry["query"] for entry in dataset], merged_corpora,
+                                      args.compress_sentences)
 
+    # Summarization: model generates claims; pass only query and docs, in padded batches
+    generation_stats = []
+    summaries = summarize_batch([entry["query"] for entry in dataset], merged_corpora,
+                                batch_size=summary_batch_size, stats=generation_stats,
+                                context_budget=args.context_budget)
+
+    results = []
+    for i, entry in enumerate(dataset):
+        query_text = entry["query"]
+        print("\n")
+        # could remove query: text
+        print(f"[{i+1}/{len(dataset)}] Query: {query_text}")
+        print("\n")
+
+        summary = summaries[i]
         print(f"summary:\n{summary}")
 
         # Evaluation - calculate metrics for LLM summary compared to gold data
@@ -197,12 +294,15 @@ def main():
             "id": entry.get("id", f"query_{i}"),
             "query": query_text,
             "summary": summary,
-            "metrics": None
+            "metrics": None,
+            "generation": generation_stats[i] if i < len(generation_stats) else None
         }
         results.append(result_entry)
 
         # print(f"Summary metrics: {metrics}\n")
 
+    print_generation_totals(generation_stats)
+
     # Save all results to output file
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(results, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,73 @@
+"""
+Persistent Judge Cache
+
+SQLite cache of LLM-as-judge responses keyed by a hash of the full judge request: the
+rendered rubric prompt (summary, gold reference and web-doc context included), system
+prompt, structured-output schema and model. Re-running the judge over files that were
+already scored only calls the API for new or changed summaries, and any edit to the rubric
+text or schema changes every key, so stale scores are never returned.
+
+Only the raw structured response is stored; scores are rebuilt from it on a hit.
+"""
+
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = "data/cache/judge_cache.sqlite"
+
+
+def request_hash(request_body: dict) -> str:
+    """Content hash of a judge request body (see llm_as_judge.judge_request_body)."""
+    canonical = json.dumps(request_body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JudgeCache:
+    """Thread-safe store of raw judge responses per request hash."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS judge (
+                request_hash TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                raw_response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, request_body: dict):
+        """Return the cached raw response for a request body, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT raw_response FROM judge WHERE request_hash = ?",
+                (request_hash(request_body),),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, request_body: dict, raw_response: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO judge (request_hash, model, raw_response, created_at) VALUES (?, ?, ?, ?)",
+                (request_hash(request_body), request_body.get("model", ""), raw_response, time.time()),
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
@@ -3,18 +3,50 @@ LLM-as-Judge Evaluation Module (Improved Implementation)
 
 Evaluates multi-perspective summaries using a fair 5-criteria rubric (10 points total)
 that works equally for offline-only and web-augmented summaries.
-Gold references are matched by query text from data.jsonl.
+Gold references are looked up by example id or query text in an index of data.jsonl.
+All calls share one OpenAI client; rate-limited calls back off and retry, lowering the
+caller's AdaptiveConcurrency limit when one is passed. With a JudgeCache, summaries whose
+judge request was already answered are scored from the cache without an API call.
 """
 
 import os
 import json
+import threading
 from typing import List, Dict, Optional, Union
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
 from pydantic import BaseModel, Field
 
+from src.utils.concurrency import sleep_backoff
+from src.utils.gold_references import DEFAULT_GOLD_FILE, get_gold_index
+from src.utils.io import get_merged_store
+from src.summarization.summary_repair import is_fallback_text
+
 load_dotenv()
 
+MAX_RATE_LIMIT_RETRIES = 8
+JUDGE_SYSTEM_PROMPT = "You are evaluating a multi-perspective summary. Judge the summary based on the criteria provided, assigning points for each category."
+
+# Shared OpenAI client (one HTTP connection pool for all threads)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OpenAI:
+    """
+    Return the process-wide OpenAI client. Its built-in retries are disabled so that
+    rate limits surface here and can adapt the caller's concurrency.
+    Honors OPENAI_BASE_URL (e.g. a local OpenAI-compatible mock server).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY not set in environment")
+            _client = OpenAI(api_key=api_key, max_retries=0)
+    return _client
+
 
 # Pydantic models for structured output
 class Scores(BaseModel):
@@ -41,9 +73,11 @@ class EvaluationResponse(BaseModel):
     explanations: Explanations
 
 
-def get_gold_reference_by_query(query: str, gold_file_path: str = "data/theperspective/data.jsonl") -> Optional[List[Dict]]:
+def get_gold_reference_by_query(query: str, gold_file_path: str = DEFAULT_GOLD_FILE,
+                                gold_id: Optional[str] = None) -> Optional[List[Dict]]:
     """
-    Retrieves the gold reference by matching query text (title field) from the JSONL file.
+    Retrieves the gold reference by example id, or by matching query text (title field),
+    from the shared gold reference index (data.jsonl is parsed once per process).
     
     Returns the gold reference in the same format as the actual summaries:
     [
@@ -59,73 +93,29 @@ def get_gold_reference_by_query(query: str, gold_file_path: str = "data/thepersp
     ]
     """
     try:
-        with open(gold_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                item = json.loads(line.strip())
-                if item.get("title", "").strip() == query.strip():
-                    # Convert to match the actual summary format
-                    gold_summary = []
-                    
-                    # First claim (t1) with perspectives from response1
-                    claim1_perspectives = []
-                    favor_ids = item.get("favor_ids", [])
-                    for i, point_text in enumerate(item.get("response1", [])):
-                        claim1_perspectives.append({
-                            "text": point_text,
-                            "evidence_docs": [favor_ids[i]] if i < len(favor_ids) else []
-                        })
-                    gold_summary.append({
-                        "claim": item.get("t1", ""),
-                        "perspectives": claim1_perspectives
-                    })
-                    
-                    # Second claim (t2) with perspectives from response2
-                    claim2_perspectives = []
-                    against_ids = item.get("against_ids", [])
-                    for i, point_text in enumerate(item.get("response2", [])):
-                        claim2_perspectives.append({
-                            "text": point_text,
-                            "evidence_docs": [against_ids[i]] if i < len(against_ids) else []
-                        })
-                    gold_summary.append({
-                        "claim": item.get("t2", ""),
-                        "perspectives": claim2_perspectives
-                    })
-                    
-                    return gold_summary
+        return get_gold_index(gold_file_path).get(query, gold_id=gold_id)
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Error loading gold data: {e}")
     return None
 
 
-def extract_web_docs_from_merged(query: str, merged_file_path: str) -> List[Dict]:
+def extract_web_docs_from_merged(query: str, merged_file_path: str, entry_id: Optional[str] = None) -> List[Dict]:
     """
     Extract web docs (URL entries) for a query from merged corpus file.
     
+    The file is parsed once per process and indexed by query and id (see
+    src.utils.io.MergedCorpusStore); the returned docs are new {"id", "content"} dicts.
+    
     Args:
         query: Query text to match
         merged_file_path: Path to merged corpus JSON file
+        entry_id: Optional positional id ("query_{i}") of the entry, used when its query matches
         
     Returns:
         List of web docs where id is a string starting with "https://"
     """
     try:
-        with open(merged_file_path, 'r', encoding='utf-8') as f:
-            merged_data = json.load(f)
-            
-        for entry in merged_data:
-            if entry.get("query", "").strip() == query.strip():
-                merged_docs = entry.get("merged", [])
-                web_docs = []
-                for doc in merged_docs:
-                    doc_id = doc.get("id", "")
-                    # Web docs have string IDs starting with "https://"
-                    if isinstance(doc_id, str) and doc_id.startswith("https://"):
-                        web_docs.append({
-                            "id": doc_id,
-                            "content": doc.get("content", "")
-                        })
-                return web_docs
+        return get_merged_store(merged_file_path).web_docs(query, entry_id=entry_id)
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Error loading merged corpus: {e}")
     return []
@@ -137,7 +127,8 @@ def is_error_summary(summary: Union[List, Dict], is_merged: bool = False) -> boo
     
     Args:
         summary: Summary to check (can be list of claims or dict with summary field)
-        is_merged: True if from merged summaries, False if from offline summaries
+        is_merged: True if from merged summaries, False if from offline summaries (both
+                   summarizers now share one fallback marker, so it no longer changes the result)
         
     Returns:
         True if summary contains error patterns, False otherwise
@@ -161,58 +152,66 @@ def is_error_summary(summary: Union[List, Dict], is_merged: bool = False) -> boo
                 continue
             text = perspective.get("text", "")
             
-            if is_merged:
-                # Merged summary error patterns
-                if "JSON parse errors 5+ times (prompt too long)" in text:
-                    return True
-                if "All 10 generation attempts failed" in text:
-                    return True
-            else:
-                # Offline summary error patterns
-                if text.startswith("Error generating summary:"):
-                    return True
+            # Fallback texts of both summarizers (and of older summary files)
+            if is_fallback_text(text):
+                return True
     
     return False
 
 
-def llm_score_summary(
+def _parse_evaluation(client: OpenAI, model: str, prompt: str):
+    # Use Responses API with Structured Outputs via Pydantic model
+    # This guarantees schema adherence - no need for retries or fallback parsing
+    return client.responses.parse(
+        model=model,
+        input=[
+            {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        text_format=EvaluationResponse,
+        reasoning={"effort": "minimal"}
+    )
+
+
+def _parse_with_backoff(client: OpenAI, model: str, prompt: str, limiter=None):
+    """Call the judge, backing off (and lowering the limiter's concurrency) on rate limits."""
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        try:
+            if limiter is None:
+                return _parse_evaluation(client, model, prompt)
+            with limiter:
+                response = _parse_evaluation(client, model, prompt)
+            limiter.on_success()
+            return response
+        except RateLimitError:
+            if limiter is not None:
+                limiter.on_rate_limit()
+            if attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            sleep_backoff(attempt)
+
+
+def _error_scores(error: str, raw_response: str = "") -> Dict:
+    """Score dict with every criterion at 0 and the given error."""
+    return {
+        "error": error,
+        "total_score": 0,
+        "criterion_1_claim_relevance": 0,
+        "criterion_2_perspective_claim_alignment": 0,
+        "criterion_3_perspective_distinctness": 0,
+        "criterion_4_coverage_of_core_arguments": 0,
+        "criterion_5_factual_grounding": 0,
+        "raw_response": raw_response
+    }
+
+
+def build_judge_prompt(
     summary: Union[List, Dict],
     query: str,
-    reference: Optional[List[Dict]] = None,
-    web_docs: Optional[List[Dict]] = None,
-    model: str = "gpt-5-nano-2025-08-07"
-) -> Dict:
-    """
-    Evaluate summary quality using the improved 5-criteria rubric.
-    
-    Uses the Responses API with Structured Outputs via Pydantic models for guaranteed
-    schema adherence. Structured Outputs ensures valid JSON that matches the schema.
-    
-    Args:
-        summary: AI-generated summary (list of claims or dict with summary field)
-        query: The original query text
-        reference: Optional gold reference (list format matching summary structure); if None, retrieves by query text
-        web_docs: Optional list of web docs (for merged summaries)
-        model: OpenAI model to use (must support Structured Outputs, e.g., gpt-4o-2024-08-06)
-    
-    Returns:
-        dict with detailed scores per criterion, total_score, explanations, and raw_response.
-        If the model refuses or an API error occurs, includes "error" field.
-    """
-    # Get gold reference if not provided
-    if not reference:
-        reference = get_gold_reference_by_query(query)
-    if not reference:
-        return {
-            "error": "Gold standard not found for this query.",
-            "total_score": 0,
-            "criterion_1_claim_relevance": 0,
-            "criterion_2_perspective_claim_alignment": 0,
-            "criterion_3_perspective_distinctness": 0,
-            "criterion_4_coverage_of_core_arguments": 0,
-            "criterion_5_factual_grounding": 0
-        }
-    
+    reference: List[Dict],
+    web_docs: Optional[List[Dict]] = None
+) -> str:
+    """Build the rubric prompt for one summary (same prompt for offline and online summaries)."""
     # Handle different summary formats
     if isinstance(summary, dict):
         summary_list = summary.get("summary", summary.get("summaries", []))
@@ -234,8 +233,7 @@ Gold Summary (for reference): {gold_str}"""
         ])
         evidence_context += f"\n\nAdditional Web Evidence:\n{web_context}"
     
-    # Unified prompt (same for offline and online)
-    prompt = f"""You are evaluating a multi-perspective summary. Judge the summary based on the criteria below, assigning points for each category.
+    return f"""You are evaluating a multi-perspective summary. Judge the summary based on the criteria below, assigning points for each category.
 
 {evidence_context}
 
@@ -293,24 +291,166 @@ INSTRUCTIONS:
 - Assign points for each criterion (0, 1, or 2)
 - Return your evaluation in the specified structured format"""
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY not set in environment")
+
+def _strict_json_schema(schema):
+    """Close every object of a JSON schema and require all its properties (OpenAI strict mode)."""
+    if isinstance(schema, dict):
+        if schema.get("type") == "object" and "properties" in schema:
+            schema["additionalProperties"] = False
+            schema["required"] = list(schema["properties"])
+        for value in schema.values():
+            _strict_json_schema(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            _strict_json_schema(value)
+    return schema
+
+
+# Structured-output format of the judge response, as responses.parse(text_format=EvaluationResponse) sends it
+JUDGE_TEXT_FORMAT = {
+    "type": "json_schema",
+    "name": EvaluationResponse.__name__,
+    "schema": _strict_json_schema(EvaluationResponse.model_json_schema()),
+    "strict": True,
+}
+
+
+def judge_request_body(prompt: str, model: str) -> Dict:
+    """Responses API request body for one judge call (as sent by llm_score_summary)."""
+    return {
+        "model": model,
+        "input": [
+            {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "text": {"format": JUDGE_TEXT_FORMAT},
+        "reasoning": {"effort": "minimal"}
+    }
+
+
+def _scores_from_evaluation(parsed: EvaluationResponse, raw_response: str) -> Dict:
+    scores = parsed.scores
+    explanations = parsed.explanations
+    
+    # Calculate total score by summing individual criterion scores
+    total_score = (
+        scores.criterion_1_claim_relevance +
+        scores.criterion_2_perspective_claim_alignment +
+        scores.criterion_3_perspective_distinctness +
+        scores.criterion_4_coverage_of_core_arguments +
+        scores.criterion_5_factual_grounding
+    )
+    
+    # Build explanation text
+    explanations_text = "\n\n".join([
+        f"Criterion {i+1}: {getattr(explanations, f'criterion_{i+1}', '')}"
+        for i in range(5)
+    ])
+    
+    return {
+        "criterion_1_claim_relevance": scores.criterion_1_claim_relevance,
+        "criterion_2_perspective_claim_alignment": scores.criterion_2_perspective_claim_alignment,
+        "criterion_3_perspective_distinctness": scores.criterion_3_perspective_distinctness,
+        "criterion_4_coverage_of_core_arguments": scores.criterion_4_coverage_of_core_arguments,
+        "criterion_5_factual_grounding": scores.criterion_5_factual_grounding,
+        "total_score": total_score,
+        "explanations": {
+            "criterion_1": explanations.criterion_1,
+            "criterion_2": explanations.criterion_2,
+            "criterion_3": explanations.criterion_3,
+            "criterion_4": explanations.criterion_4,
+            "criterion_5": explanations.criterion_5,
+        },
+        "raw_response": raw_response,
+        "explanation": explanations_text
+    }
+
+
+def cached_scores(cache, request_body: Dict) -> Optional[Dict]:
+    """Score dict rebuilt from a JudgeCache entry for a request body, or None on a miss."""
+    raw_response = cache.get(request_body)
+    if raw_response is None:
+        return None
+    try:
+        parsed = EvaluationResponse.model_validate_json(raw_response)
+    except ValueError:
+        return None
+    return _scores_from_evaluation(parsed, raw_response)
+
+
+def scores_from_response_body(body: Dict) -> Dict:
+    """
+    Score dict (as returned by llm_score_summary) from a raw Responses API body, e.g. one
+    line of an OpenAI Batch API output file.
+    """
+    texts = []
+    for item in body.get("output") or []:
+        if item.get("type") != "message":
+            continue
+        for content_item in item.get("content") or []:
+            if content_item.get("type") == "refusal":
+                refusal_reason = content_item.get("refusal", "Unknown reason")
+                return _error_scores(f"Model refused to respond: {refusal_reason}",
+                                     json.dumps({"refusal": refusal_reason}, indent=2))
+            if content_item.get("type") == "output_text":
+                texts.append(content_item.get("text", ""))
+    raw_response = "".join(texts)
+    try:
+        parsed = EvaluationResponse.model_validate_json(raw_response)
+    except ValueError as e:
+        return _error_scores(f"Invalid judge response: {str(e)[:200]}", raw_response)
+    return _scores_from_evaluation(parsed, raw_response)
+
+
+def llm_score_summary(
+    summary: Union[List, Dict],
+    query: str,
+    reference: Optional[List[Dict]] = None,
+    web_docs: Optional[List[Dict]] = None,
+    model: str = "gpt-5-nano-2025-08-07",
+    limiter=None,
+    gold_id: Optional[str] = None,
+    cache=None
+) -> Dict:
+    """
+    Evaluate summary quality using the improved 5-criteria rubric.
     
-    client = OpenAI(api_key=api_key)
+    Uses the Responses API with Structured Outputs via Pydantic models for guaranteed
+    schema adherence. Structured Outputs ensures valid JSON that matches the schema.
+    
+    Args:
+        summary: AI-generated summary (list of claims or dict with summary field)
+        query: The original query text
+        reference: Optional gold reference (list format matching summary structure); if None, retrieves by query text
+        web_docs: Optional list of web docs (for merged summaries)
+        model: OpenAI model to use (must support Structured Outputs, e.g., gpt-4o-2024-08-06)
+        limiter: Optional AdaptiveConcurrency bounding in-flight API calls across threads;
+                 rate limits lower its limit
+        gold_id: Optional example id used to pick the gold reference (disambiguates
+                 duplicate query titles); falls back to matching the query text
+        cache: Optional JudgeCache; a cached response for the same request is returned
+               without calling the API, and new successful responses are stored
+    
+    Returns:
+        dict with detailed scores per criterion, total_score, explanations, and raw_response.
+        If the model refuses or an API error occurs, includes "error" field.
+    """
+    # Get gold reference if not provided
+    if not reference:
+        reference = get_gold_reference_by_query(query, gold_id=gold_id)
+    if not reference:
+        return _error_scores("Gold standard not found for this query.")
+    
+    prompt = build_judge_prompt(summary, query, reference, web_docs)
+    if cache is not None:
+        request_body = judge_request_body(prompt, model)
+        scores = cached_scores(cache, request_body)
+        if scores is not None:
+            return scores
+    client = get_client()
     
     try:
-        # Use Responses API with Structured Outputs via Pydantic model
-        # This guarantees schema adherence - no need for retries or fallback parsing
-        response = client.responses.parse(
-            model=model,
-            input=[
-                {"role": "system", "content": "You are evaluating a multi-perspective summary. Judge the summary based on the criteria provided, assigning points for each category."},
-                {"role": "user", "content": prompt}
-            ],
-            text_format=EvaluationResponse,
-	    reasoning={"effort": "minimal"}
-        )
+        response = _parse_with_backoff(client, model, prompt, limiter)
         
         # Check for refusal (Structured Outputs feature)
         if response.output:
@@ -321,68 +461,18 @@ INSTRUCTIONS:
                             if hasattr(content_item, 'type') and content_item.type == 'refusal':
                                 refusal_reason = getattr(content_item, 'refusal', 'Unknown reason')
                                 raw_response = getattr(response, 'output_text', '') or json.dumps({"refusal": refusal_reason}, indent=2)
-                                return {
-                                    "error": f"Model refused to respond: {refusal_reason}",
-                                    "total_score": 0,
-                                    "criterion_1_claim_relevance": 0,
-                                    "criterion_2_perspective_claim_alignment": 0,
-                                    "criterion_3_perspective_distinctness": 0,
-                                    "criterion_4_coverage_of_core_arguments": 0,
-                                    "criterion_5_factual_grounding": 0,
-                                    "raw_response": raw_response
-                                }
+                                return _error_scores(f"Model refused to respond: {refusal_reason}", raw_response)
         
         # Extract parsed output (guaranteed to match schema with Structured Outputs)
         parsed = response.output_parsed
-        scores = parsed.scores
-        explanations = parsed.explanations
-        
-        # Calculate total score by summing individual criterion scores
-        total_score = (
-            scores.criterion_1_claim_relevance +
-            scores.criterion_2_perspective_claim_alignment +
-            scores.criterion_3_perspective_distinctness +
-            scores.criterion_4_coverage_of_core_arguments +
-            scores.criterion_5_factual_grounding
-        )
-        
-        # Build explanation text
-        explanations_text = "\n\n".join([
-            f"Criterion {i+1}: {getattr(explanations, f'criterion_{i+1}', '')}"
-            for i in range(5)
-        ])
         
         # Get raw response text for logging
         raw_response = getattr(response, 'output_text', '') or json.dumps(parsed.model_dump(), indent=2)
         
-        return {
-            "criterion_1_claim_relevance": scores.criterion_1_claim_relevance,
-            "criterion_2_perspective_claim_alignment": scores.criterion_2_perspective_claim_alignment,
-            "criterion_3_perspective_distinctness": scores.criterion_3_perspective_distinctness,
-            "criterion_4_coverage_of_core_arguments": scores.criterion_4_coverage_of_core_arguments,
-            "criterion_5_factual_grounding": scores.criterion_5_factual_grounding,
-            "total_score": total_score,
-            "explanations": {
-                "criterion_1": explanations.criterion_1,
-                "criterion_2": explanations.criterion_2,
-                "criterion_3": explanations.criterion_3,
-                "criterion_4": explanations.criterion_4,
-                "criterion_5": explanations.criterion_5,
-            },
-            "raw_response": raw_response,
-            "explanation": explanations_text
-        }
+        if cache is not None:
+            cache.put(request_body, raw_response)
+        return _scores_from_evaluation(parsed, raw_response)
         
     except Exception as e:
         # Handle API errors (network issues, rate limits, etc.)
-        error_msg = str(e)
-        return {
-            "error": f"API error: {error_msg}",
-            "total_score": 0,
-            "criterion_1_claim_relevance": 0,
-            "criterion_2_perspective_claim_alignment": 0,
-            "criterion_3_perspective_distinctness": 0,
-            "criterion_4_coverage_of_core_arguments": 0,
-            "criterion_5_factual_grounding": 0,
-            "raw_response": ""
-        }
+        return _error_scores(f"API error: {str(e)}")
@@ -21,28 +21,63 @@ Usage:
       --summary-file results/merged-summaries/results-merged-5-20251215_082353.json \
       --indices 0,2,4
 
+    # Concurrent judging: up to 8 calls in flight, halved on rate limits (no fixed delay)
+    python src/evaluation/run_llm_judge_batch.py --concurrency 8
+
+    # Benchmark against a local OpenAI-compatible mock server
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python src/evaluation/run_llm_judge_batch.py --concurrency 8
+
+    # Offline OpenAI Batch API: batch jobs for all files (cheaper; results within 24h)
+    python src/evaluation/run_llm_judge_batch.py --batch-api
+
+    # Re-join a saved batch results file without calling the API
+    python src/evaluation/run_llm_judge_batch.py \
+      --batch-results results/evaluation/batch/llm-judge-20251215_120000-results.jsonl
+
+Judge responses are cached per request (summary, gold reference, web-doc context, rubric
+prompt and model) in data/cache/judge_cache.sqlite, so re-runs only call the API for new or
+changed summaries, and editing the rubric invalidates old entries (use --no-cache to bypass).
+
 Output: results/evaluation/{offline|merged}/{type}_{k}_llm_judge_scores_{timestamp}.json
 """
 
+import sys
 import json
+import hashlib
 import argparse
 import time
 import re
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# Add project root to path so imports work when running directly
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.concurrency import AdaptiveConcurrency
+from src.utils.openai_batch import DEFAULT_POLL_INTERVAL, batch_request, run_batch
 from llm_as_judge import (
     llm_score_summary,
     extract_web_docs_from_merged,
-    is_error_summary
+    is_error_summary,
+    get_client,
+    get_gold_reference_by_query,
+    build_judge_prompt,
+    judge_request_body,
+    cached_scores,
+    scores_from_response_body
 )
+from judge_cache import JudgeCache
 
 
 DEFAULT_MODEL = "gpt-5-nano-2025-08-07"
 MERGED_CORPUS_DIR = "data/merged-corpus"
 OFFLINE_SUMMARIES_DIR = "results/offline-summaries-JSON-enforced"
 MERGED_SUMMARIES_DIR = "results/merged-summaries"
+BATCH_DIR = "results/evaluation/batch"
+JUDGE_ENDPOINT = "/v1/responses"
 
 
 def extract_k_from_filename(file_path: str, summary_type: str) -> str:
@@ -147,6 +182,20 @@ def discover_summary_files() -> List[str]:
     return files
 
 
+def unique_summary_files(summary_files: List[str]) -> List[str]:
+    """Drop repeated summary files (also different spellings of one path), keeping the first."""
+    unique = {}
+    for summary_file in summary_files:
+        unique.setdefault(Path(summary_file).resolve(), summary_file)
+    return list(unique.values())
+
+
+def batch_custom_id(summary_file_path: Path, i: int) -> str:
+    """Batch custom_id of entry i of a summary file: a short hash of its resolved path, its stem and i."""
+    path_hash = hashlib.sha256(str(Path(summary_file_path).resolve()).encode("utf-8")).hexdigest()[:12]
+    return f"{path_hash}/{Path(summary_file_path).stem}:{i}"
+
+
 def find_merged_corpus_file(summary_file_path: str) -> Optional[str]:
     """
     Find corresponding merged corpus file based on summary file.
@@ -180,25 +229,17 @@ def find_merged_corpus_file(summary_file_path: str) -> Optional[str]:
     return None
 
 
-def process_summary_file(
+def load_summary_entries(
     summary_file_path: str,
     limit: Optional[int] = None,
-    indices: Optional[List[int]] = None,
-    delay: float = 1.0,
-    model: str = DEFAULT_MODEL
+    indices: Optional[List[int]] = None
 ) -> Dict:
     """
-    Process a single summary file and evaluate summaries.
+    Load a summary file and apply the subset filters.
     
-    Args:
-        summary_file_path: Path to summary file
-        limit: Limit number of summaries to evaluate
-        indices: Specific indices to evaluate (overrides limit)
-        delay: Delay between API calls (seconds)
-        model: OpenAI model to use
-        
     Returns:
-        Dict with evaluation results
+        Dict with the file path, summary_type, is_merged, merged_corpus_path and the
+        selected summaries
     """
     summary_file_path = Path(summary_file_path)
     if not summary_file_path.exists():
@@ -244,108 +285,262 @@ def process_summary_file(
     
     print(f"Evaluating {len(summaries)} summaries from {summary_file_path.name} ({summary_type} type)...\n")
     
-    results = []
-    skipped_errors = 0
+    return {
+        "path": summary_file_path,
+        "summary_type": summary_type,
+        "is_merged": is_merged,
+        "merged_corpus_path": merged_corpus_path,
+        "summaries": summaries
+    }
+
+
+def prepare_entry(i: int, entry, loaded: Dict) -> Optional[Dict]:
+    """
+    Extract query, id, summary and web docs of one summary entry.
     
-    for i, entry in enumerate(summaries):
-        query = entry.get("query", "")
-        entry_id = entry.get("id", None) if isinstance(entry, dict) else None
-        
-        # Handle summary extraction: prefer "summary" key, fallback to entire entry if it's a dict
-        if isinstance(entry, dict) and "summary" in entry:
-            summary = entry.get("summary")
-        elif isinstance(entry, dict):
-            # If entry is a dict but no "summary" key, use the whole entry
-            summary = entry
-        else:
-            # If entry is not a dict, use it directly
-            summary = entry
-        
-        print(f"[{i+1}/{len(summaries)}] {query[:60] if query else 'No query'}...")
-        
-        # Check if this is an error summary
-        if is_error_summary(summary, is_merged=is_merged):
-            print(f"    Skipping error summary")
-            skipped_errors += 1
-            continue
+    Returns:
+        Dict with query, entry_id, summary and web_docs, or None for error summaries
+    """
+    query = entry.get("query", "")
+    entry_id = entry.get("id", None) if isinstance(entry, dict) else None
+    
+    # Handle summary extraction: prefer "summary" key, fallback to entire entry if it's a dict
+    if isinstance(entry, dict) and "summary" in entry:
+        summary = entry.get("summary")
+    elif isinstance(entry, dict):
+        # If entry is a dict but no "summary" key, use the whole entry
+        summary = entry
+    else:
+        # If entry is not a dict, use it directly
+        summary = entry
+    
+    print(f"[{i+1}/{len(loaded['summaries'])}] {query[:60] if query else 'No query'}...")
+    
+    # Check if this is an error summary
+    if is_error_summary(summary, is_merged=loaded["is_merged"]):
+        print(f"    Skipping error summary")
+        return None
+    
+    # Extract web docs if merged summary
+    web_docs = []
+    if loaded["is_merged"] and loaded["merged_corpus_path"]:
+        web_docs = extract_web_docs_from_merged(query, loaded["merged_corpus_path"], entry_id=entry_id)
+        if web_docs:
+            print(f"    Found {len(web_docs)} web docs")
+    
+    return {"query": query, "entry_id": entry_id, "summary": summary, "web_docs": web_docs}
+
+
+def make_result_entry(entry_id, query: str, scores: Dict) -> Dict:
+    """Result entry in the output file layout."""
+    return {
+        "id": entry_id,
+        "query": query,
+        "scores": {
+            "criterion_1_claim_relevance": scores.get("criterion_1_claim_relevance", 0),
+            "criterion_2_perspective_claim_alignment": scores.get("criterion_2_perspective_claim_alignment", 0),
+            "criterion_3_perspective_distinctness": scores.get("criterion_3_perspective_distinctness", 0),
+            "criterion_4_coverage_of_core_arguments": scores.get("criterion_4_coverage_of_core_arguments", 0),
+            "criterion_5_factual_grounding": scores.get("criterion_5_factual_grounding", 0),
+            "total_score": scores.get("total_score", 0)
+        },
+        "error": scores.get("error"),
+        "raw_response": scores.get("raw_response", "")
+    }
+
+
+def _file_results(loaded: Dict, results_by_index: Dict) -> Dict:
+    """Collect per-entry results (None = skipped error summary) in summary-file order."""
+    results = [results_by_index[i] for i in range(len(loaded["summaries"])) if results_by_index[i] is not None]
+    return {
+        "summary_file": str(loaded["path"]),
+        "summary_type": loaded["summary_type"],
+        "num_evaluated": len(results),
+        "num_skipped_errors": len(loaded["summaries"]) - len(results),
+        "results": results
+    }
+
+
+def process_summary_file(
+    summary_file_path: str,
+    limit: Optional[int] = None,
+    indices: Optional[List[int]] = None,
+    delay: float = 1.0,
+    model: str = DEFAULT_MODEL,
+    concurrency: int = 1,
+    limiter: Optional[AdaptiveConcurrency] = None,
+    cache: Optional[JudgeCache] = None
+) -> Dict:
+    """
+    Process a single summary file and evaluate summaries.
+    
+    Args:
+        summary_file_path: Path to summary file
+        limit: Limit number of summaries to evaluate
+        indices: Specific indices to evaluate (overrides limit)
+        delay: Delay between API calls (seconds); only used when concurrency is 1
+        model: OpenAI model to use
+        concurrency: Max API calls in flight; above 1, summaries are judged on a thread pool
+                     and an adaptive limiter replaces the fixed delay
+        limiter: AdaptiveConcurrency to share across files (default: a new one per file)
+        cache: Optional JudgeCache; summaries judged before with the same request are not
+               sent to the API again
         
-        # Extract web docs if merged summary
-        web_docs = []
-        if is_merged and merged_corpus_path:
-            web_docs = extract_web_docs_from_merged(query, merged_corpus_path)
-            if web_docs:
-                print(f"    Found {len(web_docs)} web docs")
+    Returns:
+        Dict with evaluation results (in summary-file order)
+    """
+    loaded = load_summary_entries(summary_file_path, limit, indices)
+    summaries = loaded["summaries"]
+    
+    if concurrency > 1 and limiter is None:
+        limiter = AdaptiveConcurrency(max_limit=concurrency)
+    
+    results_by_index = {}
+    
+    def evaluate(i: int, entry) -> Optional[Dict]:
+        """Judge one summary entry; returns its result entry, or None for error summaries."""
+        prepared = prepare_entry(i, entry, loaded)
+        if prepared is None:
+            return None
+        query = prepared["query"]
+        entry_id = prepared["entry_id"]
         
         # Evaluate summary
         try:
             scores = llm_score_summary(
-                summary=summary,
+                summary=prepared["summary"],
                 query=query,
-                web_docs=web_docs if web_docs else None,
-                model=model
+                web_docs=prepared["web_docs"] if prepared["web_docs"] else None,
+                model=model,
+                limiter=limiter,
+                gold_id=entry_id,
+                cache=cache
             )
             
-            result_entry = {
-                "id": entry_id,
-                "query": query,
-                "scores": {
-                    "criterion_1_claim_relevance": scores.get("criterion_1_claim_relevance", 0),
-                    "criterion_2_perspective_claim_alignment": scores.get("criterion_2_perspective_claim_alignment", 0),
-                    "criterion_3_perspective_distinctness": scores.get("criterion_3_perspective_distinctness", 0),
-                    "criterion_4_coverage_of_core_arguments": scores.get("criterion_4_coverage_of_core_arguments", 0),
-                    "criterion_5_factual_grounding": scores.get("criterion_5_factual_grounding", 0),
-                    "total_score": scores.get("total_score", 0)
-                },
-                "error": scores.get("error"),
-                "raw_response": scores.get("raw_response", "")
-            }
-            results.append(result_entry)
-            
-            print(f"    Score: {scores.get('total_score', 'N/A')}/10")
+            print(f"    [{i+1}] Score: {scores.get('total_score', 'N/A')}/10")
             if scores.get("error"):
-                print(f"    Error: {scores.get('error')}")
-            print()
+                print(f"    [{i+1}] Error: {scores.get('error')}")
+            return make_result_entry(entry_id, query, scores)
             
         except Exception as e:
             error_msg = str(e)
-            print(f"    Error evaluating: {error_msg}\n")
-            
-            # Try to preserve any partial results if available
-            raw_response = ""
-            partial_scores = {}
-            try:
-                # If llm_score_summary was called but failed, we might not have scores
-                # But we can at least preserve the query
-                pass
-            except:
-                pass
-            
-            results.append({
-                "id": entry_id,
-                "query": query,
-                "scores": {
-                    "criterion_1_claim_relevance": 0,
-                    "criterion_2_perspective_claim_alignment": 0,
-                    "criterion_3_perspective_distinctness": 0,
-                    "criterion_4_coverage_of_core_arguments": 0,
-                    "criterion_5_factual_grounding": 0,
-                    "total_score": 0
-                },
-                "error": error_msg,
-                "raw_response": raw_response
-            })
+            print(f"    [{i+1}] Error evaluating: {error_msg}\n")
+            return make_result_entry(entry_id, query, {"error": error_msg})
+    
+    start_time = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(evaluate, i, entry): i for i, entry in enumerate(summaries)}
+            for future in as_completed(futures):
+                results_by_index[futures[future]] = future.result()
+    else:
+        for i, entry in enumerate(summaries):
+            hits_before = cache.hits if cache is not None else 0
+            results_by_index[i] = evaluate(i, entry)
+            print()
+            # Delay between API calls (cached results made none)
+            cache_hit = cache is not None and cache.hits > hits_before
+            if results_by_index[i] is not None and not cache_hit and i < len(summaries) - 1:
+                time.sleep(delay)
+    elapsed = time.perf_counter() - start_time
+    
+    file_results = _file_results(loaded, results_by_index)
+    print(f"Judged {file_results['num_evaluated']} summaries in {elapsed:.1f}s "
+          f"({file_results['num_evaluated'] / max(elapsed, 1e-9):.2f}/s)")
+    if limiter is not None:
+        print(f"Rate-limited responses: {limiter.rate_limited}, current concurrency: {limiter.limit}")
+    
+    return file_results
+
+
+def judge_files_with_batch(
+    summary_files: List[str],
+    limit: Optional[int] = None,
+    indices: Optional[List[int]] = None,
+    model: str = DEFAULT_MODEL,
+    replay_path: Optional[str] = None,
+    work_dir: str = BATCH_DIR,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    cache: Optional[JudgeCache] = None
+) -> List[Dict]:
+    """
+    Judge all summary files through one OpenAI Batch API job (or replay its saved results).
+    
+    Every judge request is written to a JSONL batch file with custom_id
+    "{resolved path hash}/{summary file stem}:{index}" (see batch_custom_id),
+    submitted and polled until done (split into several batches if large); the responses are then
+    joined back to their entries. Requests without a usable response get an error entry.
+    Requests answered in the cache are not submitted.
+    
+    Args:
+        summary_files: Summary files to judge, each at most once (see unique_summary_files)
+        limit / indices: Subset filters, as for process_summary_file (must match the
+                         original run when replaying)
+        model: OpenAI model to use
+        replay_path: Saved batch results file to join instead of submitting a batch
+        work_dir: Directory for batch request/result files
+        poll_interval: Seconds between batch status checks
+        cache: Optional JudgeCache read before submitting and updated with new responses
         
-        # Delay between API calls
-        if i < len(summaries) - 1:
-            time.sleep(delay)
+    Returns:
+        List of per-file result dicts, as returned by process_summary_file, in summary_files order
+
+    Raises:
+        ValueError: a summary file is listed more than once (its custom_ids would collide)
+    """
+    if len(unique_summary_files(summary_files)) != len(summary_files):
+        raise ValueError("Summary files must be unique; filter them with unique_summary_files first")
+    loaded_files = [load_summary_entries(summary_file, limit, indices) for summary_file in summary_files]
     
-    return {
-        "summary_file": str(summary_file_path),
-        "summary_type": summary_type,
-        "num_evaluated": len(results),
-        "num_skipped_errors": skipped_errors,
-        "results": results
-    }
+    requests = []
+    pending = []
+    results_by_file = []
+    for loaded in loaded_files:
+        results_by_index = {}
+        for i, entry in enumerate(loaded["summaries"]):
+            prepared = prepare_entry(i, entry, loaded)
+            if prepared is None:
+                results_by_index[i] = None
+                continue
+            reference = get_gold_reference_by_query(prepared["query"], gold_id=prepared["entry_id"])
+            if not reference:
+                results_by_index[i] = make_result_entry(prepared["entry_id"], prepared["query"],
+                                                        {"error": "Gold standard not found for this query."})
+                continue
+            prompt = build_judge_prompt(prepared["summary"], prepared["query"], reference,
+                                        prepared["web_docs"] or None)
+            request_body = judge_request_body(prompt, model)
+            scores = cached_scores(cache, request_body) if cache is not None else None
+            if scores is not None:
+                results_by_index[i] = make_result_entry(prepared["entry_id"], prepared["query"], scores)
+                continue
+            custom_id = batch_custom_id(loaded["path"], i)
+            requests.append(batch_request(custom_id, JUDGE_ENDPOINT, request_body))
+            pending.append((results_by_index, i, custom_id, prepared, request_body))
+        results_by_file.append(results_by_index)
+    
+    print(f"\n{len(requests)} judge requests for {len(loaded_files)} file(s)")
+    batch_results = run_batch(requests, JUDGE_ENDPOINT, work_dir, "llm-judge",
+                              client=None if replay_path else get_client(),
+                              poll_interval=poll_interval, replay_path=replay_path)
+    
+    missing = 0
+    for results_by_index, i, custom_id, prepared, request_body in pending:
+        result = batch_results.get(custom_id)
+        if result is None or result["body"] is None:
+            missing += 1
+            error = result["error"] if result is not None else "No batch result for this request"
+            scores = {"error": f"Batch request failed: {error}"}
+        else:
+            scores = scores_from_response_body(result["body"])
+            if cache is not None and not scores.get("error"):
+                cache.put(request_body, scores["raw_response"])
+        results_by_index[i] = make_result_entry(prepared["entry_id"], prepared["query"], scores)
+    if missing:
+        print(f"Warning: {missing}/{len(pending)} judge requests have no usable batch result")
+    
+    return [_file_results(loaded, results_by_index)
+            for loaded, results_by_index in zip(loaded_files, results_by_file)]
 
 
 def main():
@@ -374,6 +569,35 @@ def main():
         default=1.0,
         help="Delay between API calls in seconds (default: 1.0)"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Max judge calls in flight (default: 1 = sequential with --delay). Above 1, an adaptive "
+             "limiter halves concurrency on rate limits instead of sleeping a fixed delay."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the persistent judge cache (data/cache/judge_cache.sqlite)"
+    )
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Submit all judge requests as OpenAI Batch API jobs (split when over the per-batch limits) and poll "
+             "them, instead of calling the API per summary"
+    )
+    parser.add_argument(
+        "--batch-results",
+        help="Replay a saved batch results file (from --batch-api) instead of calling the API; "
+             "use the same files, --limit and --indices as the original run"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=f"Seconds between batch status checks with --batch-api (default: {DEFAULT_POLL_INTERVAL:.0f})"
+    )
     parser.add_argument(
         "--model",
         default=DEFAULT_MODEL,
@@ -397,7 +621,9 @@ def main():
     
     # Get summary files: use provided files or auto-discover
     if args.summary_file:
-        summary_files = args.summary_file
+        summary_files = unique_summary_files(args.summary_file)
+        if len(summary_files) != len(args.summary_file):
+            print(f"Ignoring {len(args.summary_file) - len(summary_files)} repeated --summary-file path(s)")
     else:
         summary_files = discover_summary_files()
         if not summary_files:
@@ -417,14 +643,35 @@ def main():
     all_output_files = []
     all_file_results = []
     
-    for summary_file in summary_files:
-        file_results = process_summary_file(
-            summary_file_path=summary_file,
+    # One limiter for all files, so a rate-limited concurrency carries over to the next file
+    limiter = AdaptiveConcurrency(max_limit=args.concurrency) if args.concurrency > 1 else None
+    cache = None if args.no_cache else JudgeCache()
+    
+    if args.batch_api or args.batch_results:
+        batch_file_results = judge_files_with_batch(
+            summary_files,
             limit=args.limit,
             indices=indices,
-            delay=args.delay,
-            model=args.model
+            model=args.model,
+            replay_path=args.batch_results,
+            poll_interval=args.poll_interval,
+            cache=cache
         )
+    
+    for file_index, summary_file in enumerate(summary_files):
+        if args.batch_api or args.batch_results:
+            file_results = batch_file_results[file_index]
+        else:
+            file_results = process_summary_file(
+                summary_file_path=summary_file,
+                limit=args.limit,
+                indices=indices,
+                delay=args.delay,
+                model=args.model,
+                concurrency=args.concurrency,
+                limiter=limiter,
+                cache=cache
+            )
         all_file_results.append(file_results)
         
         # Determine output directory and filename based on summary type
@@ -469,6 +716,8 @@ def main():
     print(f"Files processed: {len(all_output_files)}")
     print(f"Total evaluated: {total_evaluated}")
     print(f"Total skipped (errors): {total_skipped}")
+    if cache is not None:
+        print(f"Judge cache: {cache.stats()}")
     print(f"\nResults saved to:")
     for output_file in all_output_files:
         print(f"  - {output_file}")
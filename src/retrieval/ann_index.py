@@ -0,0 +1,334 @@
+"""
+Approximate Nearest-Neighbor Index (IVF-PQ)
+
+Inverted-file index with product quantization over the dense vectors from
+dense_retrieval.py, for evidence pools too large for brute-force cosine search.
+
+- A k-means coarse quantizer splits the corpus into `nlist` inverted lists.
+- Each document's residual (vector minus its list centroid) is compressed to `m`
+  one-byte product-quantizer codes.
+- A query scans only the `nprobe` lists whose centroids score highest, scoring candidates
+  with per-query lookup tables, then re-ranks the best `refine * k` candidates exactly
+  against the memory-mapped dense store.
+
+The index is built offline, saved under data/index/ next to the dense store (same corpus
+fingerprint), and registered as `--method ann` in retrievers.py. Raising `nprobe` trades
+latency for recall; the benchmark below reports the trade-off against exact search.
+
+Usage:
+    from src.retrieval.ann_index import get_ann_index
+    index = get_ann_index(evidence, nprobe=8)
+    local_docs = index.search("climate change policy", k=5)
+
+    # Build offline and benchmark recall/latency vs exact search:
+    python -m src.retrieval.ann_index --corpus perspectrumx --benchmark --nprobe 1,2,4,8,16,32
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from src.retrieval.tfidf_retrieval import DEFAULT_INDEX_DIR
+from src.retrieval.dense_retrieval import DEFAULT_ENCODER, encode_texts, get_dense_index
+
+DEFAULT_NPROBE = 8
+DEFAULT_REFINE = 4
+
+# Module-level cache of opened indexes
+_index_cache = {}
+
+
+class IVFPQIndex:
+    """
+    IVF-PQ index over a DenseIndex. Search returns the same evidence dicts (with "score")
+    as the other retrievers.
+    """
+
+    def __init__(self, dense_index, centroids, codebooks, codes, list_offsets, list_docs,
+                 nprobe: int = DEFAULT_NPROBE, refine: int = DEFAULT_REFINE):
+        self.dense_index = dense_index
+        self.centroids = centroids        # (nlist, d) float32
+        self.codebooks = codebooks        # (m, ksub, d/m) float32
+        self.codes = codes                # (n, m) uint8, in inverted-list order
+        self.list_offsets = list_offsets  # (nlist + 1,) start of each list in codes/list_docs
+        self.list_docs = list_docs        # (n,) document index for each row of codes
+        self.nprobe = nprobe
+        self.refine = refine
+
+    @property
+    def evidence(self):
+        return self.dense_index.evidence
+
+    @staticmethod
+    def _paths(index_dir: str, dense_index):
+        slug = dense_index.model_name.split("/")[-1]
+        stem = Path(index_dir) / f"ann-ivfpq-{slug}-{dense_index.fingerprint[:16]}"
+        return {"meta": stem.with_suffix(".json"), "arrays": stem.with_suffix(".npz")}
+
+    @classmethod
+    def build(cls, dense_index, nlist: int = None, m: int = 8, seed: int = 0):
+        """
+        Train the coarse quantizer and product quantizer on the dense vectors.
+
+        Args:
+            dense_index: DenseIndex holding the corpus vectors
+            nlist: number of inverted lists (default: about 4 * sqrt(num_docs))
+            m: number of PQ sub-vectors; must divide the embedding dimension
+        """
+        vectors = np.asarray(dense_index.vectors, dtype=np.float32)
+        if dense_index.scales is not None:
+            vectors = vectors * dense_index.scales[:, None]
+        num_docs, dim = vectors.shape
+        if dim % m != 0:
+            raise ValueError(f"PQ sub-vector count m={m} must divide embedding dimension {dim}")
+        if nlist is None:
+            nlist = max(1, int(4 * np.sqrt(num_docs)))
+        nlist = min(nlist, num_docs)
+
+        print(f"Training IVF coarse quantizer (nlist={nlist}) on {num_docs} vectors...")
+        coarse = MiniBatchKMeans(n_clusters=nlist, random_state=seed, n_init=3, batch_size=4096)
+        assignments = coarse.fit_predict(vectors)
+        centroids = coarse.cluster_centers_.astype(np.float32)
+
+        print(f"Training product quantizer (m={m}, 256 codes per sub-vector)...")
+        residuals = vectors - centroids[assignments]
+        sub_dim = dim // m
+        ksub = min(256, num_docs)
+        codebooks = np.zeros((m, ksub, sub_dim), dtype=np.float32)
+        codes = np.zeros((num_docs, m), dtype=np.uint8)
+        for j in range(m):
+            sub = residuals[:, j * sub_dim:(j + 1) * sub_dim]
+            pq = KMeans(n_clusters=ksub, random_state=seed, n_init=1, max_iter=25)
+            codes[:, j] = pq.fit_predict(sub)
+            codebooks[j] = pq.cluster_centers_
+
+        # Lay out codes contiguously per inverted list
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(dense_index, centroids, codebooks, codes[order], list_offsets, order.astype(np.int64))
+
+    def save(self, index_dir: str = DEFAULT_INDEX_DIR):
+        """Persist quantizers and inverted lists under index_dir."""
+        paths = self._paths(index_dir, self.dense_index)
+        Path(index_dir).mkdir(parents=True, exist_ok=True)
+        np.savez(
+            paths["arrays"],
+            centroids=self.centroids,
+            codebooks=self.codebooks,
+            codes=self.codes,
+            list_offsets=self.list_offsets,
+            list_docs=self.list_docs,
+        )
+        meta = {
+            "fingerprint": self.dense_index.fingerprint,
+            "model": self.dense_index.model_name,
+            "num_docs": int(self.codes.shape[0]),
+            "nlist": int(self.centroids.shape[0]),
+            "m": int(self.codebooks.shape[0]),
+        }
+        with open(paths["meta"], "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, dense_index, index_dir: str = DEFAULT_INDEX_DIR, nprobe: int = DEFAULT_NPROBE,
+             refine: int = DEFAULT_REFINE):
+        """
+        Load a saved index for the dense store's corpus.
+
+        Returns:
+            IVFPQIndex, or None if no index matching the corpus fingerprint exists.
+        """
+        paths = cls._paths(index_dir, dense_index)
+        if not paths["meta"].exists() or not paths["arrays"].exists():
+            return None
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") != dense_index.fingerprint:
+            return None
+
+        arrays = np.load(paths["arrays"])
+        return cls(
+            dense_index,
+            arrays["centroids"],
+            arrays["codebooks"],
+            arrays["codes"],
+            arrays["list_offsets"],
+            arrays["list_docs"],
+            nprobe=nprobe,
+            refine=refine,
+        )
+
+    def _search_one(self, query_vector: np.ndarray, k: int, nprobe: int, refine: int):
+        """Approximate top-k for one normalized query vector."""
+        m, ksub, sub_dim = self.codebooks.shape
+        coarse_scores = self.centroids @ query_vector
+        nprobe = min(nprobe, len(coarse_scores))
+        probe = np.argpartition(-coarse_scores, nprobe - 1)[:nprobe]
+
+        # Lookup table: contribution of every PQ code in every sub-space to q . residual
+        lut = np.einsum("jcd,jd->jc", self.codebooks, query_vector.reshape(m, sub_dim))
+
+        cand_idx, cand_scores = [], []
+        for list_id in probe:
+            start, end = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+            if start == end:
+                continue
+            list_codes = self.codes[start:end]
+            approx = coarse_scores[list_id] + lut[np.arange(m), list_codes].sum(axis=1)
+            cand_idx.append(self.list_docs[start:end])
+            cand_scores.append(approx)
+        if not cand_idx:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        cand_idx = np.concatenate(cand_idx)
+        cand_scores = np.concatenate(cand_scores)
+
+        # Keep the best refine * k by approximate score, then re-rank exactly
+        keep = min(len(cand_idx), max(k, refine * k))
+        if keep < len(cand_idx):
+            top = np.argpartition(-cand_scores, keep - 1)[:keep]
+            cand_idx, cand_scores = cand_idx[top], cand_scores[top]
+        if refine > 0:
+            sorted_idx = np.sort(cand_idx)
+            exact = np.asarray(self.dense_index.vectors[sorted_idx], dtype=np.float32) @ query_vector
+            if self.dense_index.scales is not None:
+                exact *= self.dense_index.scales[sorted_idx]
+            cand_idx, cand_scores = sorted_idx, exact
+
+        order = np.argsort(-cand_scores, kind="stable")[:k]
+        return cand_idx[order], cand_scores[order]
+
+    def search_vectors(self, query_vectors: np.ndarray, k: int = 5, nprobe: int = None,
+                       refine: int = None):
+        """
+        Approximate top-k search for pre-encoded query vectors.
+        Returns:
+            list of (indices, scores) pairs, one per query, best first
+        """
+        nprobe = self.nprobe if nprobe is None else nprobe
+        refine = self.refine if refine is None else refine
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        return [self._search_one(q, k, nprobe, refine) for q in query_vectors]
+
+    def search(self, query: str, k: int = 5):
+        """
+        Retrieve approximate top-k documents for a single query.
+        Returns:
+            list[dict]: top-k evidence docs with an added "score" field
+        """
+        return self.search_batch([query], k=k)[0]
+
+    def search_batch(self, queries: list, k: int = 5):
+        """
+        Encode all queries in one batch and retrieve approximate top-k documents for each.
+        Returns:
+            list[list[dict]]: one top-k list per query, in input order
+        """
+        if not queries:
+            return []
+        if k <= 0:
+            return [[] for _ in queries]
+        query_vectors = encode_texts(queries, model_name=self.dense_index.model_name)
+        results = []
+        for indices, scores in self.search_vectors(query_vectors, k=k):
+            top_docs = []
+            for idx, score in zip(indices, scores):
+                doc = self.evidence[idx].copy()
+                doc["score"] = float(score)
+                top_docs.append(doc)
+            results.append(top_docs)
+        return results
+
+
+def get_ann_index(evidence: list, index_dir: str = DEFAULT_INDEX_DIR,
+                  model_name: str = DEFAULT_ENCODER, nprobe: int = DEFAULT_NPROBE,
+                  refine: int = DEFAULT_REFINE):
+    """
+    Return the IVF-PQ index for the evidence corpus, building and saving it (and the
+    underlying dense store) if none matching the corpus fingerprint exists.
+    """
+    dense_index = get_dense_index(evidence, index_dir=index_dir, model_name=model_name)
+    key = (model_name, dense_index.fingerprint)
+    if key not in _index_cache:
+        index = IVFPQIndex.load(dense_index, index_dir=index_dir)
+        if index is None:
+            index = IVFPQIndex.build(dense_index)
+            index.save(index_dir)
+        _index_cache[key] = index
+    index = _index_cache[key]
+    index.dense_index = dense_index
+    index.nprobe = nprobe
+    index.refine = refine
+    return index
+
+
+def benchmark(index, query_vectors: np.ndarray, k: int = 10, nprobes=(1, 2, 4, 8, 16, 32),
+              refine: int = DEFAULT_REFINE):
+    """
+    Compare IVF-PQ recall@k and latency against exact search over the dense store.
+
+    Returns:
+        list[dict]: one row per nprobe with recall_at_k and ms_per_query
+    """
+    start = time.perf_counter()
+    exact_idx, _ = index.dense_index.search_vectors(query_vectors, k=k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+    rows = [{"nprobe": "exact", "recall_at_k": 1.0, "ms_per_query": exact_ms}]
+
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        approx = index.search_vectors(query_vectors, k=k, nprobe=nprobe, refine=refine)
+        ms = (time.perf_counter() - start) * 1000 / len(query_vectors)
+        hits = [len(set(a[0].tolist()) & set(e.tolist())) / len(e) for a, e in zip(approx, exact_idx)]
+        rows.append({"nprobe": nprobe, "recall_at_k": float(np.mean(hits)), "ms_per_query": ms})
+    return rows
+
+
+def main():
+    from src.utils.io import (
+        load_theperspective_corpus,
+        load_perspectrumx_dataset,
+        load_perspectrumx_evidence,
+    )
+
+    parser = argparse.ArgumentParser(description="Build the IVF-PQ index and benchmark it against exact search")
+    parser.add_argument("--corpus", choices=["theperspective", "perspectrumx"], default="theperspective")
+    parser.add_argument("--model", default=DEFAULT_ENCODER, help=f"Encoder model (default: {DEFAULT_ENCODER})")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--nlist", type=int, default=None, help="Number of inverted lists (default: 4*sqrt(N))")
+    parser.add_argument("--m", type=int, default=8, help="PQ sub-vectors per embedding (default: 8)")
+    parser.add_argument("--benchmark", action="store_true", help="Report recall@k and latency vs exact search")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=str, default="1,2,4,8,16,32",
+                        help="Comma-separated nprobe values to benchmark")
+    parser.add_argument("--refine", type=int, default=DEFAULT_REFINE,
+                        help="Exactly re-rank refine*k PQ candidates (0 = PQ scores only)")
+    args = parser.parse_args()
+
+    if args.corpus == "theperspective":
+        corpus = load_theperspective_corpus("data/theperspective")
+        evidence = corpus.evidence()
+        queries = [entry["query"] for entry in corpus.dataset]
+    else:
+        evidence = load_perspectrumx_evidence("data/perspectrumx")
+        queries = [entry["query"] for entry in load_perspectrumx_dataset("data/perspectrumx")]
+
+    dense_index = get_dense_index(evidence, index_dir=args.index_dir, model_name=args.model)
+    index = IVFPQIndex.build(dense_index, nlist=args.nlist, m=args.m)
+    index.save(args.index_dir)
+    print(f"Saved IVF-PQ index ({index.centroids.shape[0]} lists, m={index.codebooks.shape[0]}) to {args.index_dir}")
+
+    if args.benchmark:
+        query_vectors = encode_texts(queries, model_name=args.model)
+        nprobes = [int(n) for n in args.nprobe.split(",")]
+        print(f"\n{'nprobe':>8}  {'recall@' + str(args.k):>10}  {'ms/query':>9}")
+        for row in benchmark(index, query_vectors, k=args.k, nprobes=nprobes, refine=args.refine):
+            print(f"{row['nprobe']:>8}  {row['recall_at_k']:>10.4f}  {row['ms_per_query']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+BM25 Retrieval Module
+
+Okapi BM25 over an inverted index of posting lists built from the evidence corpus.
+Queries are scored with the MaxScore early-termination strategy: posting lists are
+ordered by their score upper bound, and once the top-k heap is full, lists whose
+combined upper bound cannot beat the current k-th score are no longer scanned, only
+probed for documents already surfaced by the remaining "essential" lists.
+
+Usage:
+    from src.retrieval.bm25_retrieval import retrieve_bm25_docs
+    local_docs = retrieve_bm25_docs("climate change policy", evidence, k=5)
+"""
+
+import heapq
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from src.retrieval.tfidf_retrieval import corpus_fingerprint
+
+# Same token definition as sklearn's default TfidfVectorizer (lowercased words of 2+ chars)
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Module-level cache of built indexes, keyed by corpus fingerprint
+_index_cache = {}
+
+
+def tokenize(text: str) -> list:
+    """Lowercase and split text into word tokens."""
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+class BM25Index:
+    """
+    Inverted index with precomputed BM25 impacts.
+
+    For every term the index stores the sorted document indices that contain it and the
+    BM25 contribution of the term to each of those documents, plus the maximum
+    contribution (the term's upper bound used by MaxScore).
+    """
+
+    def __init__(self, evidence: list, k1: float = 1.5, b: float = 0.75):
+        self.evidence = evidence
+        self.k1 = k1
+        self.b = b
+        self.fingerprint = corpus_fingerprint(evidence)
+
+        term_docs = defaultdict(list)
+        term_freqs = defaultdict(list)
+        doc_lengths = np.zeros(len(evidence), dtype=np.float32)
+        for doc_idx, doc in enumerate(evidence):
+            tokens = tokenize(doc.get("content", ""))
+            doc_lengths[doc_idx] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_docs[term].append(doc_idx)
+                term_freqs[term].append(tf)
+
+        num_docs = len(evidence)
+        avg_len = float(doc_lengths.mean()) if num_docs else 0.0
+        length_norm = k1 * (1 - b + b * doc_lengths / avg_len) if avg_len else np.full(num_docs, k1)
+
+        self.postings = {}
+        self.max_scores = {}
+        for term, docs in term_docs.items():
+            docs = np.asarray(docs, dtype=np.int32)
+            tfs = np.asarray(term_freqs[term], dtype=np.float32)
+            df = len(docs)
+            idf = np.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            impacts = (idf * tfs * (k1 + 1) / (tfs + length_norm[docs])).astype(np.float32)
+            self.postings[term] = (docs, impacts)
+            self.max_scores[term] = float(impacts.max())
+
+    def score_all(self, query: str) -> np.ndarray:
+        """Exhaustively score every document (reference implementation, no pruning)."""
+        scores = np.zeros(len(self.evidence), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self.postings:
+                docs, impacts = self.postings[term]
+                scores[docs] += impacts
+        return scores
+
+    def search(self, query: str, k: int = 5):
+        """
+        Retrieve top-k documents for a query using MaxScore.
+        Returns:
+            list[dict]: top-k evidence docs with an added "score" field
+        """
+        if k <= 0:
+            return []
+        terms = [t for t in set(tokenize(query)) if t in self.postings]
+        if not terms:
+            return []
+
+        # Ascending upper bound; prefix[i] = best possible contribution of terms[0..i]
+        terms.sort(key=lambda t: self.max_scores[t])
+        lists = [self.postings[t] for t in terms]
+        prefix = np.cumsum([self.max_scores[t] for t in terms])
+        pointers = [0] * len(terms)
+
+        heap = []  # (score, -doc_idx) min-heap of the current top-k
+        threshold = 0.0
+        first_essential = 0
+
+        while True:
+            # Lists whose combined upper bound cannot beat the threshold become non-essential
+            if len(heap) == k:
+                while first_essential < len(terms) and prefix[first_essential] <= threshold:
+                    first_essential += 1
+            if first_essential == len(terms):
+                break
+
+            # Next candidate: smallest unvisited document among the essential lists
+            candidate = None
+            for i in range(first_essential, len(terms)):
+                docs = lists[i][0]
+                if pointers[i] < len(docs) and (candidate is None or docs[pointers[i]] < candidate):
+                    candidate = docs[pointers[i]]
+            if candidate is None:
+                break
+
+            score = 0.0
+            for i in range(first_essential, len(terms)):
+                docs, impacts = lists[i]
+                if pointers[i] < len(docs) and docs[pointers[i]] == candidate:
+                    score += impacts[pointers[i]]
+                    pointers[i] += 1
+
+            # Probe non-essential lists from the largest upper bound down, stopping early
+            for i in range(first_essential - 1, -1, -1):
+                if score + prefix[i] <= threshold:
+                    break
+                docs, impacts = lists[i]
+                pos = np.searchsorted(docs, candidate)
+                if pos < len(docs) and docs[pos] == candidate:
+                    score += impacts[pos]
+
+            if len(heap) < k:
+                heapq.heappush(heap, (score, -int(candidate)))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, -int(candidate)))
+            if len(heap) == k:
+                threshold = heap[0][0]
+
+        top_docs = []
+        for score, neg_idx in sorted(heap, reverse=True):
+            doc = self.evidence[-neg_idx].copy()
+            doc["score"] = float(score)
+            top_docs.append(doc)
+        return top_docs
+
+    def search_batch(self, queries: list, k: int = 5):
+        """
+        Retrieve top-k documents for each query.
+        Returns:
+            list[list[dict]]: one top-k list per query, in input order
+        """
+        return [self.search(query, k=k) for query in queries]
+
+
+def get_bm25_index(evidence: list):
+    """Return a BM25 index for the evidence corpus, building it once per process."""
+    fingerprint = corpus_fingerprint(evidence)
+    if fingerprint not in _index_cache:
+        print(f"Building BM25 index over {len(evidence)} documents...")
+        _index_cache[fingerprint] = BM25Index(evidence)
+    index = _index_cache[fingerprint]
+    index.evidence = evidence
+    return index
+
+
+def retrieve_bm25_docs(query: str, evidence: list, k: int = 5):
+    """
+    Retrieve top-k most relevant local documents with BM25
+    Args:
+        query: user/topic query
+        evidence: list of dicts with id and content
+        k: number of documents to return
+    Returns:
+        list[dict]: top-k evidence docs
+    """
+    if not evidence:
+        return []
+
+    index = get_bm25_index(evidence)
+    return index.search(query, k=k)
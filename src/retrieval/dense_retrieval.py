@@ -0,0 +1,294 @@
+"""
+Dense Retrieval Module
+
+Embeds the evidence corpus once with a small CPU sentence encoder and stores the
+L2-normalized vectors as a .npy file under data/index/. The file is opened with a
+read-only memory map, so startup does not re-encode the corpus and several pipeline
+workers searching the same corpus share one copy of the vectors in the page cache.
+
+Vectors are stored as float16 by default, or as int8 with one float32 scale per
+document (dtype="int8") for a 2x smaller file.
+
+Usage:
+    from src.retrieval.dense_retrieval import retrieve_dense_docs
+    local_docs = retrieve_dense_docs("climate change policy", evidence, k=5)
+
+    # Pre-build the vector store for a corpus:
+    python -m src.retrieval.dense_retrieval --corpus theperspective
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from src.retrieval.tfidf_retrieval import DEFAULT_INDEX_DIR, corpus_fingerprint
+
+DEFAULT_ENCODER = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Module-level cache for encoder and opened indexes
+_encoder_cache = {}
+_index_cache = {}
+
+
+def _load_encoder(model_name: str):
+    """Load a transformers encoder and tokenizer on CPU with caching."""
+    if model_name not in _encoder_cache:
+        from transformers import AutoModel, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        _encoder_cache[model_name] = (model, tokenizer)
+
+    return _encoder_cache[model_name]
+
+
+def encode_texts(texts: list, model_name: str = DEFAULT_ENCODER, batch_size: int = 64,
+                 max_length: int = 256) -> np.ndarray:
+    """
+    Encode texts into L2-normalized float32 vectors (mean pooling over token embeddings).
+    """
+    import torch
+
+    model, tokenizer = _load_encoder(model_name)
+    batches = []
+    with torch.no_grad():
+        for start in range(0, len(texts), batch_size):
+            batch = [t or "" for t in texts[start:start + batch_size]]
+            inputs = tokenizer(batch, padding=True, truncation=True, max_length=max_length,
+                               return_tensors="pt")
+            token_embeddings = model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(token_embeddings.dtype)
+            pooled = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+            batches.append(pooled.numpy().astype(np.float32))
+
+    if not batches:
+        return np.zeros((0, model.config.hidden_size), dtype=np.float32)
+    return np.vstack(batches)
+
+
+def _quantize_int8(vectors: np.ndarray):
+    """Symmetric per-row int8 quantization; returns (codes, scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class DenseIndex:
+    """
+    Memory-mapped store of document embeddings for one corpus and encoder.
+    """
+
+    def __init__(self, vectors, scales, evidence: list, fingerprint: str, model_name: str):
+        self.vectors = vectors
+        self.scales = scales
+        self.evidence = evidence
+        self.fingerprint = fingerprint
+        self.model_name = model_name
+
+    @staticmethod
+    def _paths(index_dir: str, model_name: str, fingerprint: str):
+        slug = model_name.split("/")[-1]
+        stem = Path(index_dir) / f"dense-{slug}-{fingerprint[:16]}"
+        return {
+            "meta": stem.with_suffix(".json"),
+            "vectors": stem.with_suffix(".npy"),
+            "scales": Path(f"{stem}-scales.npy"),
+        }
+
+    @classmethod
+    def build(cls, evidence: list, index_dir: str = DEFAULT_INDEX_DIR,
+              model_name: str = DEFAULT_ENCODER, dtype: str = "float16"):
+        """Encode every document once and write the vector store to index_dir."""
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported dtype '{dtype}'. Use 'float16' or 'int8'.")
+        fingerprint = corpus_fingerprint(evidence)
+        paths = cls._paths(index_dir, model_name, fingerprint)
+        Path(index_dir).mkdir(parents=True, exist_ok=True)
+
+        print(f"Encoding {len(evidence)} documents with {model_name}...")
+        vectors = encode_texts([doc.get("content", "") for doc in evidence], model_name=model_name)
+        if dtype == "int8":
+            codes, scales = _quantize_int8(vectors)
+            np.save(paths["vectors"], codes)
+            np.save(paths["scales"], scales)
+        else:
+            np.save(paths["vectors"], vectors.astype(np.float16))
+
+        meta = {
+            "fingerprint": fingerprint,
+            "model": model_name,
+            "dtype": dtype,
+            "num_docs": len(evidence),
+            "dim": int(vectors.shape[1]),
+        }
+        with open(paths["meta"], "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        return cls.load(evidence, index_dir=index_dir, model_name=model_name)
+
+    @classmethod
+    def load(cls, evidence: list, index_dir: str = DEFAULT_INDEX_DIR,
+             model_name: str = DEFAULT_ENCODER):
+        """
+        Open the vector store for this corpus read-only via memory map.
+
+        Returns:
+            DenseIndex, or None if no complete store matching the corpus fingerprint exists
+            (e.g. a build was interrupted), so the caller rebuilds it.
+        """
+        fingerprint = corpus_fingerprint(evidence)
+        paths = cls._paths(index_dir, model_name, fingerprint)
+        if not paths["meta"].exists() or not paths["vectors"].exists():
+            return None
+
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") != fingerprint or meta.get("num_docs") != len(evidence):
+            return None
+
+        is_int8 = meta.get("dtype") == "int8"
+        if is_int8 and not paths["scales"].exists():
+            print(f"Warning: dense index {paths['meta'].name} has no scales file; rebuilding")
+            return None
+        try:
+            vectors = np.load(paths["vectors"], mmap_mode="r")
+            scales = np.load(paths["scales"]) if is_int8 else None
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read dense index {paths['meta'].name} ({e}); rebuilding")
+            return None
+        if vectors.shape[0] != len(evidence) or (scales is not None and scales.shape[0] != len(evidence)):
+            print(f"Warning: dense index {paths['meta'].name} is incomplete; rebuilding")
+            return None
+        return cls(vectors, scales, evidence, fingerprint, model_name)
+
+    def score_chunks(self, query_vectors: np.ndarray, chunk_size: int = 65536):
+        """
+        Yield (start, scores) for consecutive row chunks of the store, where scores is a
+        (num_queries x chunk) float32 matrix of cosine similarities. Only one chunk of
+        the mapped file is materialized at a time.
+        """
+        num_docs = self.vectors.shape[0]
+        for start in range(0, num_docs, chunk_size):
+            chunk = np.asarray(self.vectors[start:start + chunk_size], dtype=np.float32)
+            scores = query_vectors @ chunk.T
+            if self.scales is not None:
+                scores *= self.scales[start:start + chunk_size]
+            yield start, scores
+
+    def search_vectors(self, query_vectors: np.ndarray, k: int = 5):
+        """
+        Exact top-k search for pre-encoded query vectors.
+        Returns:
+            (indices, scores): two (num_queries x k) arrays, best first
+        """
+        num_queries = query_vectors.shape[0]
+        k = min(k, self.vectors.shape[0])
+        best_idx = np.zeros((num_queries, 0), dtype=np.int64)
+        best_scores = np.zeros((num_queries, 0), dtype=np.float32)
+
+        for start, scores in self.score_chunks(query_vectors.astype(np.float32)):
+            # Merge this chunk's candidates with the running top-k
+            chunk_idx = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            all_scores = np.hstack([best_scores, scores])
+            all_idx = np.hstack([best_idx, chunk_idx])
+            if all_scores.shape[1] > k:
+                keep = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+                all_scores = np.take_along_axis(all_scores, keep, axis=1)
+                all_idx = np.take_along_axis(all_idx, keep, axis=1)
+            best_scores, best_idx = all_scores, all_idx
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def _to_docs(self, indices, scores):
+        top_docs = []
+        for idx, score in zip(indices, scores):
+            doc = self.evidence[idx].copy()
+            doc["score"] = float(score)
+            top_docs.append(doc)
+        return top_docs
+
+    def search(self, query: str, k: int = 5):
+        """
+        Retrieve top-k documents for a single query.
+        Returns:
+            list[dict]: top-k evidence docs with an added "score" field
+        """
+        return self.search_batch([query], k=k)[0]
+
+    def search_batch(self, queries: list, k: int = 5):
+        """
+        Encode all queries in one batch and retrieve top-k documents for each.
+        Returns:
+            list[list[dict]]: one top-k list per query, in input order
+        """
+        if not queries:
+            return []
+        if k <= 0 or self.vectors.shape[0] == 0:
+            return [[] for _ in queries]
+        query_vectors = encode_texts(queries, model_name=self.model_name)
+        indices, scores = self.search_vectors(query_vectors, k=k)
+        return [self._to_docs(i, s) for i, s in zip(indices, scores)]
+
+
+def get_dense_index(evidence: list, index_dir: str = DEFAULT_INDEX_DIR,
+                    model_name: str = DEFAULT_ENCODER):
+    """
+    Return the dense index for the evidence corpus, encoding it only if no vector store
+    matching the corpus fingerprint exists in index_dir.
+    """
+    fingerprint = corpus_fingerprint(evidence)
+    key = (model_name, fingerprint)
+    if key not in _index_cache:
+        index = DenseIndex.load(evidence, index_dir=index_dir, model_name=model_name)
+        if index is None:
+            index = DenseIndex.build(evidence, index_dir=index_dir, model_name=model_name)
+        _index_cache[key] = index
+    index = _index_cache[key]
+    index.evidence = evidence
+    return index
+
+
+def retrieve_dense_docs(query: str, evidence: list, k: int = 5):
+    """
+    Retrieve top-k most relevant local documents by embedding similarity
+    Args:
+        query: user/topic query
+        evidence: list of dicts with id and content
+        k: number of documents to return
+    Returns:
+        list[dict]: top-k evidence docs
+    """
+    if not evidence:
+        return []
+
+    index = get_dense_index(evidence)
+    return index.search(query, k=k)
+
+
+def main():
+    from src.utils.io import load_theperspective_evidence, load_perspectrumx_evidence
+
+    parser = argparse.ArgumentParser(description="Pre-build the dense vector store for a corpus")
+    parser.add_argument("--corpus", choices=["theperspective", "perspectrumx"], default="theperspective")
+    parser.add_argument("--model", default=DEFAULT_ENCODER, help=f"Encoder model (default: {DEFAULT_ENCODER})")
+    parser.add_argument("--dtype", choices=["float16", "int8"], default="float16")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.corpus == "theperspective":
+        evidence = load_theperspective_evidence("data/theperspective")
+    else:
+        evidence = load_perspectrumx_evidence("data/perspectrumx")
+
+    index = DenseIndex.build(evidence, index_dir=args.index_dir, model_name=args.model, dtype=args.dtype)
+    print(f"Stored {index.vectors.shape[0]} x {index.vectors.shape[1]} {args.dtype} vectors in {args.index_dir}")
+
+
+if __name__ == "__main__":
+    main()
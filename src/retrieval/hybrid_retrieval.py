@@ -0,0 +1,158 @@
+"""
+Hybrid Retrieval Module
+
+Runs a lexical retriever (BM25 or TF-IDF) and the dense retriever in parallel threads and
+fuses their rankings into a single top-k list, either with reciprocal-rank fusion
+(score = sum of 1 / (rrf_k + rank)) or with a weighted sum of min-max normalized scores.
+Wall-clock time of each stage is kept in `timings` after every search.
+
+Usage:
+    from src.retrieval.hybrid_retrieval import get_hybrid_retriever
+    retriever = get_hybrid_retriever(evidence, lexical="bm25", fusion="rrf")
+    local_docs = retriever.search("climate change policy", k=5)
+    print(retriever.timings)   # {"lexical": ..., "dense": ..., "fusion": ...} in seconds
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.retrieval.tfidf_retrieval import get_tfidf_index
+from src.retrieval.bm25_retrieval import get_bm25_index
+from src.retrieval.dense_retrieval import get_dense_index
+
+LEXICAL_RETRIEVERS = {
+    "tfidf": get_tfidf_index,
+    "bm25": get_bm25_index,
+}
+
+DEFAULT_RRF_K = 60
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def reciprocal_rank_fusion(rankings: list, k: int, rrf_k: int = DEFAULT_RRF_K):
+    """
+    Fuse several ranked lists of evidence dicts with reciprocal-rank fusion.
+    Returns:
+        list[dict]: top-k docs with "score" replaced by the fused RRF score
+    """
+    fused = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            doc_id = doc["id"]
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(doc_id, doc)
+    return _top_fused(fused, docs, k)
+
+
+def weighted_score_fusion(rankings: list, weights: list, k: int):
+    """
+    Fuse ranked lists by a weighted sum of min-max normalized scores; a doc missing from
+    a list contributes 0 for that list.
+    Returns:
+        list[dict]: top-k docs with "score" replaced by the fused score
+    """
+    fused = {}
+    docs = {}
+    for ranking, weight in zip(rankings, weights):
+        if not ranking:
+            continue
+        scores = [doc["score"] for doc in ranking]
+        low, high = min(scores), max(scores)
+        span = high - low
+        for doc in ranking:
+            norm = (doc["score"] - low) / span if span > 0 else 1.0
+            fused[doc["id"]] = fused.get(doc["id"], 0.0) + weight * norm
+            docs.setdefault(doc["id"], doc)
+    return _top_fused(fused, docs, k)
+
+
+def _top_fused(fused: dict, docs: dict, k: int):
+    ranked_ids = sorted(fused, key=lambda doc_id: fused[doc_id], reverse=True)[:k]
+    top_docs = []
+    for doc_id in ranked_ids:
+        doc = docs[doc_id].copy()
+        doc["score"] = float(fused[doc_id])
+        top_docs.append(doc)
+    return top_docs
+
+
+class HybridRetriever:
+    """
+    Lexical + dense retrieval with rank fusion.
+
+    Each underlying retriever returns `depth` candidates (default: 4 * k) per query; the
+    fused list is cut to k.
+    """
+
+    def __init__(self, lexical, dense, fusion: str = "rrf", rrf_k: int = DEFAULT_RRF_K,
+                 dense_weight: float = 0.5, depth: int = None):
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"Unknown fusion '{fusion}'. Use 'rrf' or 'weighted'.")
+        self.lexical = lexical
+        self.dense = dense
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.dense_weight = dense_weight
+        self.depth = depth
+        self.timings = {}
+
+    def _fuse(self, lexical_docs: list, dense_docs: list, k: int):
+        if self.fusion == "rrf":
+            return reciprocal_rank_fusion([lexical_docs, dense_docs], k=k, rrf_k=self.rrf_k)
+        weights = [1.0 - self.dense_weight, self.dense_weight]
+        return weighted_score_fusion([lexical_docs, dense_docs], weights, k=k)
+
+    def search(self, query: str, k: int = 5):
+        """
+        Retrieve fused top-k documents for a single query.
+        Returns:
+            list[dict]: top-k evidence docs with the fused "score"
+        """
+        return self.search_batch([query], k=k)[0]
+
+    def search_batch(self, queries: list, k: int = 5):
+        """
+        Retrieve fused top-k documents for each query; lexical and dense retrieval run
+        concurrently over the whole batch.
+        Returns:
+            list[list[dict]]: one top-k list per query, in input order
+        """
+        if not queries:
+            return []
+        if k <= 0:
+            return [[] for _ in queries]
+        depth = max(k, self.depth or 4 * k)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            lexical_future = executor.submit(_timed, self.lexical.search_batch, queries, k=depth)
+            dense_future = executor.submit(_timed, self.dense.search_batch, queries, k=depth)
+            lexical_results, lexical_time = lexical_future.result()
+            dense_results, dense_time = dense_future.result()
+
+        start = time.perf_counter()
+        fused = [self._fuse(lex, den, k) for lex, den in zip(lexical_results, dense_results)]
+        self.timings = {
+            "lexical": lexical_time,
+            "dense": dense_time,
+            "fusion": time.perf_counter() - start,
+        }
+        return fused
+
+
+def get_hybrid_retriever(evidence: list, lexical: str = "bm25", fusion: str = "rrf",
+                         dense_weight: float = 0.5):
+    """Build a hybrid retriever over the evidence corpus from the cached engines."""
+    if lexical not in LEXICAL_RETRIEVERS:
+        raise ValueError(f"Unknown lexical retriever '{lexical}'. Choose from: {sorted(LEXICAL_RETRIEVERS)}")
+    return HybridRetriever(
+        LEXICAL_RETRIEVERS[lexical](evidence),
+        get_dense_index(evidence),
+        fusion=fusion,
+        dense_weight=dense_weight,
+    )
@@ -0,0 +1,40 @@
+"""
+Retriever Registry
+
+Maps the --method names used by run_pipeline.py and test_metrics.py to local retrieval
+engines. Every engine factory takes the evidence list and returns an index object with
+`search(query, k)` and `search_batch(queries, k)`, both returning evidence dicts with an
+added "score" field.
+
+Usage:
+    from src.retrieval.retrievers import get_retriever
+    retriever = get_retriever("bm25", evidence)
+    local_docs = retriever.search("climate change policy", k=5)
+"""
+
+from src.retrieval.tfidf_retrieval import get_tfidf_index
+from src.retrieval.bm25_retrieval import get_bm25_index
+from src.retrieval.dense_retrieval import get_dense_index
+from src.retrieval.ann_index import get_ann_index
+from src.retrieval.hybrid_retrieval import get_hybrid_retriever
+
+RETRIEVERS = {
+    "tfidf": get_tfidf_index,
+    "bm25": get_bm25_index,
+    "dense": get_dense_index,
+    "ann": get_ann_index,
+    "hybrid": get_hybrid_retriever,
+}
+
+
+def get_retriever(method: str, evidence: list, **options):
+    """
+    Build (or reuse) the retrieval engine registered under `method`.
+    Extra keyword options (e.g. nprobe for "ann") are passed to the engine factory.
+
+    Raises:
+        ValueError: if no engine is registered under that name
+    """
+    if method not in RETRIEVERS:
+        raise ValueError(f"Unknown retrieval method '{method}'. Choose from: {sorted(RETRIEVERS)}")
+    return RETRIEVERS[method](evidence, **options)
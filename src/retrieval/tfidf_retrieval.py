@@ -1,7 +1,206 @@
+import hashlib
+import json
+from pathlib import Path
+
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
 import numpy as np
 
+DEFAULT_INDEX_DIR = "data/index"
+
+# Module-level cache of fitted indexes, keyed by corpus fingerprint
+_index_cache = {}
+
+# Fingerprints of recently hashed corpus lists, keyed by id(); holds the list itself so the
+# id cannot be reused by another object while the entry exists
+# (evidence list, length, fingerprint) of recently hashed corpora, newest last. Holding the
+# list itself (lists cannot be weakly referenced) keeps it alive, so an identity match can
+# never be a new list that reused a collected one's id().
+_fingerprint_cache = []
+_FINGERPRINT_CACHE_SIZE = 8
+
+
+def corpus_fingerprint(evidence: list) -> str:
+    """
+    Hash document ids and contents so a persisted index can be matched to its corpus.
+    Any added, removed, reordered or edited document changes the fingerprint.
+
+    The hash is memoized per corpus list object (and its length), so repeated lookups with
+    the same loaded corpus do not rehash it; edit a corpus by building a new list.
+    """
+    for i, (cached, length, fingerprint) in enumerate(_fingerprint_cache):
+        if cached is evidence:
+            if length == len(evidence):
+                return fingerprint
+            del _fingerprint_cache[i]
+            break
+    fingerprint = _hash_corpus(evidence)
+    if len(_fingerprint_cache) >= _FINGERPRINT_CACHE_SIZE:
+        _fingerprint_cache.pop(0)
+    _fingerprint_cache.append((evidence, len(evidence), fingerprint))
+    return fingerprint
+
+
+def _hash_corpus(evidence: list) -> str:
+    h = hashlib.sha256()
+    for doc in evidence:
+        h.update(str(doc.get("id", "")).encode("utf-8"))
+        h.update(b"\x00")
+        h.update((doc.get("content", "") or "").encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()
+
+
+class TfidfIndex:
+    """
+    TF-IDF index fitted once over an evidence corpus.
+
+    The fitted vocabulary, idf weights and L2-normalized document matrix (CSR) can be
+    saved to disk and reloaded without refitting.
+
+    Usage:
+        index = TfidfIndex.build(evidence)
+        index.save("data/index")
+        index = TfidfIndex.load("data/index", evidence)
+        top_docs = index.search("climate change policy", k=5)
+    """
+
+    def __init__(self, vectorizer: TfidfVectorizer, doc_matrix, evidence: list, fingerprint: str):
+        self.vectorizer = vectorizer
+        self.doc_matrix = doc_matrix
+        self.evidence = evidence
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, evidence: list):
+        """Fit a TF-IDF vectorizer over all evidence documents."""
+        doc_contents = [doc.get("content", "") for doc in evidence]
+        vectorizer = TfidfVectorizer(lowercase=True)
+        doc_matrix = vectorizer.fit_transform(doc_contents).tocsr()
+        return cls(vectorizer, doc_matrix, evidence, corpus_fingerprint(evidence))
+
+    @staticmethod
+    def _paths(index_dir: str, fingerprint: str):
+        stem = Path(index_dir) / f"tfidf-{fingerprint[:16]}"
+        return {
+            "meta": stem.with_suffix(".json"),
+            "matrix": stem.with_suffix(".npz"),
+            "idf": stem.with_suffix(".npy"),
+        }
+
+    def save(self, index_dir: str = DEFAULT_INDEX_DIR):
+        """Persist vocabulary, idf weights and document matrix under index_dir."""
+        paths = self._paths(index_dir, self.fingerprint)
+        Path(index_dir).mkdir(parents=True, exist_ok=True)
+
+        vocabulary = {term: int(col) for term, col in self.vectorizer.vocabulary_.items()}
+        meta = {
+            "fingerprint": self.fingerprint,
+            "num_docs": self.doc_matrix.shape[0],
+            "vocabulary": vocabulary,
+        }
+        with open(paths["meta"], "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        sparse.save_npz(paths["matrix"], self.doc_matrix)
+        np.save(paths["idf"], self.vectorizer.idf_)
+
+    @classmethod
+    def load(cls, index_dir: str, evidence: list):
+        """
+        Load a persisted index for this evidence corpus.
+
+        Returns:
+            TfidfIndex, or None if no index matching the corpus fingerprint exists.
+        """
+        fingerprint = corpus_fingerprint(evidence)
+        paths = cls._paths(index_dir, fingerprint)
+        if not all(p.exists() for p in paths.values()):
+            return None
+
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") != fingerprint or meta.get("num_docs") != len(evidence):
+            return None
+
+        vectorizer = TfidfVectorizer(lowercase=True, vocabulary=meta["vocabulary"])
+        vectorizer.idf_ = np.load(paths["idf"])
+        doc_matrix = sparse.load_npz(paths["matrix"]).tocsr()
+        return cls(vectorizer, doc_matrix, evidence, fingerprint)
+
+    def _doc_entry(self, idx, score):
+        doc = self.evidence[idx].copy()
+        doc["score"] = float(score)
+        return doc
+
+    def search(self, query: str, k: int = 5):
+        """
+        Retrieve top-k most relevant documents for a single query.
+        Returns:
+            list[dict]: top-k evidence docs with an added "score" field
+        """
+        return self.search_batch([query], k=k)[0]
+
+    def search_batch(self, queries: list, k: int = 5):
+        """
+        Retrieve top-k documents for several queries in one vectorized pass.
+
+        All queries are transformed together and scored with a single sparse
+        query x document product (rows are L2-normalized, so the dot product is the
+        cosine similarity). Top-k per row is selected with argpartition and only those
+        k candidates are sorted.
+
+        Returns:
+            list[list[dict]]: one top-k list per query, in input order
+        """
+        if not queries:
+            return []
+        num_docs = self.doc_matrix.shape[0]
+        k = min(k, num_docs)
+        if k <= 0:
+            return [[] for _ in queries]
+
+        query_vectors = self.vectorizer.transform(queries)
+        similarities = (query_vectors @ self.doc_matrix.T).toarray()
+
+        if k < num_docs:
+            candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(num_docs), (len(queries), 1))
+        candidate_scores = np.take_along_axis(similarities, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        top_k_indices = np.take_along_axis(candidates, order, axis=1)
+
+        results = []
+        for row, indices in enumerate(top_k_indices):
+            results.append([self._doc_entry(idx, similarities[row, idx]) for idx in indices])
+        return results
+
+
+def get_tfidf_index(evidence: list, index_dir: str = DEFAULT_INDEX_DIR):
+    """
+    Return a TF-IDF index for the evidence corpus.
+
+    Looks in the in-process cache first, then on disk; if neither holds an index whose
+    fingerprint matches the corpus, a new one is fitted and saved to index_dir.
+    """
+    fingerprint = corpus_fingerprint(evidence)
+    if fingerprint in _index_cache:
+        index = _index_cache[fingerprint]
+        index.evidence = evidence
+        return index
+
+    index = TfidfIndex.load(index_dir, evidence)
+    if index is None:
+        print(f"Building TF-IDF index over {len(evidence)} documents...")
+        index = TfidfIndex.build(evidence)
+        try:
+            index.save(index_dir)
+        except OSError as e:
+            print(f"Warning: could not save TF-IDF index to {index_dir}: {e}")
+
+    _index_cache[fingerprint] = index
+    return index
+
 
 def retrieve_local_docs(query: str, evidence: list, k: int = 5):
     """
@@ -15,33 +214,23 @@ def retrieve_local_docs(query: str, evidence: list, k: int = 5):
     """
     if not evidence:
         return []
-    
-    # Extract document contents
-    doc_contents = [doc.get("content", "") for doc in evidence]
-    
-    # Create TF-IDF vectorizer
-    vectorizer = TfidfVectorizer(lowercase=True)
-    
-    # Fit on all documents and transform query
-    doc_vectors = vectorizer.fit_transform(doc_contents)
-    # print(doc_vectors.toarray())
-    query_vector = vectorizer.transform([query])
-    # print(query_vector.toarray())
-
-    similarities = cosine_similarity(query_vector, doc_vectors)[0]
-    # print(similarities)
-    # print(all(x==0 for x in similarities))
-
-    # Get top-k document indices
-    top_k_indices = np.argsort(similarities)[-k:][::-1]
-    # print(top_k_indices)
-    
-    # Return top-k documents with their similarity scores
-    top_docs = []
-    for idx in top_k_indices:
-        if idx < len(evidence):
-            doc = evidence[idx].copy()
-            doc["score"] = float(similarities[idx])
-            top_docs.append(doc)
-    
-    return top_docs
\ No newline at end of file
+
+    index = get_tfidf_index(evidence)
+    return index.search(query, k=k)
+
+
+def retrieve_local_docs_batch(queries: list, evidence: list, k: int = 5):
+    """
+    Retrieve top-k local TF-IDF documents for many queries at once
+    Args:
+        queries: list of user/topic queries
+        evidence: list of dicts with id and content
+        k: number of documents to return per query
+    Returns:
+        list[list[dict]]: top-k evidence docs for each query, in input order
+    """
+    if not evidence:
+        return [[] for _ in queries]
+
+    index = get_tfidf_index(evidence)
+    return index.search_batch(queries, k=k)
@@ -0,0 +1,211 @@
+"""
+Persistent Web Search Cache
+
+SQLite-backed, content-addressed cache of web search responses. Entries are keyed by a
+hash of the normalized query plus the provider parameters that change the result set
+(not the number of results). Each key keeps the largest result list fetched so far, so a
+request for k=5 is served from a cached k=20 response.
+
+Entries expire after `ttl_seconds`. When the stored results exceed `max_bytes`, the least
+recently used entries are evicted.
+
+Usage:
+    from src.retrieval.web_cache import get_web_cache
+    cache = get_web_cache()
+    docs = cache.get("climate change policy", k=5)     # None on miss
+    docs, api_k = cache.lookup("climate change policy", k=5)   # with the stored api_k
+    cache.put("climate change policy", docs, api_k=5)
+    print(cache.stats())                              # {"hits": ..., "misses": ..., ...}
+
+    # Seed the cache from existing data/web/web-{k}.json files:
+    python -m src.retrieval.web_cache --import data/web/web-20.json
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = "data/cache/web_cache.sqlite"
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_PROVIDER_PARAMS = {"provider": "tavily", "include_answer": False}
+
+# Module-level cache of opened caches, keyed by database path
+_cache_instances = {}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share an entry."""
+    return " ".join((query or "").lower().split())
+
+
+def cache_key(query: str, params: dict = None) -> str:
+    """Content address of a query under the given provider parameters."""
+    payload = json.dumps(
+        {"query": normalize_query(query), "params": params or DEFAULT_PROVIDER_PARAMS},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class WebSearchCache:
+    """Thread-safe SQLite cache of web search result lists."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                params TEXT NOT NULL,
+                num_results INTEGER NOT NULL,
+                api_k INTEGER,
+                results TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    def get(self, query: str, k: int, params: dict = None):
+        """
+        Return the first k cached docs for the query, or None on a miss.
+
+        A cached list is usable when it holds at least k docs; expired entries count as misses.
+        """
+        entry = self.lookup(query, k, params)
+        return entry[0] if entry is not None else None
+
+    def lookup(self, query: str, k: int, params: dict = None):
+        """
+        Like get, but return (docs, api_k) where api_k is the max_results of the stored
+        response (its result count when it was imported without one), or None on a miss.
+        """
+        key = cache_key(query, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT num_results, results, created_at, api_k FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] < k or now - row[2] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        docs = json.loads(row[1])[:k]
+        for idx, doc in enumerate(docs):
+            doc["id"] = idx
+        return docs, row[3] if row[3] is not None else row[0]
+
+    def put(self, query: str, docs: list, api_k: int = None, params: dict = None):
+        """
+        Store a result list, keeping whichever list is longer if the query is already cached
+        and not expired.
+        """
+        key = cache_key(query, params)
+        now = time.time()
+        results = json.dumps(docs, ensure_ascii=False)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT num_results, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] > len(docs) and now - row[1] <= self.ttl_seconds:
+                return
+            self._conn.execute(
+                """INSERT OR REPLACE INTO responses
+                   (key, query, params, num_results, api_k, results, size_bytes, created_at, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    key,
+                    normalize_query(query),
+                    json.dumps(params or DEFAULT_PROVIDER_PARAMS, sort_keys=True),
+                    len(docs),
+                    api_k,
+                    results,
+                    len(results.encode("utf-8")),
+                    now,
+                    now,
+                ),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size_bytes FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def import_web_file(self, path: str) -> int:
+        """
+        Seed the cache from a data/web/web-{k}.json file.
+
+        Returns:
+            int: number of queries imported
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        for entry in entries:
+            web_docs = entry.get("web_docs", {})
+            docs = [
+                {key: value for key, value in doc.items() if key != "relevance"}
+                for doc in web_docs.get("results", [])
+            ]
+            self.put(entry.get("query", ""), docs, api_k=web_docs.get("api_k"))
+        return len(entries)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the current number of stored entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+def get_web_cache(path: str = DEFAULT_CACHE_PATH) -> WebSearchCache:
+    """Return the process-wide cache for the database at path."""
+    if path not in _cache_instances:
+        _cache_instances[path] = WebSearchCache(path)
+    return _cache_instances[path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or seed the web search cache")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--import", dest="import_files", action="append", default=[],
+                        help="data/web/web-{k}.json file to import (can be repeated)")
+    args = parser.parse_args()
+
+    cache = get_web_cache(args.path)
+    for path in args.import_files:
+        print(f"Imported {cache.import_web_file(path)} queries from {path}")
+    print(f"Cache stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,21 +7,67 @@ with structured output and rate limiting (exponential backoff).
 Usage:
     from src.retrieval.web_retrieval import search_web
     web_docs = search_web("climate change", k=3)
+
+    # Many queries concurrently, written incrementally to data/web/web-5.json
+    import asyncio
+    from src.retrieval.web_retrieval import search_web_batch
+    entries = asyncio.run(search_web_batch(queries, k=5, concurrency=8,
+                                           output_path="data/web/web-5.json", query_ids=ids))
+
+    # Or from the command line for all ThePerspective queries:
+    python -m src.retrieval.web_retrieval --k 5 --concurrency 8
 """
 
 
 import os
+import json
 import time
+import random
+import asyncio
 import logging
+import argparse
+from pathlib import Path
+import httpx
 from dotenv import load_dotenv
 from tavily import TavilyClient
 
+from src.retrieval.web_cache import get_web_cache
+
 # Load environment variables
 load_dotenv()
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+TAVILY_API_BASE_URL = os.getenv("TAVILY_API_BASE_URL", "https://api.tavily.com")
+# Default request rate for the batch scheduler: Tavily's development keys allow 100 requests/minute
+DEFAULT_REQUESTS_PER_MINUTE = 100
+
+# Module-level cache of Tavily clients, keyed by API key
+_client_cache = {}
+
+
+def _get_client(api_key: str) -> TavilyClient:
+    """Reuse one TavilyClient (and its connection pool) per API key."""
+    if api_key not in _client_cache:
+        _client_cache[api_key] = TavilyClient(api_key=api_key)
+    return _client_cache[api_key]
+
+
+def _parse_results(raw_results: list) -> list:
+    """Convert raw Tavily results into the document structure used by the pipeline."""
+    docs = []
+    for idx, result in enumerate(raw_results):
+        docs.append({
+            "id": idx,
+            "content": result.get("content", "") or "",
+            "url": result.get("url", ""),
+            "source_type": "web",
+            "title": result.get("title", "") or "",
+            "domain": result.get("source", "") or "",
+        })
+    return docs
+
 
 def _format_output(docs: list, api_k: int = None) -> dict:
     """
@@ -47,6 +93,7 @@ def search_web(
     max_retries: int = 3,
     initial_backoff: float = 1.0,
     query_id: str = None,
+    use_cache: bool = True,
 ):
     """
     Retrieve top-k web results from Tavily API with exponential backoff.
@@ -60,11 +107,26 @@ def search_web(
         initial_backoff (float): Initial backoff in seconds
         query_id (str, optional): Optional query ID from theperspective dataset.
                                   If provided, returns full entry structure with id, query, and web_docs.
+        use_cache (bool): Serve from / store to the persistent web search cache
     
     Returns:
         dict: If query_id is provided, returns {"id": query_id, "query": query, "web_docs": {...}}
               Otherwise, returns {"num_docs": ..., "api_k": ..., "results": [...]} (web_docs structure)
     """
+    cache = get_web_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.lookup(query, k)
+        if cached is not None:
+            logger.info(f"Web cache hit for '{query[:60]}' (k={k}) {cache.stats()}")
+            web_docs = _format_output(*cached)
+            if query_id is not None:
+                return {
+                    "id": query_id,
+                    "query": query,
+                    "web_docs": web_docs
+                }
+            return web_docs
+
     api_key = os.getenv("TAVILY_API_KEY")
     if not api_key:
         logger.error("TAVILY_API_KEY missing.")
@@ -78,7 +140,7 @@ def search_web(
             }
         return web_docs
     # Call Tavily with retry logic
-    client = TavilyClient(api_key=api_key)
+    client = _get_client(api_key)
     api_k = k
     max_api_k = k + 10  # Max attempts to reach k results
     docs = []
@@ -94,18 +156,9 @@ def search_web(
                     max_results=api_k,
                     include_answer=False
                 )
-                raw_results = response.get("results", [])
-                docs = []
-                for idx, result in enumerate(raw_results):
-                    url = result.get("url", "")
-                    docs.append({
-                        "id": idx,
-                        "content": result.get("content", "") or "",
-                        "url": url,
-                        "source_type": "web",
-                        "title": result.get("title", "") or "",
-                        "domain": result.get("source", "") or "",
-                    })
+                docs = _parse_results(response.get("results", []))
+                if cache is not None:
+                    cache.put(query, docs, api_k=api_k)
                 # Check if we got enough results
                 if len(docs) >= k:
                     # Trim to exactly k (keep most relevant, which are first in list)
@@ -156,4 +209,227 @@ def search_web(
             "query": query,
             "web_docs": web_docs
         }
-    return web_docs
\ No newline at end of file
+    return web_docs
+
+
+class TokenBucket:
+    """
+    Asyncio token-bucket rate limiter: `rate` tokens per second refill a bucket of size
+    `capacity`; each request takes one token and waits while the bucket is empty.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def _post_search(client: httpx.AsyncClient, limiter: TokenBucket, query: str, api_k: int,
+                       max_retries: int, initial_backoff: float):
+    """
+    One Tavily /search call under the rate limiter, retrying 429s and 5xx responses with
+    full-jitter exponential backoff (honouring Retry-After when the server sends it).
+
+    Returns:
+        list of raw results, or None if every attempt failed
+    """
+    backoff = initial_backoff
+    for attempt in range(max_retries):
+        await limiter.acquire()
+        try:
+            logger.info(f"Tavily API call for '{query[:60]}' (api_k={api_k}, attempt {attempt+1}/{max_retries})")
+            response = await client.post(
+                "/search",
+                json={"query": query, "max_results": api_k, "include_answer": False},
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Tavily request error: {e}")
+            response = None
+
+        if response is not None and response.status_code == 200:
+            return response.json().get("results", [])
+
+        retryable = response is None or response.status_code == 429 or response.status_code >= 500
+        if not retryable:
+            logger.error(f"Tavily API error (non-retry): HTTP {response.status_code} {response.text[:200]}")
+            return None
+        if attempt < max_retries - 1:
+            delay = random.uniform(0, backoff)
+            retry_after = response.headers.get("retry-after") if response is not None else None
+            if retry_after:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+            logger.warning(f"Rate limited or server error. Backoff {delay:.2f}s…")
+            await asyncio.sleep(delay)
+            backoff *= 2
+
+    logger.error("Rate limit exceeded fully.")
+    return None
+
+
+async def _search_one_async(client, limiter, query: str, k: int, max_retries: int,
+                            initial_backoff: float, cache=None) -> dict:
+    """Async counterpart of search_web: bump api_k (up to k+10) until k results arrive."""
+    if cache is not None:
+        cached = cache.lookup(query, k)
+        if cached is not None:
+            return _format_output(*cached)
+
+    docs = []
+    api_k = k
+    max_api_k = k + 10
+    while api_k <= max_api_k:
+        raw_results = await _post_search(client, limiter, query, api_k, max_retries, initial_backoff)
+        if raw_results is None:
+            break
+        docs = _parse_results(raw_results)
+        if cache is not None:
+            cache.put(query, docs, api_k=api_k)
+        if len(docs) >= k:
+            return _format_output(docs[:k], api_k)
+        logger.warning(f"Got {len(docs)} results, need {k}. Retrying with api_k={api_k+1}")
+        api_k += 1
+
+    logger.warning(f"Search completed with {len(docs)} results (requested {k})")
+    return _format_output(docs, None)
+
+
+def _write_json_atomic(path: Path, data):
+    """Write JSON to a temp file and rename it over path, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+async def search_web_batch(
+    queries: list,
+    k: int = 3,
+    concurrency: int = 8,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+    max_retries: int = 5,
+    initial_backoff: float = 1.0,
+    query_ids: list = None,
+    output_path: str = None,
+    base_url: str = None,
+    api_key: str = None,
+    use_cache: bool = True,
+):
+    """
+    Retrieve top-k web results for many queries concurrently.
+
+    All requests share one pooled HTTP client. At most `concurrency` queries are in
+    flight, and a token bucket keeps the request rate under `requests_per_minute`.
+    429s and server errors are retried with jittered exponential backoff.
+
+    Args:
+        queries (list): Search queries
+        k (int): Desired number of results per query
+        concurrency (int): Maximum number of queries in flight
+        requests_per_minute (float): Sustained request rate allowed by the Tavily quota
+        max_retries (int): Max attempts per request on 429/5xx/network errors
+        initial_backoff (float): Initial backoff ceiling in seconds (doubles per retry)
+        query_ids (list, optional): IDs aligned with queries (defaults to query_{i})
+        output_path (str, optional): If given, the results so far are rewritten there after
+            every completed query, in the data/web/web-{k}.json schema and input order
+        base_url (str, optional): API base URL (default: TAVILY_API_BASE_URL, e.g. a local stub)
+        api_key (str, optional): Tavily key (default: TAVILY_API_KEY from the environment)
+        use_cache (bool): Serve from / store to the persistent web search cache
+
+    Returns:
+        list[dict]: [{"id": ..., "query": ..., "web_docs": {...}}, ...] in input order
+    """
+    api_key = api_key or os.getenv("TAVILY_API_KEY")
+    if query_ids is None:
+        query_ids = [f"query_{i}" for i in range(len(queries))]
+    cache = get_web_cache() if use_cache else None
+    if not api_key and cache is None:
+        logger.error("TAVILY_API_KEY missing.")
+        return [
+            {"id": qid, "query": query, "web_docs": _format_output([], None)}
+            for qid, query in zip(query_ids, queries)
+        ]
+
+    if not api_key:
+        logger.error("TAVILY_API_KEY missing; only cached queries will return results.")
+
+    limiter = TokenBucket(rate=requests_per_minute / 60.0, capacity=max(1, concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    results = [None] * len(queries)
+    output_path = Path(output_path) if output_path else None
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url or TAVILY_API_BASE_URL,
+        headers={"Authorization": f"Bearer {api_key or ''}", "Content-Type": "application/json"},
+        limits=limits,
+        timeout=60.0,
+    ) as client:
+
+        async def run(i: int):
+            async with semaphore:
+                web_docs = await _search_one_async(
+                    client, limiter, queries[i], k, max_retries, initial_backoff, cache=cache
+                )
+            results[i] = {"id": query_ids[i], "query": queries[i], "web_docs": web_docs}
+            if output_path:
+                async with write_lock:
+                    _write_json_atomic(output_path, [r for r in results if r is not None])
+
+        await asyncio.gather(*(run(i) for i in range(len(queries))))
+
+    if cache is not None:
+        logger.info(f"Web cache stats: {cache.stats()}")
+    return results
+
+
+def main():
+    from src.utils.io import load_theperspective_corpus
+
+    parser = argparse.ArgumentParser(description="Fetch Tavily results for all ThePerspective queries")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in flight at once")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help=f"Requests per minute allowed by the quota (default: {DEFAULT_REQUESTS_PER_MINUTE})")
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N queries")
+    parser.add_argument("--output", type=str, default=None, help="Output path (default: data/web/web-{k}.json)")
+    parser.add_argument("--base-url", type=str, default=None, help="Override the Tavily API base URL")
+    args = parser.parse_args()
+
+    dataset = load_theperspective_corpus("data/theperspective").dataset
+    if args.limit is not None:
+        dataset = dataset[:args.limit]
+    output_path = args.output or f"data/web/web-{args.k}.json"
+
+    entries = asyncio.run(search_web_batch(
+        [entry["query"] for entry in dataset],
+        k=args.k,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        query_ids=[entry["id"] for entry in dataset],
+        output_path=output_path,
+        base_url=args.base_url,
+    ))
+    print(f"Saved {len(entries)} entries to {output_path}")
+    print(f"Web cache stats: {get_web_cache().stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Batched Summarization Benchmark
+
+Measures summarize_batch throughput (queries/second) at several batch sizes on queries from
+a merged-corpus file. Outputs that fail validation get the fallback summary instead of
+being retried, so every batch size does the same amount of generation.
+
+Usage:
+    # CPU run with a tiny model
+    python -m src.summarization.benchmark_batch --device cpu \
+        --model hf-internal-testing/tiny-random-LlamaForCausalLM --batch-sizes 1 2 4 8
+
+    # GPU run with the default Llama model
+    python -m src.summarization.benchmark_batch --num-queries 16 --batch-sizes 1 4 8
+"""
+
+import os
+import json
+import time
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched constrained summarization")
+    parser.add_argument("--merged-file", default="data/merged-corpus/merged-5.json")
+    parser.add_argument("--num-queries", type=int, default=8)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--model", help="Hugging Face model name (default: LLM_SUMMARY_MODEL or Llama-3.2-3B-Instruct)")
+    parser.add_argument("--device", help="Device to load the model on, e.g. cuda or cpu (default: LLM_SUMMARY_DEVICE or cuda)")
+    args = parser.parse_args()
+
+    if args.model:
+        os.environ["LLM_SUMMARY_MODEL"] = args.model
+    if args.device:
+        os.environ["LLM_SUMMARY_DEVICE"] = args.device
+
+    from src.summarization.model_registry import default_model_name, get_outlines_model
+    from src.summarization.llm_summary_merged import summarize_batch
+
+    with open(args.merged_file, "r", encoding="utf-8") as f:
+        merged_data = json.load(f)[:args.num_queries]
+    queries = [entry.get("query", "") for entry in merged_data]
+    corpora = [entry.get("merged") or entry.get("docs") or [] for entry in merged_data]
+
+    # Load once up front so model loading is not counted against the first batch size
+    start = time.perf_counter()
+    get_outlines_model(default_model_name(), os.getenv("HF_TOKEN"))
+    print(f"Loaded {default_model_name()} in {time.perf_counter() - start:.1f}s")
+
+    # Batch size 1 reuses the prompt prefix cache; padded batches cannot (see StructuredSummarizer.generate_batch)
+    print(f"\n{'batch_size':>10}  {'seconds':>8}  {'queries/s':>9}  {'prefix hits':>11}")
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        stats = []
+        summarize_batch(queries, corpora, batch_size=batch_size,
+                        max_new_tokens=args.max_new_tokens, retry_failed=False, stats=stats)
+        elapsed = time.perf_counter() - start
+        hits = sum(s["prefix_cache_hits"] for s in stats)
+        print(f"{batch_size:>10}  {elapsed:>8.2f}  {len(queries) / elapsed:>9.2f}  {hits:>11}")
+
+
+if __name__ == "__main__":
+    main()
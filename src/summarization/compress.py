@@ -0,0 +1,180 @@
+"""
+Extractive Corpus Compression
+
+Shortens a merged corpus before summarization by keeping only the sentences of each
+document that are most similar to the query. Sentences are scored with TF-IDF cosine
+similarity (a vectorizer fitted over the sentences of the query's own corpus, so idf
+reflects that corpus), each document keeps its top `max_sentences` sentences in their
+original order, and document ids and other fields are left intact. Documents with at
+most `max_sentences` sentences are passed through unchanged.
+
+Usage:
+    from src.summarization.compress import compress_corpus
+    compressed = compress_corpus(query, merged_corpus, max_sentences=3)
+
+    # Word reduction per k on the merged corpora
+    python -m src.summarization.compress --ks 5 10 20 --max-sentences 3
+
+    # Also time end-to-end summarization with and without compression
+    python -m src.summarization.compress --ks 5 20 --summarize --num-queries 8
+"""
+
+import re
+import json
+import time
+import argparse
+import statistics
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+DEFAULT_MAX_SENTENCES = 3
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def split_sentences(text: str) -> list:
+    """Split text on sentence-ending punctuation followed by whitespace."""
+    return [sentence for sentence in _SENTENCE_END.split(text or "") if sentence.strip()]
+
+
+def count_words(merged_corpus: list) -> int:
+    """Words in all document contents (split on whitespace, as in web_metrics)."""
+    return sum(len((doc.get('content') or '').split()) for doc in merged_corpus)
+
+
+def compress_corpus(query: str, merged_corpus: list, max_sentences: int = DEFAULT_MAX_SENTENCES) -> list:
+    """
+    Keep the max_sentences sentences of each document most similar to the query.
+
+    Args:
+        query: user/topic query
+        merged_corpus: list of dicts with id and content
+        max_sentences: sentences kept per document (0 or less disables compression)
+
+    Returns:
+        list[dict]: document copies with compressed content, in the original order
+    """
+    if max_sentences <= 0 or not merged_corpus:
+        return merged_corpus
+
+    doc_sentences = [split_sentences(doc.get('content', '')) for doc in merged_corpus]
+    long_docs = [i for i, sentences in enumerate(doc_sentences) if len(sentences) > max_sentences]
+    if not long_docs:
+        return merged_corpus
+
+    all_sentences = [sentence for i in long_docs for sentence in doc_sentences[i]]
+    vectorizer = TfidfVectorizer(lowercase=True)
+    try:
+        sentence_matrix = vectorizer.fit_transform(all_sentences)
+    except ValueError:
+        # Empty vocabulary (e.g. only stop words or punctuation); keep leading sentences
+        sentence_matrix = None
+    if sentence_matrix is not None:
+        # Rows are L2-normalized, so the dot product is the cosine similarity
+        scores = (sentence_matrix @ vectorizer.transform([query]).T).toarray().ravel()
+    else:
+        scores = [0.0] * len(all_sentences)
+
+    compressed = list(merged_corpus)
+    offset = 0
+    for i in long_docs:
+        sentences = doc_sentences[i]
+        doc_scores = scores[offset:offset + len(sentences)]
+        offset += len(sentences)
+        # Highest score first; ties keep the earlier sentence
+        top = sorted(range(len(sentences)), key=lambda j: (-doc_scores[j], j))[:max_sentences]
+        compressed[i] = {**merged_corpus[i], 'content': " ".join(sentences[j] for j in sorted(top))}
+    return compressed
+
+
+def compress_corpora(queries: list, corpora: list, max_sentences: int = DEFAULT_MAX_SENTENCES) -> list:
+    """compress_corpus for each (query, corpus) pair, printing the total word reduction."""
+    if max_sentences <= 0:
+        return corpora
+    start = time.perf_counter()
+    compressed = [compress_corpus(query, corpus, max_sentences) for query, corpus in zip(queries, corpora)]
+    before = sum(count_words(corpus) for corpus in corpora)
+    after = sum(count_words(corpus) for corpus in compressed)
+    print(f"Compressed {len(corpora)} corpora to {max_sentences} sentences/doc: {before} -> {after} words "
+          f"({1 - after / max(before, 1):.1%} fewer) in {time.perf_counter() - start:.2f}s")
+    return compressed
+
+
+def compression_report(k: int, max_sentences: int, merged_dir: str = "data/merged-corpus",
+                       num_queries: int = None, summarize: bool = False, batch_size: int = None) -> dict:
+    """
+    Word reduction (and optionally summarization latency) on merged-{k}.json.
+
+    Returns:
+        dict with mean words per query before/after, the mean per-query reduction,
+        compression seconds, and with summarize=True the summarize_batch seconds for the
+        original and compressed corpora
+    """
+    with open(f"{merged_dir}/merged-{k}.json", "r", encoding="utf-8") as f:
+        merged_data = json.load(f)[:num_queries]
+    queries = [entry.get("query", "") for entry in merged_data]
+    corpora = [entry.get("merged") or entry.get("docs") or [] for entry in merged_data]
+
+    start = time.perf_counter()
+    compressed = [compress_corpus(query, corpus, max_sentences) for query, corpus in zip(queries, corpora)]
+    compress_seconds = time.perf_counter() - start
+
+    before = [count_words(corpus) for corpus in corpora]
+    after = [count_words(corpus) for corpus in compressed]
+    report = {
+        "k": k,
+        "queries": len(queries),
+        "words_before": statistics.mean(before) if before else 0,
+        "words_after": statistics.mean(after) if after else 0,
+        "reduction": statistics.mean(1 - a / b for a, b in zip(after, before) if b) if any(before) else 0.0,
+        "compress_seconds": compress_seconds,
+    }
+
+    if summarize:
+        from src.summarization.llm_summary_merged import summarize_batch
+        for label, inputs in (("original", corpora), ("compressed", compressed)):
+            start = time.perf_counter()
+            summarize_batch(queries, inputs, batch_size=batch_size, retry_failed=False)
+            report[f"summarize_seconds_{label}"] = time.perf_counter() - start
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report extractive compression of merged corpora per k")
+    parser.add_argument("--merged-dir", default="data/merged-corpus")
+    parser.add_argument("--ks", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--max-sentences", type=int, default=DEFAULT_MAX_SENTENCES)
+    parser.add_argument("--num-queries", type=int, default=None, help="Only use the first N queries per file")
+    parser.add_argument("--summarize", action="store_true",
+                        help="Also time summarize_batch on original and compressed corpora (loads the model)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Prompts per padded generation batch (default: 1 while the prompt prefix cache "
+                             "is enabled, else 4; batches above 1 do not use the cache)")
+    parser.add_argument("--output", help="Optional JSON file for the per-k reports")
+    args = parser.parse_args()
+
+    reports = []
+    header = f"{'k':>3}  {'queries':>7}  {'words before':>12}  {'words after':>11}  {'reduction':>9}  {'compress s':>10}"
+    if args.summarize:
+        header += f"  {'summ. s orig':>12}  {'summ. s comp':>12}  {'latency':>8}"
+    print(header)
+    for k in args.ks:
+        report = compression_report(k, args.max_sentences, args.merged_dir, args.num_queries,
+                                    args.summarize, args.batch_size)
+        reports.append(report)
+        line = (f"{k:>3}  {report['queries']:>7}  {report['words_before']:>12.1f}  {report['words_after']:>11.1f}  "
+                f"{report['reduction']:>9.1%}  {report['compress_seconds']:>10.2f}")
+        if args.summarize:
+            original = report["summarize_seconds_original"]
+            compressed = report["summarize_seconds_compressed"]
+            line += f"  {original:>12.2f}  {compressed:>12.2f}  {(compressed - original) / original:>+8.1%}"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+        print(f"Saved reports to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
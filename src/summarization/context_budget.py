@@ -0,0 +1,143 @@
+"""
+Context Budget
+
+Fits a merged corpus into a prompt-token budget before summarization, so long merged-20
+prompts are cut deterministically up front instead of failing generation and being retried.
+
+Tokens are counted with the summarization model's tokenizer. Documents are ranked so the
+most useful ones keep the most room: documents labelled Not Relevant go last, and the rest
+are interleaved across sources (offline docs by retrieval score, web docs in search-rank
+order). Every kept document gets the same token cap, chosen as large as the budget allows
+(longer documents are truncated to it). When even `min_doc_tokens` per document does not
+fit, the lowest-ranked documents are dropped (the top document is always kept). Kept
+documents stay in their original order.
+
+Fitting is opt-in: the default budget is 0 (no limit), since Llama-3.2-3B's 128k context
+holds every merged corpus and cutting documents changes the summaries. Pass a budget (e.g.
+run_pipeline.py --context-budget 4096) or set LLM_SUMMARY_CONTEXT_BUDGET to enable it.
+
+Usage:
+    from src.summarization.context_budget import fit_corpus
+    fitted, report = fit_corpus(query, merged_corpus, tokenizer, build_prompt, budget=4096)
+    # report = {"budget": 4096, "prompt_tokens": ..., "original_prompt_tokens": ...,
+    #           "dropped": [doc ids], "truncated": {doc id: kept tokens}}
+"""
+
+import os
+
+DEFAULT_CONTEXT_BUDGET = 0
+DEFAULT_MIN_DOC_TOKENS = 64
+
+
+def default_context_budget() -> int:
+    """Prompt-token budget from LLM_SUMMARY_CONTEXT_BUDGET (default and 0: no fitting)."""
+    return int(os.getenv("LLM_SUMMARY_CONTEXT_BUDGET", DEFAULT_CONTEXT_BUDGET))
+
+
+def _encode(tokenizer, text: str) -> list:
+    return tokenizer.encode(text, add_special_tokens=False)
+
+
+def rank_documents(merged_corpus: list) -> list:
+    """
+    Return corpus positions from most to least important.
+
+    Offline docs (with a retrieval "score") are ranked by score and web docs keep their
+    order; the two sources are interleaved rank by rank. Docs with relevance "NR" go last.
+    """
+    sources = {}
+    for position, doc in enumerate(merged_corpus):
+        source = "offline" if "score" in doc else "web"
+        sources.setdefault(source, []).append(position)
+    if "offline" in sources:
+        sources["offline"].sort(key=lambda position: -float(merged_corpus[position]["score"] or 0.0))
+
+    keys = {}
+    for source_order, positions in enumerate(sources.values()):
+        for rank, position in enumerate(positions):
+            not_relevant = merged_corpus[position].get("relevance") == "NR"
+            keys[position] = (not_relevant, rank, source_order)
+    return sorted(keys, key=keys.get)
+
+
+def _fit_cap(costs: list, available: int, min_doc_tokens: int) -> int:
+    """Largest per-doc token cap c with sum(min(cost, c)) <= available (binary search)."""
+    low, high = min_doc_tokens, max(costs)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if sum(min(cost, mid) for cost in costs) <= available:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def fit_corpus(query: str, merged_corpus: list, tokenizer, build_prompt, budget: int = None,
+               min_doc_tokens: int = DEFAULT_MIN_DOC_TOKENS):
+    """
+    Truncate and drop documents so build_prompt(query, corpus) fits in `budget` tokens.
+
+    Args:
+        tokenizer: Hugging Face tokenizer of the summarization model
+        build_prompt: (query, merged_corpus) -> prompt, used to measure the fixed overhead
+        budget: prompt-token budget (default: default_context_budget(); 0 = no limit)
+        min_doc_tokens: smallest useful share of a document; below it docs are dropped
+
+    Returns:
+        (fitted_corpus, report): doc copies with cut content in original order, and a report
+        of the budget, prompt tokens before/after, and which docs were dropped or truncated
+    """
+    budget = default_context_budget() if budget is None else budget
+    report = {"budget": budget, "dropped": [], "truncated": {}}
+    original_tokens = len(_encode(tokenizer, build_prompt(query, merged_corpus)))
+    report["original_prompt_tokens"] = original_tokens
+    report["prompt_tokens"] = original_tokens
+    if not budget or not merged_corpus or original_tokens <= budget:
+        return merged_corpus, report
+
+    overhead = len(_encode(tokenizer, build_prompt(query, [])))
+    content_tokens = [_encode(tokenizer, doc.get('content', '')) for doc in merged_corpus]
+    # Per-doc cost includes the "[Doc id]: " line prefix
+    prefix_costs = [
+        len(_encode(tokenizer, build_prompt(query, [{**doc, 'content': ''}]))) - overhead
+        for doc in merged_corpus
+    ]
+    available = budget - overhead
+
+    kept = rank_documents(merged_corpus)
+    while len(kept) > 1 and sum(prefix_costs[p] + min(len(content_tokens[p]), min_doc_tokens) for p in kept) > available:
+        report["dropped"].append(merged_corpus[kept.pop()].get('id', ''))
+
+    cap = _fit_cap([len(content_tokens[p]) for p in kept],
+                   available - sum(prefix_costs[p] for p in kept), min_doc_tokens)
+    while True:
+        fitted = []
+        truncated = {}
+        for position in sorted(kept):
+            doc = merged_corpus[position]
+            tokens = content_tokens[position]
+            if len(tokens) > cap:
+                doc = {**doc, 'content': tokenizer.decode(tokens[:cap])}
+                truncated[str(doc.get('id', ''))] = cap
+            fitted.append(doc)
+        prompt_tokens = len(_encode(tokenizer, build_prompt(query, fitted)))
+        # Token counts are not exactly additive across joins; tighten the cap if needed
+        excess = prompt_tokens - budget
+        if excess <= 0 or cap <= min_doc_tokens:
+            break
+        cap = max(min_doc_tokens, cap - (excess + len(kept) - 1) // len(kept))
+
+    report["truncated"] = truncated
+    report["prompt_tokens"] = prompt_tokens
+    return fitted, report
+
+
+def record_context(stats: dict, report: dict):
+    """Store a fit_corpus report in per-query generation stats and log any cuts."""
+    stats.setdefault("context", report)
+    stats.setdefault("docs_dropped", len(report["dropped"]))
+    stats.setdefault("docs_truncated", len(report["truncated"]))
+    if report["dropped"] or report["truncated"]:
+        print(f"Context budget {report['budget']}: prompt {report['original_prompt_tokens']} -> "
+              f"{report['prompt_tokens']} tokens, dropped {len(report['dropped'])} docs "
+              f"{report['dropped']}, truncated {len(report['truncated'])} docs")
@@ -1,15 +1,7 @@
-import json
-import os
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
 from pydantic import BaseModel, Field, field_validator
 from typing import List
-from outlines.models import from_transformers
 
-# Module-level cache for model and generator
-_model_cache = {}
-_tokenizer_cache = {}
-_outlines_model_cache = {}
+from src.summarization.summarizer import StructuredSummarizer
 
 
 # Define the expected JSON schema using Pydantic
@@ -48,41 +40,64 @@ class Claim(BaseModel):
 class MultiPerspectiveSummary(BaseModel):
     summaries: List[Claim] = Field(description="List of claims with their perspectives", min_items=2, max_items=2)
 
-def _load_model(model_name: str, hf_token: str):
-    """Load transformers model and tokenizer with caching."""
-    if model_name not in _model_cache:
-        if not torch.cuda.is_available():
-            raise RuntimeError("CUDA GPU is REQUIRED but not available!")
-        
-        _tokenizer_cache[model_name] = AutoTokenizer.from_pretrained(
-            model_name,
-            token=hf_token
-        )
-        _model_cache[model_name] = AutoModelForCausalLM.from_pretrained(
-            model_name,
-            token=hf_token,
-            dtype=torch.float16,
-            device_map="auto"
-        )
-    
-    return _model_cache[model_name], _tokenizer_cache[model_name]
-
-def _get_outlines_model(model_name: str, hf_token: str):
-    """Get outlines model wrapper with caching."""
-    if model_name not in _outlines_model_cache:
-        hf_model, tokenizer = _load_model(model_name, hf_token)
-        # Wrap the transformers model with outlines
-        _outlines_model_cache[model_name] = from_transformers(hf_model, tokenizer)
-    
-    return _outlines_model_cache[model_name]
+def _format_corpus(merged_corpus: list) -> str:
+    """Format corpus for the prompt."""
+    return "\n".join([
+        f"[Doc {doc['id']}]: {doc.get('content', '')}"
+        for doc in merged_corpus
+    ])
+
+# Static instructions come first so every prompt shares the same prefix (see prefix_cache)
+PROMPT_PREFIX = """Given a query and documents, create a multi-perspective summary with exactly 2 claims (one positive, one negative).
 
-def summarize_query(query: str, merged_corpus: list):
+Rules:
+1. IGNORE any documents that are clearly off-topic or irrelevant to the query - only cite documents that directly address the query's subject matter.
+2. Include both a positive claim and a negative claim in response to the query
+3. Each perspective MUST be a ONE-SENTENCE summary - DO NOT copy entire paragraphs from documents
+4. Each perspective text should be concise (max 20-30 words) and summarize the key point
+5. Each perspective MUST reference specific document IDs that support it - DO NOT use empty evidence_docs
+6. Group related perspectives under the same claim
+7. Ensure all document IDs used are from the provided documents
+8. Each document ID can only be used ONCE across the entire summary. Different documents must support opposing viewpoints.
+9. Prefer using multiple distinct documents for each claim; when available, aim for two or more distinct docs per claim, but prioritize validity and relevance.
+
+"""
+
+def build_prompt(query: str, merged_corpus: list) -> str:
+    """Create prompt for multi-perspective summarization."""
+    corpus_text = _format_corpus(merged_corpus)
+    return PROMPT_PREFIX + f"""Query: {query}
+
+Documents:
+{corpus_text}
+
+Generate the JSON output now:"""
+
+def _normalize_doc_id(doc_id):
+    """Cast numeric strings (optionally prefixed with 'Doc ') to int."""
+    if isinstance(doc_id, str):
+        cleaned_id = doc_id.strip()
+        if cleaned_id.lower().startswith("doc "):
+            cleaned_id = cleaned_id.split(" ", 1)[1].strip()
+        return int(cleaned_id) if cleaned_id.isdigit() else cleaned_id
+    return doc_id
+
+# Model loading, context fitting, batching and fallbacks are shared with the other summary format
+_summarizer = StructuredSummarizer(MultiPerspectiveSummary, Claim, PROMPT_PREFIX, build_prompt, _format_corpus,
+                                   _normalize_doc_id)
+
+def summarize_query(query: str, merged_corpus: list, stats: dict = None, context_budget: int = None):
     """
     Generate multi-perspective summary using Llama-3.2-3B-Instruct with constrained JSON decoding.
     
     Args:
         query: the query/topic
         merged_corpus: list of documents with id, content, and score
+        stats: optional dict filled with generation counters (attempts, claim_regenerations,
+               repairs, shrinks, prompt_tokens, completion_tokens, prefix_cache_hits) and the
+               context-budget report
+        context_budget: prompt-token budget the corpus is fitted into before generation
+                        (default: LLM_SUMMARY_CONTEXT_BUDGET, else 0 = no limit)
     
     Returns:
         list: multi-perspective summary with structure:
@@ -95,98 +110,28 @@ def summarize_query(query: str, merged_corpus: list):
             }
         ]
     """
-    # Only require docs; the model generates claims itself
-    if not merged_corpus:
-        return []
-    
-    # Load outlines model (cached on first call)
-    model_name = "meta-llama/Llama-3.2-3B-Instruct"
-    HF_TOKEN = os.getenv("HF_TOKEN")
-    
-    try:
-        model = _get_outlines_model(model_name, HF_TOKEN)
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        return []
-
-    # Format corpus for the prompt
-    corpus_text = "\n".join([
-        f"[Doc {doc['id']}]: {doc.get('content', '')}"
-        for doc in merged_corpus
-    ])
-    
-    print("================================ CORPUS TEXT =================================")
-    print(corpus_text)
-    print("================================ CORPUS TEXT =================================")
-
-    # Create prompt for multi-perspective summarization
-    prompt = f"""Given the query and documents, create a multi-perspective summary with exactly 2 claims (one positive, one negative).
-
-Query: {query}
+    return _summarizer.summarize_query(query, merged_corpus, stats=stats, context_budget=context_budget)
 
-Documents:
-{corpus_text}
-
-Rules:
-1. IGNORE any documents that are clearly off-topic or irrelevant to the query - only cite documents that directly address the query's subject matter.
-2. Include both a positive claim and a negative claim in response to the query
-3. Each perspective MUST be a ONE-SENTENCE summary - DO NOT copy entire paragraphs from documents
-4. Each perspective text should be concise (max 20-30 words) and summarize the key point
-5. Each perspective MUST reference specific document IDs that support it - DO NOT use empty evidence_docs
-6. Group related perspectives under the same claim
-7. Ensure all document IDs used are from the provided documents
-8. Each document ID can only be used ONCE across the entire summary. Different documents must support opposing viewpoints.
-9. Prefer using multiple distinct documents for each claim; when available, aim for two or more distinct docs per claim, but prioritize validity and relevance.
-
-Generate the JSON output now:"""
+def summarize_batch(queries: list, corpora: list, batch_size: int = None, max_new_tokens: int = 1500,
+                    retry_failed: bool = True, stats: list = None, context_budget: int = None):
+    """
+    Generate multi-perspective summaries for many queries, padding `batch_size` prompts into
+    each constrained generation call (the JSON schema is still enforced per sequence).
 
-    # Retry loop for generation
-    max_retries = 10
-    for attempt in range(max_retries):
-        try:
-            # Use constrained generation to enforce JSON schema
-            result = model(prompt, MultiPerspectiveSummary, max_new_tokens=1500, temperature=0.1, top_p=0.8)
-            
-            print("================================ GENERATED RESPONSE =================================")
-            print(result)
-            print("================================ GENERATED RESPONSE =================================")
-            
-            # Parse JSON string result
-            if isinstance(result, str):
-                result_dict = json.loads(result)
-                # Validate through Pydantic to enforce constraints
-                summary_obj = MultiPerspectiveSummary(**result_dict)
-                return [claim.model_dump() for claim in summary_obj.summaries]
-            elif hasattr(result, 'summaries'):
-                # If already a Pydantic object, return it
-                return [claim.model_dump() for claim in result.summaries]
-            else:
-                return []
-
-        except Exception as e:
-            print(f"GENERATION ATTEMPT {attempt + 1}/{max_retries} FAILED: {e}")
-            if attempt == max_retries - 1:
-                # All attempts failed, return fallback
-                print(f"All {max_retries} attempts failed. Returning fallback summary.")
-                fallback_ids = [doc['id'] for doc in merged_corpus[:min(3, len(merged_corpus))]]
-                return [
-                    {
-                        "claim": "Positive claim",
-                        "perspectives": [
-                            {
-                                "text": f"Error generating summary: {str(e)[:100]}",
-                                "evidence_docs": fallback_ids
-                            }
-                        ]
-                    },
-                    {
-                        "claim": "Negative claim",
-                        "perspectives": [
-                            {
-                                "text": f"Error generating summary: {str(e)[:100]}",
-                                "evidence_docs": fallback_ids
-                            }
-                        ]
-                    }
-                ]
+    Args:
+        queries: list of query strings
+        corpora: list of merged corpora, one per query
+        batch_size: prompts generated together. Padded batches (> 1) skip the prompt prefix
+                    cache; default: 1 while the cache is enabled, else 4
+        max_new_tokens: generation budget per sequence
+        retry_failed: repair outputs that fail validation (re-prompting only failing claims,
+                      then summarize_query's retry loop); if False, return the fallback
+                      summary for them immediately
+        stats: optional list extended with one generation-counter dict per query
+        context_budget: prompt-token budget each corpus is fitted into (see summarize_query)
 
+    Returns:
+        list: one summary per query (same format as summarize_query), in input order
+    """
+    return _summarizer.summarize_batch(queries, corpora, batch_size=batch_size, max_new_tokens=max_new_tokens,
+                                       retry_failed=retry_failed, stats=stats, context_budget=context_budget)
@@ -0,0 +1,94 @@
+"""
+Shared Summarization Model Registry
+
+One process-wide cache of the transformers model, tokenizer and outlines wrapper used by
+both llm_summary and llm_summary_merged, so using the two modules in one process (or in the
+summarization server) loads the weights once.
+
+The model and device default to Llama-3.2-3B-Instruct on CUDA and can be overridden with
+the LLM_SUMMARY_MODEL and LLM_SUMMARY_DEVICE environment variables, e.g. a tiny test model
+on CPU:
+    LLM_SUMMARY_MODEL=hf-internal-testing/tiny-random-LlamaForCausalLM LLM_SUMMARY_DEVICE=cpu
+"""
+
+import os
+import threading
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+from outlines.models import from_transformers
+
+DEFAULT_MODEL_NAME = "meta-llama/Llama-3.2-3B-Instruct"
+DEFAULT_DEVICE = "cuda"
+
+# Module-level caches keyed by (model name, device)
+_model_cache = {}
+_tokenizer_cache = {}
+_outlines_model_cache = {}
+_cache_lock = threading.RLock()
+
+
+def default_model_name() -> str:
+    return os.getenv("LLM_SUMMARY_MODEL") or DEFAULT_MODEL_NAME
+
+
+def default_device() -> str:
+    return os.getenv("LLM_SUMMARY_DEVICE") or DEFAULT_DEVICE
+
+
+def load_model(model_name: str = None, hf_token: str = None, device: str = None):
+    """Load transformers model and tokenizer with caching."""
+    model_name = model_name or default_model_name()
+    device = device or default_device()
+    key = (model_name, device)
+    with _cache_lock:
+        if key not in _model_cache:
+            if device == "cuda" and not torch.cuda.is_available():
+                raise RuntimeError("CUDA GPU is REQUIRED but not available! "
+                                   "Set LLM_SUMMARY_DEVICE=cpu to run on CPU.")
+
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_name,
+                token=hf_token
+            )
+            # Batched generation with a decoder-only model pads on the left; Llama has no pad token
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            tokenizer.padding_side = "left"
+            _tokenizer_cache[key] = tokenizer
+            if device == "cuda":
+                model = AutoModelForCausalLM.from_pretrained(
+                    model_name,
+                    token=hf_token,
+                    dtype=torch.float16,
+                    device_map="auto"
+                )
+            else:
+                model = AutoModelForCausalLM.from_pretrained(
+                    model_name,
+                    token=hf_token,
+                    dtype=torch.float32
+                ).to(device)
+            _model_cache[key] = model
+
+    return _model_cache[key], _tokenizer_cache[key]
+
+
+def get_outlines_model(model_name: str = None, hf_token: str = None, device: str = None):
+    """Get outlines model wrapper with caching."""
+    model_name = model_name or default_model_name()
+    device = device or default_device()
+    key = (model_name, device)
+    with _cache_lock:
+        if key not in _outlines_model_cache:
+            hf_model, tokenizer = load_model(model_name, hf_token, device)
+            # Wrap the transformers model with outlines
+            _outlines_model_cache[key] = from_transformers(hf_model, tokenizer)
+
+    return _outlines_model_cache[key]
+
+
+def loaded_models() -> list:
+    """(model name, device) pairs currently held in memory."""
+    with _cache_lock:
+        return sorted(_model_cache)
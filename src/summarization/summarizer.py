@@ -0,0 +1,170 @@
+"""
+Structured Summarizer
+
+Model loading, context fitting, batched constrained generation and fallback summaries shared
+by llm_summary (integer doc IDs) and llm_summary_merged (int or URL doc IDs). Each module
+supplies only its schemas, prompt and doc-ID normalization.
+
+A corpus is fitted to the context budget once per query. Retries and fallback summaries use
+that fitted corpus, so fallback evidence IDs only cite documents the model was shown.
+"""
+
+import os
+
+from src.summarization.model_registry import default_model_name, get_outlines_model, load_model
+from src.summarization.summary_repair import (
+    GENERATION_KWARGS, SummaryGenerator, SummaryGenerationError, new_stats, fallback_text
+)
+from src.summarization.context_budget import fit_corpus, record_context
+from src.summarization.prefix_cache import get_prefix_cache
+
+# Prompts per padded batch when no prompt prefix cache is loaded (see summarize_batch)
+UNCACHED_BATCH_SIZE = 4
+
+
+class StructuredSummarizer:
+    """
+    summarize_query / summarize_batch for one summary format.
+
+    Args:
+        summary_schema: Pydantic model of the full summary (2 claims)
+        claim_schema: Pydantic model of a single claim
+        prompt_prefix: static start of every summary prompt (cached, see prefix_cache)
+        build_prompt: (query, merged_corpus) -> full summary prompt
+        format_corpus: merged_corpus -> document listing used in prompts
+        normalize_id: maps a generated evidence ID onto the corpus ID type
+    """
+
+    def __init__(self, summary_schema, claim_schema, prompt_prefix: str, build_prompt, format_corpus,
+                 normalize_id):
+        self.summary_schema = summary_schema
+        self.prompt_prefix = prompt_prefix
+        self.build_prompt = build_prompt
+        self.format_corpus = format_corpus
+        self.normalize_id = normalize_id
+        # Validate-and-repair loop shared by summarize_query and summarize_batch
+        self.generator = SummaryGenerator(summary_schema, claim_schema, build_prompt, format_corpus, normalize_id)
+
+    def _load(self):
+        """(outlines model, tokenizer, prefix cache), loaded once per process."""
+        model_name = default_model_name()
+        hf_token = os.getenv("HF_TOKEN")
+        model = get_outlines_model(model_name, hf_token)
+        _, tokenizer = load_model(model_name, hf_token)
+        prefix_cache = get_prefix_cache(self.prompt_prefix, model_name, hf_token)
+        return model, tokenizer, prefix_cache
+
+    def fallback_summary(self, merged_corpus: list, reason) -> list:
+        """Two placeholder claims citing the first (up to 3) documents, marked as a fallback."""
+        fallback_ids = [self.normalize_id(doc.get('id', '')) for doc in merged_corpus[:3]]
+        text = fallback_text(reason)
+        return [
+            {"claim": "Positive claim", "perspectives": [{"text": text, "evidence_docs": list(fallback_ids)}]},
+            {"claim": "Negative claim", "perspectives": [{"text": text, "evidence_docs": list(fallback_ids)}]},
+        ]
+
+    def _summarize_fitted(self, model, tokenizer, prefix_cache, query: str, corpus: list, stats: dict) -> list:
+        """Generate (with repairs and retries) from an already fitted corpus, else fall back."""
+        try:
+            return self.generator.generate(model, tokenizer, query, corpus, stats, prefix_cache)
+        except SummaryGenerationError as e:
+            print(f"{e}. Returning fallback summary.")
+            return self.fallback_summary(corpus, e)
+        finally:
+            print(f"Generation stats: {stats}")
+
+    def summarize_query(self, query: str, merged_corpus: list, stats: dict = None,
+                        context_budget: int = None) -> list:
+        if not merged_corpus:
+            return []
+        try:
+            model, tokenizer, prefix_cache = self._load()
+        except Exception as e:
+            print(f"Error loading model: {e}")
+            return []
+
+        stats = new_stats() if stats is None else stats
+        corpus, context = fit_corpus(query, merged_corpus, tokenizer, self.build_prompt, context_budget)
+        record_context(stats, context)
+
+        if self.generator.verbose:
+            print("================================ CORPUS TEXT =================================")
+            print(self.format_corpus(corpus))
+            print("================================ CORPUS TEXT =================================")
+
+        return self._summarize_fitted(model, tokenizer, prefix_cache, query, corpus, stats)
+
+    def generate_batch(self, model, prompts: list, max_new_tokens: int, prefix_cache=None,
+                       stats: list = None) -> list:
+        """
+        Run constrained generation for several prompts in one padded batch. Single prompts are
+        generated on their own so they can reuse the prompt prefix cache. A padded batch cannot:
+        left padding shifts the prefix to a different position in every row, so batched
+        prompts pay the full prefill. Retries and claim regenerations are single-prompt calls
+        and still use the cache.
+
+        Args:
+            stats: optional generation-counter dicts, one per prompt (prefix_cache_hits)
+        """
+        kwargs = {"max_new_tokens": max_new_tokens, **GENERATION_KWARGS}
+        if hasattr(model, "batch") and len(prompts) > 1:
+            return model.batch(prompts, self.summary_schema, **kwargs)
+        # A single prompt, or an older outlines release without a batch API
+        results = []
+        for i, prompt in enumerate(prompts):
+            cache_kwargs = prefix_cache.generation_kwargs(prompt) if prefix_cache is not None else {}
+            if cache_kwargs and stats is not None:
+                stats[i]["prefix_cache_hits"] += 1
+            results.append(model(prompt, self.summary_schema, **kwargs, **cache_kwargs))
+        return results
+
+    def summarize_batch(self, queries: list, corpora: list, batch_size: int = None, max_new_tokens: int = 1500,
+                        retry_failed: bool = True, stats: list = None, context_budget: int = None) -> list:
+        summaries = [[] for _ in queries]
+        query_stats = [new_stats() for _ in queries]
+        if stats is not None:
+            stats.extend(query_stats)
+        pending = [idx for idx, corpus in enumerate(corpora) if corpus]
+        if not pending:
+            return summaries
+
+        try:
+            model, tokenizer, prefix_cache = self._load()
+        except Exception as e:
+            print(f"Error loading model: {e}")
+            return summaries
+
+        if batch_size is None:
+            # Padded batches cannot reuse the prefix cache, so only batch without one
+            batch_size = 1 if prefix_cache is not None else UNCACHED_BATCH_SIZE
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            fitted = {}
+            for idx in chunk:
+                fitted[idx], context = fit_corpus(queries[idx], corpora[idx], tokenizer, self.build_prompt,
+                                                  context_budget)
+                record_context(query_stats[idx], context)
+            prompts = [self.build_prompt(queries[idx], fitted[idx]) for idx in chunk]
+            try:
+                results = self.generate_batch(model, prompts, max_new_tokens, prefix_cache,
+                                              [query_stats[idx] for idx in chunk])
+            except Exception as e:
+                print(f"BATCH GENERATION FAILED ({len(chunk)} prompts): {e}")
+                results = [None] * len(chunk)
+
+            for idx, prompt, result in zip(chunk, prompts, results):
+                try:
+                    if result is None:
+                        raise ValueError("no output from batched generation")
+                    query_stats[idx]["attempts"] += 1
+                    self.generator.record(tokenizer, prompt, result, query_stats[idx])
+                    summaries[idx] = self.generator.finish(result, queries[idx], fitted[idx], model, tokenizer,
+                                                           query_stats[idx], regenerate=retry_failed)
+                except Exception as e:
+                    if retry_failed:
+                        print(f"Batched generation for '{queries[idx][:60]}' failed: {e}. Retrying individually.")
+                        summaries[idx] = self._summarize_fitted(model, tokenizer, prefix_cache, queries[idx],
+                                                                fitted[idx], query_stats[idx])
+                    else:
+                        summaries[idx] = self.fallback_summary(fitted[idx], e)
+        return summaries
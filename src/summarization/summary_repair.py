@@ -0,0 +1,255 @@
+"""
+Summary Repair
+
+Generation with targeted repair for the constrained multi-perspective summaries of
+llm_summary and llm_summary_merged. Instead of regenerating the whole summary on every
+validation failure:
+
+1. The generated structure is checked claim by claim. Perspectives with empty text are
+   dropped, evidence IDs that are not in the corpus or were already cited by an earlier
+   perspective are removed, and perspectives left without evidence are dropped.
+2. A claim that is still invalid (empty, or no perspectives left) is re-prompted on its
+   own with the Claim schema, excluding the document IDs the other claim already uses.
+3. Output that is not valid JSON means generation ran out of room (prompt-length issue),
+   so the next full attempt uses a corpus with every document cut to half its length.
+
+Per-query counters are recorded in a `stats` dict: attempts (full generations),
+claim_regenerations, repairs, shrinks, prompt_tokens, completion_tokens and
+prefix_cache_hits (generations that reused the cached prompt prefix, see prefix_cache).
+
+When no valid summary can be produced, the summarizers return a fallback summary whose
+perspective texts start with FALLBACK_MARKER; is_fallback_text recognizes those (and the
+messages written by older releases) so downstream stages can skip failed summaries.
+
+Set LLM_SUMMARY_VERBOSE=1 to print every prompt corpus and generated response.
+"""
+
+import os
+import json
+
+GENERATION_KWARGS = {"temperature": 0.1, "top_p": 0.8}
+CLAIM_POLARITIES = ("positive", "negative")
+MIN_DOC_CHARS = 200
+
+# Prefix of every fallback perspective text
+FALLBACK_MARKER = "Error generating summary:"
+# Fallback messages of older summary files (merged summarizer before summary_repair)
+LEGACY_FALLBACK_PATTERNS = (
+    "JSON parse errors 5+ times (prompt too long)",
+    "All 10 generation attempts failed",
+)
+
+
+class SummaryGenerationError(Exception):
+    """Raised when a valid summary could not be produced within the attempt budget."""
+
+
+def fallback_text(reason: str) -> str:
+    """Perspective text of a fallback summary."""
+    return f"{FALLBACK_MARKER} {str(reason)[:100]}"
+
+
+def is_fallback_text(text: str) -> bool:
+    """Whether a perspective text comes from a fallback (failed) summary."""
+    text = text or ""
+    return text.startswith(FALLBACK_MARKER) or any(pattern in text for pattern in LEGACY_FALLBACK_PATTERNS)
+
+
+def new_stats() -> dict:
+    return {
+        "attempts": 0,
+        "claim_regenerations": 0,
+        "repairs": 0,
+        "shrinks": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "prefix_cache_hits": 0,
+    }
+
+
+def count_tokens(tokenizer, text: str) -> int:
+    if tokenizer is None:
+        return len(text) // 4
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def shrink_corpus(merged_corpus: list) -> list:
+    """Cut every document to half the length of the longest one (at least MIN_DOC_CHARS)."""
+    longest = max((len(doc.get('content', '')) for doc in merged_corpus), default=0)
+    limit = max(MIN_DOC_CHARS, longest // 2)
+    return [{**doc, 'content': doc.get('content', '')[:limit]} for doc in merged_corpus]
+
+
+def _as_dict(result) -> dict:
+    if isinstance(result, str):
+        return json.loads(result)
+    if hasattr(result, "model_dump"):
+        return result.model_dump()
+    return result
+
+
+class SummaryGenerator:
+    """
+    Generate-validate-repair loop for one summary format.
+
+    Args:
+        summary_schema: Pydantic model of the full summary (2 claims)
+        claim_schema: Pydantic model of a single claim
+        build_prompt: (query, merged_corpus) -> full summary prompt
+        format_corpus: merged_corpus -> document listing used in prompts
+        normalize_id: maps a generated evidence ID onto the corpus ID type
+        max_attempts: full-summary generations before giving up
+        max_claim_attempts: re-prompts per failing claim before a full regeneration
+        max_new_tokens: generation budget of a full summary (a claim gets a third)
+        verbose: print every generated response (default: LLM_SUMMARY_VERBOSE=1)
+    """
+
+    def __init__(self, summary_schema, claim_schema, build_prompt, format_corpus, normalize_id,
+                 max_attempts: int = 3, max_claim_attempts: int = 2, max_new_tokens: int = 1500,
+                 verbose: bool = None):
+        self.summary_schema = summary_schema
+        self.claim_schema = claim_schema
+        self.build_prompt = build_prompt
+        self.format_corpus = format_corpus
+        self.normalize_id = normalize_id
+        self.max_attempts = max_attempts
+        self.max_claim_attempts = max_claim_attempts
+        self.max_new_tokens = max_new_tokens
+        self.verbose = os.getenv("LLM_SUMMARY_VERBOSE", "0") == "1" if verbose is None else verbose
+
+    def _generate(self, model, tokenizer, prompt: str, schema, max_new_tokens: int, stats: dict,
+                  prefix_cache=None):
+        cache_kwargs = prefix_cache.generation_kwargs(prompt) if prefix_cache is not None else {}
+        if cache_kwargs:
+            stats["prefix_cache_hits"] += 1
+        result = model(prompt, schema, max_new_tokens=max_new_tokens, **GENERATION_KWARGS, **cache_kwargs)
+        self.record(tokenizer, prompt, result, stats)
+
+        if self.verbose:
+            print("================================ GENERATED RESPONSE =================================")
+            print(result)
+            print("================================ GENERATED RESPONSE =================================")
+        return result
+
+    def record(self, tokenizer, prompt: str, result, stats: dict):
+        """Add the tokens of one prompt/response pair to stats."""
+        text = result if isinstance(result, str) else json.dumps(_as_dict(result))
+        stats["prompt_tokens"] += count_tokens(tokenizer, prompt)
+        stats["completion_tokens"] += count_tokens(tokenizer, text)
+
+    def _repair_claim(self, raw_claim, valid_ids: set, used_ids: set):
+        """Return a cleaned claim dict (claiming its evidence IDs in used_ids), or None."""
+        if not isinstance(raw_claim, dict) or not str(raw_claim.get("claim") or "").strip():
+            return None
+        perspectives = []
+        claimed = set()
+        for perspective in raw_claim.get("perspectives") or []:
+            if not isinstance(perspective, dict) or not str(perspective.get("text") or "").strip():
+                continue
+            evidence = []
+            for raw_id in perspective.get("evidence_docs") or []:
+                doc_id = self.normalize_id(raw_id)
+                if doc_id in valid_ids and doc_id not in used_ids and doc_id not in claimed:
+                    evidence.append(doc_id)
+                    claimed.add(doc_id)
+            if evidence:
+                perspectives.append({"text": perspective["text"], "evidence_docs": evidence})
+        if not perspectives:
+            return None
+        used_ids.update(claimed)
+        return {"claim": raw_claim["claim"], "perspectives": perspectives}
+
+    def _claim_prompt(self, query: str, merged_corpus: list, polarity: str, used_ids: set,
+                      other_claim: dict) -> str:
+        excluded = ", ".join(str(doc_id) for doc_id in used_ids) or "none"
+        other = f'\n5. The other claim is: "{other_claim["claim"]}" - argue the opposite side.' if other_claim else ""
+        return f"""Given the query and documents, write ONE {polarity} claim in response to the query, with its supporting perspectives.
+
+Query: {query}
+
+Documents:
+{self.format_corpus(merged_corpus)}
+
+Rules:
+1. Only cite documents that directly address the query's subject matter.
+2. Each perspective MUST be a ONE-SENTENCE summary (max 20-30 words) - DO NOT copy entire paragraphs from documents
+3. Each perspective MUST reference at least one document ID from the provided documents
+4. DO NOT cite these document IDs, they are already used: {excluded}{other}
+
+Generate the JSON output now:"""
+
+    def finish(self, result, query: str, merged_corpus: list, model, tokenizer, stats: dict,
+               regenerate: bool = True) -> list:
+        """
+        Validate a generated summary, repairing it in place where possible and re-prompting
+        only the claims that cannot be repaired (unless regenerate is False).
+
+        Raises:
+            json.JSONDecodeError: the output is not JSON (treated as a prompt-length issue)
+            SummaryGenerationError: a claim could not be repaired
+        """
+        data = _as_dict(result)
+        raw_claims = data.get("summaries") if isinstance(data, dict) else None
+        raw_claims = raw_claims if isinstance(raw_claims, list) else []
+
+        valid_ids = {doc.get('id', '') for doc in merged_corpus}
+        # With a single document both claims have to cite it
+        share_ids = len(valid_ids) < len(CLAIM_POLARITIES)
+        used_ids = set()
+        claims = [
+            self._repair_claim(raw_claims[slot] if slot < len(raw_claims) else None, valid_ids,
+                               set() if share_ids else used_ids)
+            for slot in range(len(CLAIM_POLARITIES))
+        ]
+        if claims != raw_claims:
+            stats["repairs"] += 1
+
+        for slot, polarity in enumerate(CLAIM_POLARITIES):
+            attempt = 0
+            while claims[slot] is None and regenerate and attempt < self.max_claim_attempts:
+                attempt += 1
+                stats["claim_regenerations"] += 1
+                other_claim = claims[1 - slot]
+                prompt = self._claim_prompt(query, merged_corpus, polarity, used_ids, other_claim)
+                try:
+                    raw_claim = self._generate(model, tokenizer, prompt, self.claim_schema,
+                                               self.max_new_tokens // 3, stats)
+                    claims[slot] = self._repair_claim(_as_dict(raw_claim), valid_ids,
+                                                      set() if share_ids else used_ids)
+                except Exception as e:
+                    print(f"CLAIM REGENERATION {attempt}/{self.max_claim_attempts} FAILED: {e}")
+            if claims[slot] is None:
+                raise SummaryGenerationError(f"Could not repair the {polarity} claim")
+
+        summary_obj = self.summary_schema(summaries=claims)
+        return [claim.model_dump() for claim in summary_obj.summaries]
+
+    def generate(self, model, tokenizer, query: str, merged_corpus: list, stats: dict,
+                 prefix_cache=None) -> list:
+        """
+        Generate a validated summary, repairing claims and shrinking the corpus as needed.
+        Full generations reuse prefix_cache (a PrefixCache of the summary prompt) if given.
+
+        Raises:
+            SummaryGenerationError: no valid summary within max_attempts full generations
+        """
+        corpus = merged_corpus
+        last_error = None
+        while stats["attempts"] < self.max_attempts:
+            stats["attempts"] += 1
+            attempt = stats["attempts"]
+            prompt = self.build_prompt(query, corpus)
+            try:
+                result = self._generate(model, tokenizer, prompt, self.summary_schema,
+                                        self.max_new_tokens, stats, prefix_cache)
+                return self.finish(result, query, corpus, model, tokenizer, stats)
+            except json.JSONDecodeError as e:
+                print(f"GENERATION ATTEMPT {attempt}/{self.max_attempts} FAILED (JSON parse error): {e}")
+                last_error = f"JSON parse errors {attempt} times (prompt too long)"
+                if stats["attempts"] < self.max_attempts:
+                    corpus = shrink_corpus(corpus)
+                    stats["shrinks"] += 1
+            except Exception as e:
+                print(f"GENERATION ATTEMPT {attempt}/{self.max_attempts} FAILED: {e}")
+                last_error = f"All {attempt} generation attempts failed: {str(e)[:100]}"
+        raise SummaryGenerationError(last_error or "No generation attempts left")
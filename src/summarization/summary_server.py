@@ -0,0 +1,232 @@
+"""
+Local Summarization Server
+
+Long-lived localhost HTTP server that loads the summarization model once at startup and
+serves summarize_query requests, so repeated run_pipeline.py invocations skip the model
+load (and the torch/transformers/outlines imports) entirely. Generation is serialized;
+/health answers while a request is generating.
+
+Endpoints:
+    GET  /health     -> {"status": "ok", "models": [[name, device], ...], "requests": n}
+    POST /summarize  {"query": str, "merged_corpus": [...], "mode": "standard" | "merged",
+                      "context_budget": int (optional)}
+                     -> {"summary": [...], "stats": {...}}   (same output as summarize_query)
+    POST /summarize_batch  {"queries": [...], "corpora": [...], "mode": ..., "batch_size": int (optional),
+                            "context_budget": int (optional)}
+                     -> {"summaries": [...], "stats": [...]} (same output as summarize_batch)
+
+Usage:
+    # Start once (Llama-3.2-3B-Instruct on CUDA by default)
+    python -m src.summarization.summary_server --port 8765
+
+    # Tiny model on CPU for testing
+    python -m src.summarization.summary_server --device cpu \
+        --model hf-internal-testing/tiny-random-LlamaForCausalLM
+
+    # Point the pipeline at it
+    python run_pipeline.py --summary-server http://127.0.0.1:8765 --offline-k 5 --limit 5
+
+    # In code: in-process or remote summarizer with the same call signature
+    from src.summarization.summary_server import get_summarizer
+    summarize = get_summarizer("merged", server_url="http://127.0.0.1:8765")
+    summary = summarize(query, merged_corpus)
+    summarize_batch = get_batch_summarizer("merged", server_url="http://127.0.0.1:8765")
+    summaries = summarize_batch(queries, corpora)
+"""
+
+import os
+import json
+import argparse
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import httpx
+
+from src.summarization.summary_repair import new_stats
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+SUMMARY_MODES = ("standard", "merged")
+DEFAULT_TIMEOUT = 1800.0
+
+
+def _summary_module(mode: str):
+    # Imported lazily: these pull in torch/transformers/outlines
+    if mode == "standard":
+        from src.summarization import llm_summary
+        return llm_summary
+    if mode == "merged":
+        from src.summarization import llm_summary_merged
+        return llm_summary_merged
+    raise ValueError(f"Unknown summary mode '{mode}'. Choose from: {list(SUMMARY_MODES)}")
+
+
+class RemoteSummarizer:
+    """Callable with the summarize_query signature that forwards to a summarization server."""
+
+    def __init__(self, server_url: str, mode: str = "standard", timeout: float = DEFAULT_TIMEOUT):
+        if mode not in SUMMARY_MODES:
+            raise ValueError(f"Unknown summary mode '{mode}'. Choose from: {list(SUMMARY_MODES)}")
+        self.server_url = server_url.rstrip("/")
+        self.mode = mode
+        self.timeout = timeout
+
+    def health(self) -> dict:
+        response = httpx.get(f"{self.server_url}/health", timeout=10.0)
+        response.raise_for_status()
+        return response.json()
+
+    def __call__(self, query: str, merged_corpus: list, stats: dict = None, context_budget: int = None):
+        response = httpx.post(
+            f"{self.server_url}/summarize",
+            json={"query": query, "merged_corpus": merged_corpus, "mode": self.mode,
+                  "context_budget": context_budget},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        payload = response.json()
+        if stats is not None:
+            stats.update(payload.get("stats", {}))
+        return payload["summary"]
+
+    def summarize_batch(self, queries: list, corpora: list, batch_size: int = None, stats: list = None,
+                        context_budget: int = None):
+        response = httpx.post(
+            f"{self.server_url}/summarize_batch",
+            json={"queries": queries, "corpora": corpora, "mode": self.mode, "batch_size": batch_size,
+                  "context_budget": context_budget},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        payload = response.json()
+        if stats is not None:
+            stats.extend(payload.get("stats", []))
+        return payload["summaries"]
+
+
+def get_summarizer(mode: str = "standard", server_url: str = None):
+    """
+    Return a summarize(query, merged_corpus, stats, context_budget) callable.
+
+    Args:
+        mode: "standard" (llm_summary, integer doc IDs) or "merged" (llm_summary_merged,
+              int or URL doc IDs)
+        server_url: Summarization server to forward to (default: LLM_SUMMARY_SERVER env var);
+                    None loads the model in this process
+    """
+    server_url = server_url or os.getenv("LLM_SUMMARY_SERVER")
+    if server_url:
+        return RemoteSummarizer(server_url, mode=mode)
+    return _summary_module(mode).summarize_query
+
+
+def get_batch_summarizer(mode: str = "standard", server_url: str = None):
+    """
+    Return a summarize_batch(queries, corpora, batch_size, stats, context_budget) callable;
+    arguments as for get_summarizer.
+    """
+    server_url = server_url or os.getenv("LLM_SUMMARY_SERVER")
+    if server_url:
+        return RemoteSummarizer(server_url, mode=mode).summarize_batch
+    return _summary_module(mode).summarize_batch
+
+
+class SummaryRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SummaryServer/1.0"
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        from src.summarization.model_registry import loaded_models
+        self._send_json(200, {
+            "status": "ok",
+            "models": [list(key) for key in loaded_models()],
+            "requests": self.server.requests_served,
+        })
+
+    def do_POST(self):
+        if self.path not in ("/summarize", "/summarize_batch"):
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            module = _summary_module(request.get("mode", "standard"))
+        except (json.JSONDecodeError, ValueError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        start = time.perf_counter()
+        try:
+            with self.server.generate_lock:
+                if self.path == "/summarize":
+                    label = f"'{request.get('query', '')[:60]}'"
+                    stats = new_stats()
+                    summary = module.summarize_query(request.get("query", ""), request.get("merged_corpus") or [],
+                                                     stats=stats, context_budget=request.get("context_budget"))
+                    payload = {"summary": summary, "stats": stats}
+                else:
+                    label = f"{len(request.get('queries', []))} queries"
+                    stats = []
+                    summaries = module.summarize_batch(request.get("queries", []), request.get("corpora", []),
+                                                       batch_size=request.get("batch_size"), stats=stats,
+                                                       context_budget=request.get("context_budget"))
+                    payload = {"summaries": summaries, "stats": stats}
+                self.server.requests_served += 1
+        except Exception as e:
+            print(f"Error summarizing: {e}")
+            self._send_json(500, {"error": str(e)})
+            return
+        print(f"Summarized {label} in {time.perf_counter() - start:.1f}s")
+        self._send_json(200, payload)
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, warm: bool = True):
+    """Run the summarization server until interrupted."""
+    server = ThreadingHTTPServer((host, port), SummaryRequestHandler)
+    server.generate_lock = threading.Lock()
+    server.requests_served = 0
+
+    if warm:
+        from src.summarization.model_registry import default_model_name, default_device, get_outlines_model
+        start = time.perf_counter()
+        get_outlines_model(default_model_name(), os.getenv("HF_TOKEN"))
+        print(f"Loaded {default_model_name()} on {default_device()} in {time.perf_counter() - start:.1f}s")
+
+    print(f"Summarization server listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve summarize_query from a process that keeps the model loaded")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", help="Hugging Face model name (default: LLM_SUMMARY_MODEL or Llama-3.2-3B-Instruct)")
+    parser.add_argument("--device", help="Device to load the model on, e.g. cuda or cpu (default: LLM_SUMMARY_DEVICE or cuda)")
+    parser.add_argument("--no-warm", action="store_true", help="Load the model on the first request instead of at startup")
+    args = parser.parse_args()
+
+    # The summarizers read the model and device from the registry defaults
+    if args.model:
+        os.environ["LLM_SUMMARY_MODEL"] = args.model
+    if args.device:
+        os.environ["LLM_SUMMARY_DEVICE"] = args.device
+    serve(args.host, args.port, warm=not args.no_warm)
+
+
+if __name__ == "__main__":
+    main()
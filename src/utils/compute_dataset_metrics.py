@@ -12,7 +12,8 @@ import statistics
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.utils.io import load_theperspective_dataset, load_theperspective_evidence
+from src.utils.io import load_theperspective_corpus
+from src.utils.gold_references import get_gold_index
 
 
 def count_words(text):
@@ -22,8 +23,9 @@ def count_words(text):
 
 def main():
     # Load dataset
-    dataset = load_theperspective_dataset("data/theperspective")
-    evidence = load_theperspective_evidence("data/theperspective")
+    corpus = load_theperspective_corpus("data/theperspective")
+    dataset = corpus.dataset
+    evidence = corpus.evidence()
     
     # Setup output file
     output_dir = project_root / "results" / "dataset-analysis"
@@ -65,6 +67,8 @@ def main():
     
     write(f"- **Unique queries:** {num_unique}")
     write(f"- **Duplicate queries:** {num_duplicates}")
+    ambiguous = get_gold_index(str(project_root / "data" / "theperspective" / "data.jsonl")).ambiguous_queries()
+    write(f"- **Ambiguous duplicate queries (different gold references):** {len(ambiguous)}")
     if num_duplicates > 0:
         write()
         write("**Sample duplicate queries (each appearing 2 times):**")
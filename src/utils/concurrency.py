@@ -0,0 +1,69 @@
+"""
+Concurrency helpers for rate-limited API clients.
+"""
+
+import random
+import threading
+import time
+
+
+class AdaptiveConcurrency:
+    """
+    Thread-safe limit on in-flight API calls that adapts to rate limiting (AIMD).
+
+    Use as a context manager around each API call. A rate-limit response halves the limit
+    (never below `min_limit`); every `increase_every` consecutive successes raise it by one,
+    up to `max_limit`.
+
+    Usage:
+        limiter = AdaptiveConcurrency(max_limit=8)
+        with limiter:
+            response = client.chat.completions.create(...)
+        limiter.on_success()          # or limiter.on_rate_limit() on a 429
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, increase_every: int = 10):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.increase_every = increase_every
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.rate_limited = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+        return False
+
+    def on_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.increase_every and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def on_rate_limit(self):
+        with self._cond:
+            self.rate_limited += 1
+            self._successes = 0
+            self.limit = max(self.min_limit, self.limit // 2)
+
+
+def jittered_backoff(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff delay for a 0-based retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def sleep_backoff(attempt: int, base: float = 1.0, cap: float = 30.0):
+    time.sleep(jittered_backoff(attempt, base=base, cap=cap))
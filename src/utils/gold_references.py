@@ -0,0 +1,120 @@
+"""
+Gold reference index for ThePerspective.
+
+data.jsonl is parsed once per process into gold references keyed by example id and by
+normalized query text (title with whitespace collapsed and case folded), so looking up the
+gold summary of a judged summary is a dict lookup instead of a rescan of the file.
+
+Some titles appear more than once in data.jsonl (see compute_dataset_metrics.py). A title
+whose examples have different gold references is ambiguous: looking it up by query alone
+returns the first example in file order (as the old line scan did) and prints a warning
+once; passing the example id selects the right one.
+
+Usage:
+    index = get_gold_index("data/theperspective/data.jsonl")
+    index.get("Should we Fight or Embrace Illegal Downloads?")
+    index.get(query, gold_id="businessandtechnology_12")
+    index.ambiguous_queries()     # {title: [ids]} for titles with differing references
+"""
+
+import json
+import threading
+from pathlib import Path
+
+DEFAULT_GOLD_FILE = "data/theperspective/data.jsonl"
+
+# Module-level cache of parsed indexes, keyed by resolved file path
+_index_cache = {}
+_index_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace and case-fold query text for matching."""
+    return " ".join((query or "").split()).casefold()
+
+
+def _build_perspectives(points: list, doc_ids: list) -> list:
+    return [{"text": point, "evidence_docs": [doc_ids[i]] if i < len(doc_ids) else []}
+            for i, point in enumerate(points)]
+
+
+def build_gold_reference(item: dict) -> list:
+    """Convert a data.jsonl example into the summary format (claim t1, then claim t2)."""
+    return [
+        {"claim": item.get("t1", ""),
+         "perspectives": _build_perspectives(item.get("response1", []), item.get("favor_ids", []))},
+        {"claim": item.get("t2", ""),
+         "perspectives": _build_perspectives(item.get("response2", []), item.get("against_ids", []))},
+    ]
+
+
+class GoldReferenceIndex:
+    """Gold references of ThePerspective examples, keyed by id and by normalized query."""
+
+    def __init__(self, items: list):
+        self.by_id = {}
+        self.ids_by_query = {}
+        self.titles = {}
+        self._warned = set()
+        for position, item in enumerate(items):
+            gold_id = item.get("id", position)
+            key = normalize_query(item.get("title", ""))
+            self.by_id[gold_id] = build_gold_reference(item)
+            self.ids_by_query.setdefault(key, []).append(gold_id)
+            self.titles.setdefault(key, item.get("title", "").strip())
+
+    @classmethod
+    def from_jsonl(cls, gold_file_path: str):
+        items = []
+        with open(gold_file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    items.append(json.loads(line))
+        return cls(items)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def duplicate_queries(self) -> dict:
+        """{title: [ids]} for titles shared by several examples."""
+        return {self.titles[key]: ids for key, ids in self.ids_by_query.items() if len(ids) > 1}
+
+    def ambiguous_queries(self) -> dict:
+        """{title: [ids]} for duplicate titles whose examples have different gold references."""
+        return {
+            title: ids for title, ids in self.duplicate_queries().items()
+            if any(self.by_id[gold_id] != self.by_id[ids[0]] for gold_id in ids[1:])
+        }
+
+    def get(self, query: str, gold_id=None):
+        """
+        Gold reference for an example id, or else for a query.
+
+        Args:
+            query: query text (matched after normalize_query)
+            gold_id: example id (e.g. "Entertainment_4"); used when it is in the index
+
+        Returns:
+            list in the summary format, or None if neither id nor query is known
+        """
+        if gold_id is not None and gold_id in self.by_id:
+            return self.by_id[gold_id]
+        key = normalize_query(query)
+        ids = self.ids_by_query.get(key)
+        if not ids:
+            return None
+        if len(ids) > 1 and key not in self._warned and \
+                any(self.by_id[other] != self.by_id[ids[0]] for other in ids[1:]):
+            self._warned.add(key)
+            print(f"Warning: query '{self.titles[key][:60]}' matches {len(ids)} gold examples with different "
+                  f"references {ids}; using {ids[0]}. Pass the example id to disambiguate.")
+        return self.by_id[ids[0]]
+
+
+def get_gold_index(gold_file_path: str = DEFAULT_GOLD_FILE) -> GoldReferenceIndex:
+    """Return the parsed gold reference index for a data.jsonl file (cached per process)."""
+    key = str(Path(gold_file_path).resolve())
+    with _index_lock:
+        if key not in _index_cache:
+            _index_cache[key] = GoldReferenceIndex.from_jsonl(gold_file_path)
+    return _index_cache[key]
@@ -1,6 +1,192 @@
 import json
+import mmap
+import pickle
+import re
+import threading
 from pathlib import Path
 
+import numpy as np
+
+from src.utils.gold_references import normalize_query
+
+DEFAULT_SNAPSHOT_DIR = "data/index"
+SNAPSHOT_VERSION = 1
+
+# Module-level cache of loaded corpora, keyed by resolved folder path
+_corpus_cache = {}
+
+# Module-level cache of query-indexed JSON files, keyed by (resolved path, size, mtime)
+_query_index_cache = {}
+_query_index_lock = threading.Lock()
+
+
+class Corpus:
+    """
+    ThePerspective queries and evidence documents, parsed once.
+
+    Documents are stored column-wise: an int64 id array, an int64 offset array, and one
+    UTF-8 text buffer holding every document back to back, so document i's content is
+    text[offsets[i]:offsets[i + 1]]. `get(doc_id)` is an O(1) dict lookup plus a slice.
+
+    The parsed corpus can be written to a pickle snapshot that later runs load instead of
+    parsing the JSONL files; the snapshot records the source files' sizes and mtimes and is
+    ignored once either file changes.
+
+    Usage:
+        corpus = load_theperspective_corpus("data/theperspective")
+        corpus.dataset          # list of query entries (see load_theperspective_dataset)
+        corpus.get(205)         # document text
+        corpus.evidence()       # [{"id": ..., "content": ...}, ...]
+    """
+
+    def __init__(self, dataset: list, ids, offsets, text: bytes):
+        self.dataset = dataset
+        self.ids = ids
+        self.offsets = offsets
+        self.text = text
+        self._positions = {int(doc_id): i for i, doc_id in enumerate(ids)}
+        self._evidence = None
+
+    @classmethod
+    def from_jsonl(cls, data_path, doc_path):
+        """Parse data.jsonl and doc_new.jsonl into a Corpus."""
+        ids = []
+        offsets = [0]
+        chunks = []
+        with open(doc_path, "r", encoding="utf-8") as f:
+            for line in f:
+                doc = json.loads(line)
+                encoded = doc["content"].encode("utf-8")
+                ids.append(doc["id"])
+                chunks.append(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+
+        dataset = []
+        with open(data_path, "r", encoding="utf-8") as f:
+            for line in f:
+                ex = json.loads(line)
+                dataset.append({
+                    "id": ex.get("id"),
+                    "query": ex.get("title", ""),
+                    "claims": [ex.get("t1", ""), ex.get("t2", "")],
+                    "perspectives": {
+                        "pro": ex.get("response1", []),
+                        "con": ex.get("response2", [])
+                    },
+                    "favor_ids": ex.get("favor_ids", []),
+                    "against_ids": ex.get("against_ids", [])
+                })
+
+        return cls(
+            dataset,
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(offsets, dtype=np.int64),
+            b"".join(chunks),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._positions
+
+    def get(self, doc_id, default=None):
+        """Return the content of document doc_id, or default if absent."""
+        i = self._positions.get(doc_id)
+        if i is None:
+            return default
+        return self.text[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def evidence(self):
+        """
+        Materialize the documents as the list format used by the retrievers, once per
+        Corpus. Every call returns the same list (so fingerprints and indexes keyed on it are
+        reused); treat it as read-only.
+
+        Returns:
+            list[dict]: [{"id": int, "content": str}, ...] in file order
+        """
+        if self._evidence is None:
+            self._evidence = [
+                {"id": int(doc_id), "content": self.text[start:end].decode("utf-8")}
+                for doc_id, start, end in zip(self.ids, self.offsets[:-1], self.offsets[1:])
+            ]
+        return self._evidence
+
+    def save_snapshot(self, path, source_stamp):
+        """Write the corpus and the stamp of its source files to a binary snapshot."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump({
+                "version": SNAPSHOT_VERSION,
+                "source_stamp": source_stamp,
+                "dataset": self.dataset,
+                "ids": self.ids,
+                "offsets": self.offsets,
+                "text": self.text,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load_snapshot(cls, path, source_stamp):
+        """
+        Load a snapshot written by save_snapshot.
+
+        Returns:
+            Corpus, or None if the snapshot is missing, unreadable or stale.
+        """
+        try:
+            with open(path, "rb") as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("source_stamp") != source_stamp:
+            return None
+        return cls(snapshot["dataset"], snapshot["ids"], snapshot["offsets"], snapshot["text"])
+
+
+def _source_stamp(*paths):
+    """(name, size, mtime_ns) of each source file, used to invalidate snapshots."""
+    stamp = []
+    for path in paths:
+        stat = Path(path).stat()
+        stamp.append((Path(path).name, stat.st_size, stat.st_mtime_ns))
+    return stamp
+
+
+def load_theperspective_corpus(folder_path: str, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR):
+    """
+    Load ThePerspective queries and documents once per process.
+
+    Uses, in order: the in-process cache, a fresh binary snapshot in snapshot_dir, or the
+    JSONL files (after which a snapshot is written for the next run).
+
+    Returns:
+        Corpus
+    """
+    folder = Path(folder_path)
+    key = str(folder.resolve())
+    if key in _corpus_cache:
+        return _corpus_cache[key]
+
+    data_path = folder / "data.jsonl"
+    doc_path = folder / "doc_new.jsonl"
+    stamp = _source_stamp(data_path, doc_path)
+    snapshot_path = Path(snapshot_dir) / f"{folder.name}-corpus.pkl"
+
+    corpus = Corpus.load_snapshot(snapshot_path, stamp)
+    if corpus is None:
+        corpus = Corpus.from_jsonl(data_path, doc_path)
+        try:
+            corpus.save_snapshot(snapshot_path, stamp)
+        except OSError as e:
+            print(f"Warning: could not write corpus snapshot to {snapshot_path}: {e}")
+
+    print(f"Loaded ThePerspective dataset from {folder_path} "
+          f"({len(corpus.dataset)} entries, {len(corpus)} documents).")
+
+    _corpus_cache[key] = corpus
+    return corpus
+
 
 def load_theperspective_dataset(folder_path: str):
     """
@@ -25,7 +211,8 @@ def load_theperspective_dataset(folder_path: str):
         }
 
     Returns:
-        list[dict]: Each item formatted for the pipeline as:
+        list[dict]: A new list (a shallow copy of the cached dataset), each item formatted
+        for the pipeline as:
         {
             "id": str,
             "query": str,
@@ -35,45 +222,99 @@ def load_theperspective_dataset(folder_path: str):
             "against_ids": [...],
         }
     """
-    folder = Path(folder_path)
-    data_path = folder / "data.jsonl"
-    doc_path = folder / "doc_new.jsonl"
+    return list(load_theperspective_corpus(folder_path).dataset)
 
-    # Evidence documents
-    documents = {}
-    with open(doc_path, "r", encoding="utf-8") as f:
-        for line in f:
-            doc = json.loads(line)
-            documents[doc["id"]] = doc["content"]
-
-    # Query, claims, and perspectives
-    dataset = []
-    with open(data_path, "r", encoding="utf-8") as f:
-        for line in f:
-            ex = json.loads(line)
-
-            entry = {
-                "id": ex.get("id"),
-                "query": ex.get("title", ""),
-                "claims": [ex.get("t1", ""), ex.get("t2", "")],
-                "perspectives": {
-                    "pro": ex.get("response1", []),
-                    "con": ex.get("response2", [])
-                },
-                "favor_ids": ex.get("favor_ids", []),
-                "against_ids": ex.get("against_ids", [])
-            }
-
-            dataset.append(entry)
 
-    print(f"Loaded ThePerspective dataset from {folder_path} "
-          f"({len(dataset)} entries, {len(documents)} documents).")
+def load_theperspective_evidence(folder_path: str):
+    """
+    Load evidence documents for theperspective dataset (the same cached list on every call,
+    see Corpus.evidence).
 
-    return dataset
+    Returns:
+        list[dict]: Each item formatted as:
+        {
+            "id": int,
+            "content": str
+        }
+    """
+    return load_theperspective_corpus(folder_path).evidence()
 
-def load_theperspective_evidence(folder_path: str):
+
+class JsonRecordIndex:
     """
-    Load evidence documents for theperspective dataset.
+    Lazy, id-indexed view over a file of JSON objects.
+
+    Supports line-delimited files (one object per line) and files holding a single JSON
+    array of objects. Opening the file only scans it for each record's id and byte span;
+    a record is decoded from the memory-mapped file when it is looked up by id. The file
+    and its mapping stay open until close() (or the end of a with block).
+
+    Usage:
+        with JsonRecordIndex("data/perspectrumx/perspective_pool_v1.0.json", id_key="pId") as pool:
+            pool.get(3695)["text"]
+    """
+
+    def __init__(self, path: str, id_key: str = "id"):
+        self.path = Path(path)
+        self.id_key = id_key
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._decoder = json.JSONDecoder()
+        self.offsets = {}
+
+        # Inside a JSON string every '"' is escaped, so an unescaped '{"<id_key>": <int>'
+        # can only be the start of a record.
+        pattern = re.compile(rb'\{"' + re.escape(id_key.encode("utf-8")) + rb'":\s*(-?\d+)')
+        starts = [(m.start(), int(m.group(1))) for m in pattern.finditer(self._mm)]
+        for i, (start, record_id) in enumerate(starts):
+            end = starts[i + 1][0] if i + 1 < len(starts) else len(self._mm)
+            self.offsets[record_id] = (start, end)
+
+    def close(self):
+        """Release the memory map and file handle; lookups fail afterwards."""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, record_id):
+        return record_id in self.offsets
+
+    def ids(self):
+        return list(self.offsets)
+
+    def get(self, record_id, default=None):
+        """Decode and return the record with this id, or default if absent."""
+        span = self.offsets.get(record_id)
+        if span is None:
+            return default
+        text = self._mm[span[0]:span[1]].decode("utf-8")
+        record, _ = self._decoder.raw_decode(text)
+        return record
+
+    def __iter__(self):
+        """Stream records in file order."""
+        for record_id in self.offsets:
+            yield self.get(record_id)
+
+
+def load_perspectrumx_evidence(folder_path: str):
+    """
+    Load evidence documents for the PerspectrumX dataset.
+
+    evidence_pool.json is line-delimited, one object per line:
+        {"id": 0, "evidence": "Evidence text..."}
 
     Returns:
         list[dict]: Each item formatted as:
@@ -82,22 +323,190 @@ def load_theperspective_evidence(folder_path: str):
             "content": str
         }
     """
-    folder = Path(folder_path)
-    doc_path = folder / "doc_new.jsonl"
+    with JsonRecordIndex(Path(folder_path) / "evidence_pool.json", id_key="id") as pool:
+        return [{"id": doc["id"], "content": doc["evidence"]} for doc in pool]
 
-    evidence = []
-    with open(doc_path, "r", encoding="utf-8") as f:
-        for line in f:
-            doc = json.loads(line)
-            evidence.append({
-                "id": doc["id"],
-                "content": doc["content"]
-            })
 
-    return evidence
+def open_perspectrumx_pools(folder_path: str):
+    """
+    Open lazy id-indexed views of the PerspectrumX perspective and evidence pools.
+
+    Returns:
+        tuple[JsonRecordIndex, JsonRecordIndex]: (perspectives keyed by pId,
+        evidence keyed by id); the caller closes both
+    """
+    folder = Path(folder_path)
+    perspectives = JsonRecordIndex(folder / "perspective_pool_v1.0.json", id_key="pId")
+    evidence = JsonRecordIndex(folder / "evidence_pool.json", id_key="id")
+    return perspectives, evidence
 
 
 def load_perspectrumx_dataset(folder_path: str):
-    # Placeholder for PerspectrumX dataset
-    raise NotImplementedError("PerspectrumX dataset not implemented yet.")
- 
\ No newline at end of file
+    """
+    Load the PerspectrumX dataset from data/perspectrumx/
+
+    perspectrumx.json example (one claim per line):
+        {
+            "id": 0,
+            "text": "Vaccination must be made compulsory",
+            "perspectives": [
+                {"pids": [3695, 24076], "stance_label": "SUPPORT", "evidence": [3691]},
+                {"pids": [3698], "stance_label": "UNDERMINE", "evidence": [3694, 8021]}
+            ]
+        }
+
+    perspective_pool_v1.0.json is a JSON array of {"pId", "text", "source"}; the first
+    pid of each perspective cluster is used as its text. Only perspectives referenced
+    by a claim are decoded; evidence stays in evidence_pool.json and is referenced by id.
+
+    Returns:
+        list[dict]: Each item formatted for the pipeline as:
+        {
+            "id": str,
+            "query": str,
+            "claims": [text],
+            "perspectives": {"pro": [...], "con": [...]},
+            "favor_ids": [...],
+            "against_ids": [...],
+        }
+    """
+    folder = Path(folder_path)
+    claims = JsonRecordIndex(folder / "perspectrumx.json", id_key="id")
+    perspective_pool, evidence_pool = open_perspectrumx_pools(folder_path)
+    with claims, perspective_pool, evidence_pool:
+        dataset = [_perspectrumx_entry(ex, perspective_pool) for ex in claims]
+        num_documents = len(evidence_pool)
+
+    print(f"Loaded PerspectrumX dataset from {folder_path} "
+          f"({len(dataset)} entries, {num_documents} documents).")
+
+    return dataset
+
+
+def _perspectrumx_entry(ex: dict, perspective_pool: JsonRecordIndex) -> dict:
+    """Pipeline entry of one PerspectrumX claim (see load_perspectrumx_dataset)."""
+    pro, con = [], []
+    favor_ids, against_ids = [], []
+    for perspective in ex.get("perspectives", []):
+        pids = perspective.get("pids", [])
+        record = perspective_pool.get(pids[0]) if pids else None
+        text = record.get("text", "") if record else ""
+        if perspective.get("stance_label") == "SUPPORT":
+            pro.append(text)
+            favor_ids.extend(perspective.get("evidence", []))
+        else:
+            con.append(text)
+            against_ids.extend(perspective.get("evidence", []))
+
+    return {
+        "id": f"perspectrumx_{ex.get('id')}",
+        "query": ex.get("text", ""),
+        "claims": [ex.get("text", "")],
+        "perspectives": {
+            "pro": pro,
+            "con": con
+        },
+        "favor_ids": list(dict.fromkeys(favor_ids)),
+        "against_ids": list(dict.fromkeys(against_ids))
+    }
+
+
+class JsonQueryIndex:
+    """
+    A JSON array of query entries (merged corpora, summary results), loaded once and
+    indexed by normalized query text and by entry id.
+
+    Entries without an "id" get the positional id "query_{i}" that run_pipeline.py assigns
+    to merged-corpus results. A query that appears several times maps to its first entry,
+    as a scan of the file would.
+
+    Usage:
+        summaries = get_query_index("results/merged-summaries/results-merged-10-20251215_082353.json")
+        summaries.entry("Is China the Next Superpower?")
+        summaries.entry(entry_id="query_12")
+    """
+
+    def __init__(self, entries: list, query_key: str = "query"):
+        self.entries = entries
+        self.query_key = query_key
+        self._by_query = {}
+        self._by_id = {}
+        for position, entry in enumerate(entries):
+            self._by_query.setdefault(normalize_query(entry.get(query_key, "")), position)
+            self._by_id.setdefault(entry.get("id", f"query_{position}"), position)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def position(self, query: str = None, entry_id=None):
+        """
+        Index of the entry with this id (if its query matches, when a query is given), or
+        else of the first entry with this query; None if neither is present.
+        """
+        key = normalize_query(query) if query is not None else None
+        position = self._by_id.get(entry_id) if entry_id is not None else None
+        if position is not None and (key is None or
+                                     normalize_query(self.entries[position].get(self.query_key, "")) == key):
+            return position
+        return self._by_query.get(key) if key is not None else None
+
+    def entry(self, query: str = None, entry_id=None):
+        position = self.position(query, entry_id)
+        return None if position is None else self.entries[position]
+
+
+class MergedCorpusStore(JsonQueryIndex):
+    """
+    merged-{k}.json indexed by query and id, with each entry's documents split once into
+    web docs ("https://" ids) and offline docs (integer ids from the local corpus).
+
+    Lookups return new {"id", "content"} dicts (the content strings are shared, not copied),
+    so callers can serialize or annotate them without touching the cached entries.
+
+    Usage:
+        store = get_merged_store("data/merged-corpus/merged-10.json")
+        store.web_docs("Is China the Next Superpower?")      # list of {"id", "content"} dicts
+        store.offline_docs(entry_id="query_12")
+    """
+
+    def __init__(self, entries: list, query_key: str = "query"):
+        super().__init__(entries, query_key)
+        self._web = []
+        self._offline = []
+        for entry in entries:
+            docs = entry.get("merged", [])
+            self._web.append(tuple(doc for doc in docs
+                                   if isinstance(doc.get("id"), str) and doc["id"].startswith("https://")))
+            self._offline.append(tuple(doc for doc in docs if isinstance(doc.get("id"), int)))
+
+    @staticmethod
+    def _plain(docs: tuple) -> list:
+        return [{"id": doc["id"], "content": doc.get("content", "")} for doc in docs]
+
+    def web_docs(self, query: str = None, entry_id=None) -> list:
+        position = self.position(query, entry_id)
+        return [] if position is None else self._plain(self._web[position])
+
+    def offline_docs(self, query: str = None, entry_id=None) -> list:
+        position = self.position(query, entry_id)
+        return [] if position is None else self._plain(self._offline[position])
+
+
+def _load_query_index(path: str, index_class):
+    stat = Path(path).stat()
+    key = (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns, index_class.__name__)
+    with _query_index_lock:
+        if key not in _query_index_cache:
+            with open(path, "r", encoding="utf-8") as f:
+                _query_index_cache[key] = index_class(json.load(f))
+        return _query_index_cache[key]
+
+
+def get_query_index(path: str) -> JsonQueryIndex:
+    """Return the JsonQueryIndex of a JSON file (parsed once per process and file version)."""
+    return _load_query_index(path, JsonQueryIndex)
+
+
+def get_merged_store(path: str) -> MergedCorpusStore:
+    """Return the MergedCorpusStore of a merged-{k}.json file (parsed once per process and file version)."""
+    return _load_query_index(path, MergedCorpusStore)
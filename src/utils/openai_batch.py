@@ -0,0 +1,214 @@
+"""
+OpenAI Batch API helpers.
+
+Serializes many requests into JSONL batch input files, uploads and submits them, polls the
+batches until they finish, and downloads the output (and error) lines into one results
+file. Requests are split into several batches when they exceed the per-batch request count
+or input file size limits; all parts are submitted before polling, so they run concurrently. Results come back keyed by each request's custom_id, so callers join them to their
+own records; line order in the output file is not guaranteed.
+
+A saved results file can be replayed without any API calls, which is also how the join
+logic is exercised offline (write canned output lines and pass them as replay_path). Callers
+can save a JSON manifest next to it (what each custom_id was about) and read it back on
+replay with load_manifest, instead of re-deriving it from state that may have changed.
+
+Each results line is the Batch API output format:
+    {"custom_id": "...", "response": {"status_code": 200, "body": {...}}, "error": null}
+
+Usage:
+    requests = [batch_request("q0", "/v1/chat/completions", body) for ...]
+    results = run_batch(requests, "/v1/chat/completions", "data/batch", "relevance-web-5",
+                        client=get_client())
+    results["q0"]              # {"body": {...}, "error": None}
+
+    # Later, join the same results again without calling the API
+    results = run_batch(requests, "/v1/chat/completions", "data/batch", "relevance-web-5",
+                        replay_path="data/batch/relevance-web-5-20250101_120000-results.jsonl")
+"""
+
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+DEFAULT_POLL_INTERVAL = 30.0
+COMPLETION_WINDOW = "24h"
+# Batch API limits per input file are 50,000 requests and 200 MB; stay a little under the size
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+
+
+def batch_request(custom_id: str, endpoint: str, body: dict) -> dict:
+    """One line of a batch input file."""
+    return {"custom_id": custom_id, "method": "POST", "url": endpoint, "body": body}
+
+
+def split_requests(requests: list, max_requests: int = MAX_BATCH_REQUESTS,
+                   max_bytes: int = MAX_BATCH_BYTES) -> list:
+    """Split requests into consecutive parts within the per-batch request and byte limits."""
+    parts, part, part_bytes = [], [], 0
+    for request in requests:
+        size = len(json.dumps(request, ensure_ascii=False).encode("utf-8")) + 1
+        if part and (len(part) >= max_requests or part_bytes + size > max_bytes):
+            parts.append(part)
+            part, part_bytes = [], 0
+        part.append(request)
+        part_bytes += size
+    if part:
+        parts.append(part)
+    return parts
+
+
+def write_requests(requests: list, path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    return path
+
+
+def read_results(path) -> dict:
+    """
+    Read a batch output/error file.
+
+    Returns:
+        dict mapping custom_id to {"body": response body or None, "error": message or None};
+        non-200 responses are reported as errors
+    """
+    results = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            error = record.get("error")
+            if error is None and response.get("status_code", 200) != 200:
+                error = (response.get("body") or {}).get("error") or f"HTTP {response.get('status_code')}"
+            if isinstance(error, dict):
+                error = error.get("message") or json.dumps(error)
+            results[record["custom_id"]] = {
+                "body": None if error else response.get("body"),
+                "error": error,
+            }
+    return results
+
+
+def manifest_path_for(results_path) -> Path:
+    """Path of the manifest saved next to a batch results file (see run_batch)."""
+    results_path = Path(results_path)
+    suffix = "-results.jsonl"
+    if results_path.name.endswith(suffix):
+        return results_path.with_name(results_path.name[:-len(suffix)] + "-manifest.json")
+    return results_path.with_name(results_path.name + ".manifest.json")
+
+
+def load_manifest(results_path):
+    """The manifest saved with a batch results file, or None if there is none."""
+    path = manifest_path_for(results_path)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def submit_batch(client, requests_path, endpoint: str, metadata: dict = None):
+    """Upload a batch input file and create the batch."""
+    with open(requests_path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    return client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=endpoint,
+        completion_window=COMPLETION_WINDOW,
+        metadata=metadata,
+    )
+
+
+def wait_for_batch(client, batch_id: str, poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """Poll a batch until it reaches a terminal status."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = getattr(batch, "request_counts", None)
+        progress = f" ({counts.completed + counts.failed}/{counts.total})" if counts else ""
+        print(f"Batch {batch_id}: {batch.status}{progress}")
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+
+def download_results(client, batches: list, results_path) -> Path:
+    """Write the output and error lines of one or more batches into one results file."""
+    results_path = Path(results_path)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_path, "w", encoding="utf-8") as f:
+        for batch in batches:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if not file_id:
+                    continue
+                text = client.files.content(file_id).text
+                f.write(text if text.endswith("\n") or not text else text + "\n")
+    return results_path
+
+
+def run_batch(requests: list, endpoint: str, work_dir, name: str, client=None,
+              poll_interval: float = DEFAULT_POLL_INTERVAL, replay_path=None,
+              max_requests: int = MAX_BATCH_REQUESTS, max_bytes: int = MAX_BATCH_BYTES,
+              manifest: dict = None) -> dict:
+    """
+    Submit requests as one or more batches and wait for the results, or replay a saved results
+    file. The results of all parts are merged into one results file.
+
+    Args:
+        requests: batch_request dicts (custom_ids must be unique)
+        endpoint: API endpoint of every request, e.g. "/v1/responses"
+        work_dir: directory for the {name}-{timestamp}-requests.jsonl (-requests-{part}.jsonl
+                  when split) and {name}-{timestamp}-results.jsonl files
+        name: file name prefix
+        client: OpenAI client (required unless replaying)
+        poll_interval: seconds between status checks
+        replay_path: saved results file to read instead of submitting a batch
+        max_requests: most requests per batch
+        max_bytes: largest batch input file in bytes
+        manifest: optional JSON-serializable record saved as {name}-{timestamp}-manifest.json
+                  next to the results file (read it back with load_manifest)
+
+    Returns:
+        dict mapping custom_id to {"body", "error"} (see read_results); requests without a
+        result line are missing from it
+    """
+    if replay_path:
+        results = read_results(replay_path)
+        print(f"Replayed {len(results)} batch results from {replay_path}")
+        return results
+    if not requests:
+        return {}
+
+    stem = Path(work_dir) / f"{name}-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if manifest is not None:
+        path = manifest_path_for(f"{stem}-results.jsonl")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+    parts = split_requests(requests, max_requests, max_bytes)
+    batch_ids = []
+    for part_num, part in enumerate(parts, 1):
+        suffix = f"-{part_num}" if len(parts) > 1 else ""
+        requests_path = write_requests(part, f"{stem}-requests{suffix}.jsonl")
+        metadata = {"name": name, "part": f"{part_num}/{len(parts)}"}
+        batch = submit_batch(client, requests_path, endpoint, metadata=metadata)
+        print(f"Submitted batch {batch.id} with {len(part)} requests ({requests_path})")
+        batch_ids.append(batch.id)
+
+    batches = []
+    for batch_id in batch_ids:
+        batch = wait_for_batch(client, batch_id, poll_interval)
+        if batch.status != "completed":
+            print(f"Warning: batch {batch.id} ended with status '{batch.status}'")
+        batches.append(batch)
+
+    results_path = download_results(client, batches, f"{stem}-results.jsonl")
+    results = read_results(results_path)
+    print(f"Saved {len(results)} batch results to {results_path} (replay with this file)")
+    return results
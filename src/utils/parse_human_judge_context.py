@@ -2,41 +2,34 @@
 Generate HTML context file for human evaluation of summaries.
 """
 
+import sys
 import json
 import os
+from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
 
+# Add project root to path so imports work when running directly
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
 
-def _build_perspectives(points: List[str], doc_ids: List[str]) -> List[Dict]:
-    """Build perspectives list from points and document IDs."""
-    return [{"text": pt, "evidence_docs": [doc_ids[i]] if i < len(doc_ids) else []}
-            for i, pt in enumerate(points)]
+from src.utils.gold_references import DEFAULT_GOLD_FILE, get_gold_index
+from src.utils.io import get_query_index, get_merged_store
 
 
-def get_gold_reference(query: str, gold_file: str = "data/theperspective/data.jsonl") -> Optional[List[Dict]]:
-    """Get gold reference by matching query text."""
+def get_gold_reference(query: str, gold_file: str = DEFAULT_GOLD_FILE, gold_id: Optional[str] = None) -> Optional[List[Dict]]:
+    """Get gold reference by example id or matching query text (shared index, parsed once)."""
     try:
-        with open(gold_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                item = json.loads(line.strip())
-                if item.get("title", "").strip() == query.strip():
-                    return [
-                        {"claim": item.get("t1", ""), "perspectives": _build_perspectives(item.get("response1", []), item.get("favor_ids", []))},
-                        {"claim": item.get("t2", ""), "perspectives": _build_perspectives(item.get("response2", []), item.get("against_ids", []))}
-                    ]
+        return get_gold_index(gold_file).get(query, gold_id=gold_id)
     except Exception as e:
         print(f"Error loading gold data: {e}")
     return None
 
 
-def _find_json_entry(query: str, file_path: str, query_key: str = "query") -> Optional[Dict]:
-    """Find entry in JSON file by matching query text."""
+def _find_json_entry(query: str, file_path: str) -> Optional[Dict]:
+    """Find entry in JSON file by matching query text (file parsed and indexed once)."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for entry in json.load(f):
-                if entry.get(query_key, "").strip() == query.strip():
-                    return entry
+        return get_query_index(file_path).entry(query)
     except Exception as e:
         print(f"Error loading {file_path}: {e}")
     return None
@@ -44,11 +37,10 @@ def _find_json_entry(query: str, file_path: str, query_key: str = "query") -> Op
 
 def get_web_docs(query: str, merged_file: str = "data/merged-corpus/merged-10.json") -> List[Dict]:
     """Extract web docs (URL entries) for a query."""
-    entry = _find_json_entry(query, merged_file)
-    if entry:
-        return [{"id": doc.get("id"), "content": doc.get("content", "")}
-               for doc in entry.get("merged", [])
-               if isinstance(doc.get("id"), str) and doc.get("id", "").startswith("https://")]
+    try:
+        return get_merged_store(merged_file).web_docs(query)
+    except Exception as e:
+        print(f"Error loading {merged_file}: {e}")
     return []
 
 
@@ -189,7 +181,7 @@ def generate_html(queries_data: List[Dict], output_path: str):
                 ids_text.append(f'ID Merged: {id_merged}')
             html.append(f'<div class="query-ids">{" | ".join(ids_text)}</div>')
         
-        gold_ref = get_gold_reference(query, gold_file)
+        gold_ref = get_gold_reference(query, gold_file, gold_id=id_offline or None)
         html.append(format_claims(gold_ref, "Gold Reference", "gold-ref") if gold_ref else '<div class="warning">⚠️ Gold reference not found.</div>')
         
         offline_entry = find_summary(query, offline_file)
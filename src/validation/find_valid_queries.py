@@ -7,9 +7,17 @@ meaning the summary generation succeeded in both cases.
 
 import json
 import os
+import sys
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List, Union
 
+# Add project root to path so imports work when running directly
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.summarization.summary_repair import is_fallback_text
+
 
 def is_error_summary(summary: Union[List, Dict], is_merged: bool = False) -> bool:
     """
@@ -17,7 +25,8 @@ def is_error_summary(summary: Union[List, Dict], is_merged: bool = False) -> boo
     
     Args:
         summary: Summary to check (can be list of claims or dict with summary field)
-        is_merged: True if from merged summaries, False if from offline summaries
+        is_merged: True if from merged summaries, False if from offline summaries (both
+                   summarizers now share one fallback marker, so it no longer changes the result)
         
     Returns:
         True if summary contains error patterns, False otherwise
@@ -41,16 +50,9 @@ def is_error_summary(summary: Union[List, Dict], is_merged: bool = False) -> boo
                 continue
             text = perspective.get("text", "")
             
-            if is_merged:
-                # Merged summary error patterns
-                if "JSON parse errors 5+ times (prompt too long)" in text:
-                    return True
-                if "All 10 generation attempts failed" in text:
-                    return True
-            else:
-                # Offline summary error patterns
-                if text.startswith("Error generating summary:"):
-                    return True
+            # Fallback texts of both summarizers (and of older summary files)
+            if is_fallback_text(text):
+                return True
     
     return False
 
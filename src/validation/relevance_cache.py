@@ -0,0 +1,95 @@
+"""
+Persistent Relevance Cache
+
+SQLite cache of per-document relevance labels keyed by (query, content hash, model,
+prompt budgets), so a web document retrieved for the same query in web-5, web-10 and
+web-20 is judged once. The doc/prompt token budgets are part of the key because
+truncation and packing change what the model sees, so a label computed from a truncated
+document is never reused for a run with a different (or no) budget.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = "data/cache/relevance_cache.sqlite"
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def budget_key(doc_token_budget: int = None, prompt_token_budget: int = None) -> str:
+    """Cache key component for the prompt budgets a label was computed under (None = no limit)."""
+    return f"doc={doc_token_budget or 0};prompt={prompt_token_budget or 0}"
+
+
+class RelevanceCache:
+    """Thread-safe store of "R"/"NR" labels per (query, document content, model, budgets)."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS relevance_labels (
+                query TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                budgets TEXT NOT NULL,
+                label TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (query, content_hash, model, budgets)
+            )"""
+        )
+        self._conn.commit()
+
+    def get_many(self, query: str, docs: list, model: str, budgets: str = budget_key()) -> dict:
+        """
+        Look up cached labels for docs.
+
+        Returns:
+            dict mapping str(doc id) to "R"/"NR" for the docs that are cached
+        """
+        found = {}
+        with self._lock:
+            for doc in docs:
+                row = self._conn.execute(
+                    "SELECT label FROM relevance_labels "
+                    "WHERE query = ? AND content_hash = ? AND model = ? AND budgets = ?",
+                    (query.strip(), content_hash(doc.get("content", "")), model, budgets),
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[str(doc["id"])] = row[0]
+        return found
+
+    def put_many(self, query: str, docs: list, classifications: dict, model: str,
+                 budgets: str = budget_key()):
+        """Store the labels in classifications (keyed by str(doc id)) for docs."""
+        now = time.time()
+        rows = [
+            (query.strip(), content_hash(doc.get("content", "")), model, budgets,
+             classifications[str(doc["id"])], now)
+            for doc in docs
+            if str(doc["id"]) in classifications
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO relevance_labels (query, content_hash, model, budgets, label, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
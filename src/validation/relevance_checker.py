@@ -3,25 +3,133 @@ Web Document Relevance Checker
 
 Evaluates whether retrieved web documents are relevant to their query using GPT-5-Nano.
 Returns classification mapping document IDs to "R" (Relevant) or "NR" (Not Relevant).
+
+Documents are packed into prompts under a token budget: a query's documents are split across
+several prompts when their total exceeds `prompt_token_budget`, and per-prompt results are
+merged into one map. Per-document truncation to `doc_token_budget` tokens is opt-in (off by
+default), since it changes what the model sees and therefore the labels.
+Tokens are counted with tiktoken when it is installed, otherwise estimated from characters.
 """
 
 import os
 import json
+import threading
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
+
+from src.utils.concurrency import sleep_backoff
 
 load_dotenv()
 
 DEFAULT_MODEL = "gpt-5-nano-2025-08-07"
+DEFAULT_DOC_TOKEN_BUDGET = None
+DEFAULT_PROMPT_TOKEN_BUDGET = 6000
+TOKENIZER_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
+
+# Shared OpenAI client (one HTTP connection pool for all threads)
+_client = None
+_client_lock = threading.Lock()
+
+# Tokenizer used for prompt budgets (False = tiktoken unavailable, estimate from characters)
+_encoding = None
+
+
+def get_client() -> OpenAI:
+    """
+    Return the process-wide OpenAI client. Its built-in retries are disabled so that
+    rate limits surface here and can adapt the caller's concurrency.
+    Honors OPENAI_BASE_URL (e.g. a local OpenAI-compatible mock server).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY not set in environment")
+            _client = OpenAI(api_key=api_key, max_retries=0)
+    return _client
+
+
+def _get_encoding():
+    global _encoding
+    with _client_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                print(f"tiktoken unavailable ({type(e).__name__}); estimating tokens as chars/{CHARS_PER_TOKEN}")
+                _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is False:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cut text to at most `budget` tokens."""
+    encoding = _get_encoding()
+    if encoding is False:
+        return text[:budget * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= budget:
+        return text
+    return encoding.decode(tokens[:budget])
+
+
+def pack_documents(web_docs: list, doc_token_budget: int = DEFAULT_DOC_TOKEN_BUDGET,
+                   prompt_token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET) -> list:
+    """
+    Truncate documents and group them into prompt-sized batches.
+
+    Args:
+        doc_token_budget: Max tokens of content kept per document (None = no truncation)
+        prompt_token_budget: Max document tokens per prompt (None = one prompt per query);
+                             a batch always holds at least one document
+
+    Returns:
+        list of batches, each a list of doc copies whose 'content' fits the budgets
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for doc in web_docs:
+        content = doc.get('content') or ""
+        if doc_token_budget is not None:
+            content = truncate_to_tokens(content, doc_token_budget)
+        line_tokens = count_tokens(f"ID {doc['id']}: {content}")
+        if batch and prompt_token_budget is not None and batch_tokens + line_tokens > prompt_token_budget:
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append({**doc, 'content': content})
+        batch_tokens += line_tokens
+    if batch:
+        batches.append(batch)
+    return batches
 
 
-def check_relevance(query: str, web_docs: list) -> dict:
+def check_relevance(query: str, web_docs: list, limiter=None, fallback: bool = True,
+                    doc_token_budget: int = DEFAULT_DOC_TOKEN_BUDGET,
+                    prompt_token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET) -> dict:
     """
     Classify web documents as Relevant (R) or Not Relevant (NR) to the query.
     
     Args:
         query: The search query/question being evaluated.
         web_docs: List of web document dicts with 'id' and 'content' fields.
+        limiter: Optional AdaptiveConcurrency bounding in-flight API calls across threads;
+                 429s shrink it and successes grow it back.
+        fallback: If True (default), label every document "NR" when all retries fail;
+                  if False, re-raise the last error instead.
+        doc_token_budget: Max content tokens per document (None = full content)
+        prompt_token_budget: Max document tokens per prompt before splitting into another
+                             call (None = all documents in one prompt)
     
     Returns:
         dict mapping document IDs (as strings) to "R" or "NR".
@@ -29,7 +137,16 @@ def check_relevance(query: str, web_docs: list) -> dict:
     """
     if not web_docs:
         return {}
-    
+
+    batches = pack_documents(web_docs, doc_token_budget, prompt_token_budget)
+    result = {}
+    for batch_idx, batch in enumerate(batches, start=1):
+        result.update(_check_batch(query, batch, limiter, fallback, f"{batch_idx}/{len(batches)}"))
+    return result
+
+
+def build_relevance_prompt(query: str, web_docs: list) -> str:
+    """Prompt classifying one packed batch of documents."""
     # Build prompt with explicit JSON format requirement
     docs_str = "\n".join([
         f"ID {doc['id']}: {doc['content']}"
@@ -53,49 +170,100 @@ Example format:
 {{"0": "R", "1": "NR", "2": "R"}}
 
 Provide ONLY the JSON object, no explanation."""
+    return prompt
+
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY not set in environment")
+def parse_classifications(response_text: str, web_docs: list) -> dict:
+    """
+    Parse a JSON classification response for a batch of documents.
+
+    Returns:
+        dict mapping each document ID (as a string) to "R" or "NR"; missing IDs and
+        other values become "NR"
+
+    Raises:
+        json.JSONDecodeError: if the response is not valid JSON
+    """
+    classifications = json.loads(response_text)
     
-    client = OpenAI(api_key=api_key)
+    # Validate and fill missing IDs with "NR"
+    result = {}
+    for doc in web_docs:
+        doc_id = str(doc['id'])
+        if doc_id in classifications:
+            value = classifications[doc_id]
+            # Ensure only "R" or "NR" values
+            result[doc_id] = value if value in ["R", "NR"] else "NR"
+        else:
+            # Default to "NR" for missing IDs
+            result[doc_id] = "NR"
+    return result
+
+
+def completion_body(prompt: str) -> dict:
+    """Chat completions request body for a relevance prompt (also used for Batch API lines)."""
+    return {
+        "model": DEFAULT_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "response_format": {"type": "json_object"}
+    }
+
+
+def _check_batch(query: str, web_docs: list, limiter, fallback: bool, label: str) -> dict:
+    """Classify one packed batch of documents with a single prompt (with retries)."""
+    prompt = build_relevance_prompt(query, web_docs)
+    prompt_tokens = count_tokens(prompt)
+    client = get_client()
     
     # Retry logic for malformed JSON or API errors
     max_retries = 3
-    for attempt in range(max_retries):
+    max_rate_limit_retries = 8
+    rate_limit_retries = 0
+    attempt = 0
+    while attempt < max_retries:
         try:
-            completion = client.chat.completions.create(
-                model=DEFAULT_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            try:
+                if limiter is not None:
+                    with limiter:
+                        completion = _create_completion(client, prompt)
+                    limiter.on_success()
+                else:
+                    completion = _create_completion(client, prompt)
+            except RateLimitError:
+                # Rate limits back off and retry without using up a parse attempt
+                if limiter is not None:
+                    limiter.on_rate_limit()
+                if rate_limit_retries < max_rate_limit_retries:
+                    sleep_backoff(rate_limit_retries)
+                    rate_limit_retries += 1
+                    continue
+                raise
             response_text = completion.choices[0].message.content or ""
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                print(f"  Relevance prompt {label}: {len(web_docs)} docs, {usage.prompt_tokens} prompt tokens "
+                      f"({prompt_tokens} estimated), {usage.completion_tokens} completion tokens")
+            else:
+                print(f"  Relevance prompt {label}: {len(web_docs)} docs, ~{prompt_tokens} prompt tokens")
             
             # Parse JSON response
-            classifications = json.loads(response_text)
-            
-            # Validate and fill missing IDs with "NR"
-            result = {}
-            for doc in web_docs:
-                doc_id = str(doc['id'])
-                if doc_id in classifications:
-                    value = classifications[doc_id]
-                    # Ensure only "R" or "NR" values
-                    result[doc_id] = value if value in ["R", "NR"] else "NR"
-                else:
-                    # Default to "NR" for missing IDs
-                    result[doc_id] = "NR"
-            
-            return result
+            return parse_classifications(response_text, web_docs)
             
         except (json.JSONDecodeError, KeyError, Exception) as e:
-            if attempt < max_retries - 1:
-                print(f"Attempt {attempt + 1} failed: {e}. Retrying...")
+            attempt += 1
+            if attempt < max_retries:
+                print(f"Attempt {attempt} failed: {e}. Retrying...")
                 continue
             else:
+                if not fallback:
+                    raise
                 # Final fallback: return all "NR"
                 print(f"All retries failed: {e}. Defaulting all documents to NR.")
                 return {str(doc['id']): "NR" for doc in web_docs}
     
     # Should not reach here, but just in case
-    return {str(doc['id']): "NR" for doc in web_docs}
\ No newline at end of file
+    return {str(doc['id']): "NR" for doc in web_docs}
+
+
+def _create_completion(client: OpenAI, prompt: str):
+    return client.chat.completions.create(**completion_body(prompt))
@@ -13,17 +13,273 @@ Usage:
     
     # Dry run (process selected queries without saving)
     python src/validation/run_relevance_check.py --input web-5.json --limit 3 --dry-run
+
+    # Classify 8 queries concurrently (shrinks automatically on 429s)
+    python src/validation/run_relevance_check.py --input web-20.json --workers 8
+
+Finished queries are appended to data/valid-web/valid-web-{k}.json.checkpoint.jsonl, so an
+interrupted run resumes where it stopped (use --restart to ignore the checkpoint). Labels are
+cached per (query, document content, model, token budgets) in data/cache/relevance_cache.sqlite,
+so documents shared by web-5/10/20 are judged once (use --no-cache to bypass).
+
+    # Auto-label clearly relevant documents locally; the rest goes to GPT (NR auto-labels
+    # only with an explicit --prefilter-low, see relevance_prefilter.py)
+    python src/validation/run_relevance_check.py --prefilter lexical --prefilter-high 0.9
+
+    # Offline OpenAI Batch API: one batch job per file instead of live calls (cheaper; results within 24h)
+    python src/validation/run_relevance_check.py --input web-20.json --batch-api
+
+    # Re-join a saved batch results file without calling the API
+    python src/validation/run_relevance_check.py --input web-20.json \
+        --batch-results data/valid-web/batch/relevance-web-20-20251215_120000-results.jsonl
 """
 
 import os
+import sys
 import json
 import argparse
 from pathlib import Path
-from relevance_checker import check_relevance
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Add project root to path so imports work when running directly
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from relevance_checker import (
+    check_relevance, get_client, pack_documents, build_relevance_prompt, parse_classifications,
+    completion_body, DEFAULT_MODEL, DEFAULT_DOC_TOKEN_BUDGET, DEFAULT_PROMPT_TOKEN_BUDGET
+)
+from relevance_cache import RelevanceCache, budget_key
+from relevance_prefilter import prefilter_documents, PREFILTER_METHODS, DEFAULT_THRESHOLDS
+from src.utils.concurrency import AdaptiveConcurrency
+from src.utils.openai_batch import DEFAULT_POLL_INTERVAL, batch_request, load_manifest, run_batch
+
+BATCH_DIR = "data/valid-web/batch"
+RELEVANCE_ENDPOINT = "/v1/chat/completions"
+
+
+def _report(idx: int, total: int, query: str, results: list, classifications: dict):
+    print(f"\n[{idx + 1}/{total}] Query: {query}")
+    print(f"  Documents: {len(results)}")
+    print(f"  Classifications: {classifications}")
+    r_count = sum(1 for v in classifications.values() if v == "R")
+    nr_count = sum(1 for v in classifications.values() if v == "NR")
+    print(f"  Relevant: {r_count}, Not Relevant: {nr_count}")
+
+
+def checkpoint_path_for(output_path: str) -> Path:
+    return Path(f"{output_path}.checkpoint.jsonl")
+
+
+def checkpoint_settings(prefilter: str = None, prefilter_low: float = None, prefilter_high: float = None,
+                        doc_token_budget: int = DEFAULT_DOC_TOKEN_BUDGET,
+                        prompt_token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET) -> str:
+    """Key of the settings that produced a checkpoint record (model, token budgets, pre-filter)."""
+    if prefilter is None:
+        prefilter_key = "none"
+    else:
+        default_low, default_high = DEFAULT_THRESHOLDS[prefilter]
+        low = default_low if prefilter_low is None else prefilter_low
+        high = default_high if prefilter_high is None else prefilter_high
+        prefilter_key = f"{prefilter}:{low}:{high}"
+    return f"model={DEFAULT_MODEL};{budget_key(doc_token_budget, prompt_token_budget)};prefilter={prefilter_key}"
+
+
+def load_checkpoint(checkpoint_path: Path, queries_to_process: list, settings: str) -> dict:
+    """
+    Read finished queries from an append-only checkpoint.
+
+    Returns:
+        dict mapping query index to its classifications, for complete entries whose query
+        still matches the input file and that were produced with the same settings (see
+        checkpoint_settings); records from other settings are skipped with a warning
+    """
+    finished = {}
+    if not checkpoint_path.exists():
+        return finished
+    other_settings = 0
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line
+                continue
+            idx = record.get("index")
+            if (
+                record.get("complete")
+                and isinstance(idx, int)
+                and idx < len(queries_to_process)
+                and queries_to_process[idx].get("query", "") == record.get("query")
+            ):
+                if record.get("settings") != settings:
+                    other_settings += 1
+                    continue
+                finished[idx] = record["classifications"]
+    if other_settings:
+        print(f"Warning: ignoring {other_settings} checkpointed queries classified with other model, token "
+              f"budget or pre-filter settings than {settings}; they are classified again "
+              f"(use --restart to discard the checkpoint)")
+    return finished
+
+
+def classify_with_cache(query: str, results: list, cache=None, limiter=None,
+                        doc_token_budget: int = DEFAULT_DOC_TOKEN_BUDGET,
+                        prompt_token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET):
+    """
+    Classify documents, only sending those without a cached label to the model.
+
+    Returns:
+        (classifications, complete): complete is False when the model call failed and the
+        uncached documents were defaulted to "NR" (such labels are not cached)
+    """
+    budgets_key = budget_key(doc_token_budget, prompt_token_budget)
+    cached = cache.get_many(query, results, DEFAULT_MODEL, budgets_key) if cache is not None else {}
+    uncached = [doc for doc in results if str(doc['id']) not in cached]
+
+    fresh = {}
+    complete = True
+    if uncached:
+        try:
+            fresh = check_relevance(query, uncached, limiter=limiter, fallback=False,
+                                    doc_token_budget=doc_token_budget,
+                                    prompt_token_budget=prompt_token_budget)
+            if cache is not None:
+                cache.put_many(query, uncached, fresh, DEFAULT_MODEL, budgets_key)
+        except Exception as e:
+            print(f"All retries failed for '{query[:60]}': {e}. Defaulting uncached documents to NR.")
+            fresh = {str(doc['id']): "NR" for doc in uncached}
+            complete = False
+
+    merged = {**cached, **fresh}
+    return {str(doc['id']): merged[str(doc['id'])] for doc in results}, complete
+
+
+def _replayed_groups(manifest: dict, idx: int, query: str, results: list) -> list:
+    """
+    (custom_id, documents) of the prompts a saved batch sent for one query, rebuilt from its
+    manifest. Documents is None when the prompt was about another query or about documents
+    that are no longer in the input.
+    """
+    docs_by_id = {str(doc['id']): doc for doc in results}
+    groups = []
+    for custom_id, record in manifest["prompts"].items():
+        query_idx, _, g = custom_id.partition(":")
+        if query_idx != str(idx):
+            continue
+        doc_ids = record.get("doc_ids", [])
+        matches = record.get("query") == query and all(doc_id in docs_by_id for doc_id in doc_ids)
+        groups.append((int(g), custom_id, [docs_by_id[doc_id] for doc_id in doc_ids] if matches else None))
+    return [(custom_id, group) for _, custom_id, group in sorted(groups, key=lambda item: item[0])]
+
+
+def classify_with_batch(queries_to_process: list, pending: list, name: str, cache=None,
+                        prefilter: str = None, prefilter_low: float = None, prefilter_high: float = None,
+                        doc_token_budget: int = DEFAULT_DOC_TOKEN_BUDGET,
+                        prompt_token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET,
+                        replay_path: str = None, poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """
+    Classify the pending queries through OpenAI Batch API jobs (or replay their saved results).
+
+    Pre-filtering and cache lookups happen locally as in the live path; every remaining
+    packed prompt becomes one batch line with custom_id "{query index}:{prompt index}". The
+    query and document IDs of every prompt are saved in the batch manifest, and a replay
+    joins each answer to those documents, not to a regrouping under the current cache and
+    flags. Documents that no replayed prompt covered default to "NR" and leave their query
+    incomplete.
+
+    Returns:
+        (results, auto_labelled): results maps query index to (classifications, complete),
+        where complete is False when a prompt of the query had no usable result and its
+        documents were defaulted to "NR"; auto_labelled maps query index to the number of
+        pre-filter labels
+
+    Raises:
+        ValueError: the replayed batch has no manifest, or used another model or token budgets
+    """
+    budgets_key = budget_key(doc_token_budget, prompt_token_budget)
+    manifest = None
+    if replay_path:
+        manifest = load_manifest(replay_path)
+        if manifest is None:
+            raise ValueError(f"No batch manifest next to {replay_path}; it is needed to replay the results")
+        if manifest.get("model") != DEFAULT_MODEL or manifest.get("budgets") != budgets_key:
+            raise ValueError(f"Batch {replay_path} used model {manifest.get('model')} and budgets "
+                             f"{manifest.get('budgets')}; replay it with the same --doc-token-budget "
+                             f"and --prompt-token-budget ({DEFAULT_MODEL}, {budgets_key} now)")
+
+    requests = []
+    prompts = {}
+    planned = {}
+    auto_labelled = {}
+    for idx in pending:
+        item = queries_to_process[idx]
+        query = item.get("query", "")
+        results = item.get("web_docs", {}).get("results", [])
+        auto_labels = {}
+        uncertain = results
+        if prefilter is not None:
+            auto_labels, uncertain = prefilter_documents(query, results, method=prefilter,
+                                                         low=prefilter_low, high=prefilter_high)
+            auto_labelled[idx] = len(auto_labels)
+        cached = cache.get_many(query, uncertain, DEFAULT_MODEL, budgets_key) if cache is not None else {}
+        uncached = [doc for doc in uncertain if str(doc['id']) not in cached]
+        if manifest is not None:
+            groups = _replayed_groups(manifest, idx, query, results)
+        else:
+            packed = pack_documents(uncached, doc_token_budget, prompt_token_budget) if uncached else []
+            groups = [(f"{idx}:{g}", group) for g, group in enumerate(packed)]
+            for custom_id, group in groups:
+                requests.append(batch_request(custom_id, RELEVANCE_ENDPOINT,
+                                              completion_body(build_relevance_prompt(query, group))))
+                prompts[custom_id] = {"query": query, "doc_ids": [str(doc['id']) for doc in group]}
+        planned[idx] = (query, results, {**cached, **auto_labels}, uncached, groups)
+
+    print(f"{len(requests)} relevance prompts for {len(pending)} queries")
+    batch_results = run_batch(requests, RELEVANCE_ENDPOINT, BATCH_DIR, name,
+                              client=None if replay_path else get_client(),
+                              poll_interval=poll_interval, replay_path=replay_path,
+                              manifest={"model": DEFAULT_MODEL, "budgets": budgets_key, "prompts": prompts})
+
+    classified = {}
+    for idx, (query, results, labels, uncached, groups) in planned.items():
+        fresh = {}
+        complete = True
+        for custom_id, group in groups:
+            if group is None:
+                print(f"Batch prompt {custom_id} does not match the current documents of '{query[:60]}'; ignoring its answer.")
+                complete = False
+                continue
+            result = batch_results.get(custom_id)
+            try:
+                if result is None or result["body"] is None:
+                    raise ValueError(result["error"] if result is not None else "no batch result")
+                response_text = result["body"]["choices"][0]["message"]["content"] or ""
+                fresh.update(parse_classifications(response_text, group))
+            except Exception as e:
+                print(f"Batch prompt {custom_id} failed for '{query[:60]}': {e}. Defaulting its documents to NR.")
+                fresh.update({str(doc['id']): "NR" for doc in group})
+                complete = False
+        unanswered = [doc for doc in uncached if str(doc['id']) not in fresh]
+        if unanswered:
+            print(f"{len(unanswered)} documents of '{query[:60]}' were not in any batch prompt. Defaulting them to NR.")
+            fresh.update({str(doc['id']): "NR" for doc in unanswered})
+            complete = False
+        if complete and cache is not None and uncached:
+            cache.put_many(query, uncached, fresh, DEFAULT_MODEL, budgets_key)
+        merged = {**labels, **fresh}
+        classified[idx] = ({str(doc['id']): merged[str(doc['id'])] for doc in results}, complete)
+    return classified, auto_labelled
 
 
 def process_web_file(input_path: str, output_path: str, limit: int = None, 
-                     dry_run: bool = False):
+                     dry_run: bool = False, workers: int = 1, use_cache: bool = True,
+                     resume: bool = True, prefilter: str = None, prefilter_low: float = None,
+                     prefilter_high: float = None,
+                     doc_token_budget: int = DEFAULT_DOC_TOKEN_BUDGET,
+                     prompt_token_budget: int = DEFAULT_PROMPT_TOKEN_BUDGET,
+                     batch_api: bool = False, batch_results: str = None,
+                     poll_interval: float = DEFAULT_POLL_INTERVAL):
     """
     Process a single web document file and output relevance classifications.
     
@@ -32,6 +288,24 @@ def process_web_file(input_path: str, output_path: str, limit: int = None,
         output_path: Path to output JSON file (e.g., data/valid-web/valid-web-5.json)
         limit: Process only first N queries (None = all)
         dry_run: If True, process and print selected queries (respecting limit) without saving
+        workers: Number of queries classified concurrently (1 = serial). In-flight API calls
+                 are halved on rate limits and grow back after successes.
+        use_cache: Reuse/store per-document labels in the persistent relevance cache
+        resume: Skip queries already recorded as complete in the checkpoint file with the same
+                model, token budgets and pre-filter settings. The
+                output file is only written (and the checkpoint removed) once every query
+                is complete.
+        prefilter: Local scoring method ("lexical" or "dense") used to auto-label documents
+                   before the LLM call (None = send every document to the LLM)
+        prefilter_low / prefilter_high: Scores at or below / at or above which documents are
+                   auto-labelled NR / R (None = the method's default threshold)
+        doc_token_budget: Max content tokens per document in the prompt (None = full content)
+        prompt_token_budget: Max document tokens per prompt; larger queries are split across
+                   several calls (None = one call per query)
+        batch_api: Submit all prompts as one OpenAI Batch API job and wait for it instead
+                   of calling the API per query
+        batch_results: Saved batch results file to join instead of calling the API
+        poll_interval: Seconds between batch status checks
     """
     # Load input data
     with open(input_path, 'r', encoding='utf-8') as f:
@@ -46,40 +320,124 @@ def process_web_file(input_path: str, output_path: str, limit: int = None,
     output_data = []
     queries_to_process = data[:limit] if limit else data
     
-    for idx, item in enumerate(queries_to_process):
+    total = len(queries_to_process)
+    limiter = AdaptiveConcurrency(max_limit=workers) if workers > 1 else None
+    cache = RelevanceCache() if use_cache else None
+
+    # Resume from the checkpoint of an interrupted run with the same settings
+    checkpoint_path = checkpoint_path_for(output_path)
+    settings = checkpoint_settings(prefilter, prefilter_low, prefilter_high, doc_token_budget, prompt_token_budget)
+    if dry_run:
+        classifications_by_idx = {}
+    else:
+        if not resume and checkpoint_path.exists():
+            checkpoint_path.unlink()
+        classifications_by_idx = load_checkpoint(checkpoint_path, queries_to_process, settings)
+        if classifications_by_idx:
+            print(f"Resuming: {len(classifications_by_idx)} queries already finished in {checkpoint_path}")
+        checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint_file = None if dry_run else open(checkpoint_path, 'a', encoding='utf-8')
+    if checkpoint_file is not None and checkpoint_file.tell() > 0:
+        # Terminate a line truncated by a crash so new records start on their own line
+        checkpoint_file.write("\n")
+    pending = [idx for idx in range(total) if idx not in classifications_by_idx]
+    auto_labelled_by_idx = {}
+    incomplete = set()
+
+    budgets = {"doc_token_budget": doc_token_budget, "prompt_token_budget": prompt_token_budget}
+
+    def classify(idx: int):
+        item = queries_to_process[idx]
         query = item.get("query", "")
-        web_docs = item.get("web_docs", {})
-        results = web_docs.get("results", [])
-        
-        print(f"\n[{idx + 1}/{len(queries_to_process)}] Query: {query}")
-        print(f"  Documents: {len(results)}")
-        
-        # Get relevance classifications
-        classifications = check_relevance(query, results)
-        
-        print(f"  Classifications: {classifications}")
-        r_count = sum(1 for v in classifications.values() if v == "R")
-        nr_count = sum(1 for v in classifications.values() if v == "NR")
-        print(f"  Relevant: {r_count}, Not Relevant: {nr_count}")
-        
-        # Add relevance field to each document
-        for doc in results:
+        results = item.get("web_docs", {}).get("results", [])
+        if prefilter is None:
+            return classify_with_cache(query, results, cache=cache, limiter=limiter, **budgets)
+
+        auto_labels, uncertain = prefilter_documents(query, results, method=prefilter,
+                                                     low=prefilter_low, high=prefilter_high)
+        auto_labelled_by_idx[idx] = len(auto_labels)
+        classifications, complete = classify_with_cache(query, uncertain, cache=cache, limiter=limiter,
+                                                        **budgets)
+        classifications.update(auto_labels)
+        return {str(doc['id']): classifications[str(doc['id'])] for doc in results}, complete
+
+    def finish(idx: int, classifications: dict, complete: bool):
+        item = queries_to_process[idx]
+        classifications_by_idx[idx] = classifications
+        if not complete:
+            incomplete.add(idx)
+        if checkpoint_file is not None:
+            checkpoint_file.write(json.dumps({
+                "index": idx,
+                "query": item.get("query", ""),
+                "classifications": classifications,
+                "complete": complete,
+                "settings": settings,
+            }, ensure_ascii=False) + "\n")
+            checkpoint_file.flush()
+        _report(idx, total, item.get("query", ""),
+                item.get("web_docs", {}).get("results", []), classifications)
+
+    # Get relevance classifications (concurrently when workers > 1)
+    try:
+        if batch_api or batch_results:
+            batch_classified, auto_labelled_by_idx = classify_with_batch(
+                queries_to_process, pending, f"relevance-{Path(input_path).stem}", cache=cache,
+                prefilter=prefilter, prefilter_low=prefilter_low, prefilter_high=prefilter_high,
+                replay_path=batch_results, poll_interval=poll_interval, **budgets)
+            for idx in pending:
+                finish(idx, *batch_classified[idx])
+        elif workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(classify, idx): idx for idx in pending}
+                for future in as_completed(futures):
+                    finish(futures[future], *future.result())
+            print(f"\nRate-limited responses: {limiter.rate_limited}, final concurrency: {limiter.limit}")
+        else:
+            for idx in pending:
+                finish(idx, *classify(idx))
+    finally:
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+    if cache is not None:
+        print(f"Relevance cache: {cache.stats()}")
+    if prefilter is not None:
+        checked_docs = sum(len(queries_to_process[idx].get("web_docs", {}).get("results", []))
+                           for idx in auto_labelled_by_idx)
+        print(f"Pre-filter ({prefilter}): auto-labelled {sum(auto_labelled_by_idx.values())}/{checked_docs} "
+              f"documents without the LLM")
+
+    # Add relevance field to each document, preserving input order
+    for idx, item in enumerate(queries_to_process):
+        classifications = classifications_by_idx[idx]
+        for doc in item.get("web_docs", {}).get("results", []):
             doc_id = str(doc['id'])
             doc['relevance'] = classifications.get(doc_id, "NR")
         
         # Preserve original structure
         output_data.append(item)
     
+    if incomplete:
+        print(f"\n{len(incomplete)}/{total} queries have documents defaulted to NR after failed API calls: "
+              f"{sorted(incomplete)}")
+
     # Dry run: process all selected queries but do not save
     if dry_run:
         print("\nDry run complete. Processed selected queries without saving.")
         print(f"Would save to: {output_path}")
         return
 
+    # Keep the checkpoint instead of finalizing, so a re-run retries only the incomplete queries
+    if incomplete:
+        print(f"Not saving {output_path}; finished queries are kept in {checkpoint_path}. "
+              f"Re-run to retry the incomplete ones.")
+        return
+
     # Save output
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(output_data, f, indent=2, ensure_ascii=False)
+    checkpoint_path.unlink(missing_ok=True)
     
     print(f"\n✓ Saved results to {output_path}")
 
@@ -98,6 +456,67 @@ def main():
         type=int, 
         help="Process only first N queries (useful for testing)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Queries classified concurrently (default: 1). Set OPENAI_BASE_URL to target a mock server."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the persistent per-document relevance cache"
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore any checkpoint from an interrupted run and start over"
+    )
+    parser.add_argument(
+        "--prefilter",
+        choices=PREFILTER_METHODS,
+        help="Auto-label clearly relevant/irrelevant documents with a local score before calling GPT"
+    )
+    parser.add_argument(
+        "--prefilter-low",
+        type=float,
+        help="Pre-filter score at or below which documents are labelled NR (default: none are; "
+             "NR auto-labels disagreed often with GPT, check with relevance_prefilter.py first)"
+    )
+    parser.add_argument(
+        "--prefilter-high",
+        type=float,
+        help="Pre-filter score at or above which documents are labelled R (default depends on method)"
+    )
+    parser.add_argument(
+        "--doc-token-budget",
+        type=int,
+        default=0,
+        help="Truncate each document to this many content tokens in a prompt (default: 0 = full content); "
+             "changes labels, which are cached per budget"
+    )
+    parser.add_argument(
+        "--prompt-token-budget",
+        type=int,
+        default=DEFAULT_PROMPT_TOKEN_BUDGET,
+        help=f"Max document tokens per prompt before splitting (default: {DEFAULT_PROMPT_TOKEN_BUDGET}, 0 = no limit)"
+    )
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Submit each file's prompts as one OpenAI Batch API job and poll it instead of calling the API live"
+    )
+    parser.add_argument(
+        "--batch-results",
+        help="Replay a saved batch results file (from --batch-api) instead of calling the API; use with --input "
+             "and the original token budgets. Needs the -manifest.json saved next to it"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=f"Seconds between batch status checks with --batch-api (default: {DEFAULT_POLL_INTERVAL:.0f})"
+    )
     parser.add_argument(
         "--dry-run", 
         action="store_true",
@@ -106,6 +525,10 @@ def main():
     
     args = parser.parse_args()
     
+    if args.batch_results and not args.input:
+        print("--batch-results holds the results of one file; pass that file with --input.")
+        return
+    
     web_dir = Path("data/web")
     valid_web_dir = Path("data/valid-web")
     
@@ -135,7 +558,18 @@ def main():
                 str(input_path), 
                 str(output_path),
                 limit=args.limit,
-                dry_run=args.dry_run
+                dry_run=args.dry_run,
+                workers=args.workers,
+                use_cache=not args.no_cache,
+                resume=not args.restart,
+                prefilter=args.prefilter,
+                prefilter_low=args.prefilter_low,
+                prefilter_high=args.prefilter_high,
+                doc_token_budget=args.doc_token_budget or None,
+                prompt_token_budget=args.prompt_token_budget or None,
+                batch_api=args.batch_api,
+                batch_results=args.batch_results,
+                poll_interval=args.poll_interval
             )
         except Exception as e:
             print(f"Error processing {filename}: {e}")